@@ -29,6 +29,7 @@ import time
 import os
 
 from spectcl.client import Client
+from spectcl.contrib import to_dense_array
 
 from .ui.ui_app import Ui_MainWindow
 
@@ -126,8 +127,8 @@ class MyAppWindow(BaseAppForm, Ui_MainWindow):
             return x, y, z
         elif spec.stype == '1D':
             self.tabWidget.setCurrentIndex(0)
-            x = df.x.to_numpy()
-            y = df.v.to_numpy()
+            x, = spec.get_axes_values(map=False)
+            y = to_dense_array(df.x, df['count'], shape=x.shape)
             return x, y, None
         else:
             return None, None, None
@@ -2,3 +2,4 @@ from spectcl.data import SpecTclSpectrumClient as SpectrumClient
 from spectcl.data import SpecTclGateClient as GateClient
 from spectcl.data import SpecTclApplyClient as GateApplyClient
 from spectcl.data import SpecTclClient as Client
+from spectcl.data import AsyncSpecTclClient as AsyncClient
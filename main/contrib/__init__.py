@@ -1,2 +1,3 @@
 from .data import to_image_tuple
+from .data import to_dense_array
 from .data import export_spectrum_for_allison
@@ -0,0 +1,339 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Benchmarks of the hot paths of the client, the data model and plotting,
+run against the local mock SpecTcl server on spectra of several sizes and
+occupancies, the results could be saved as JSON baselines and compared.
+
+Examples
+--------
+Run the quick set and save as the baseline:
+
+    python -m spectcl.contrib.benchmark --quick --save baseline.json
+
+Run the full set (1k to 16M channels) and compare with the baseline:
+
+    python -m spectcl.contrib.benchmark --compare baseline.json
+
+Or from Python:
+
+>>> from spectcl.contrib.benchmark import run_benchmarks, compare_results
+>>> r = run_benchmarks(sizes=[1024, 65536], occupancies=[0.1])
+"""
+
+import argparse
+import contextlib
+import fnmatch
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from .mock_server import MockSpecTcl
+from .mock_server import MockSpecTclServer
+
+# total number of channels of the spectra
+DEFAULT_SIZES = (1 << 10, 1 << 16, 1 << 20, 1 << 24)
+
+# fraction of the non-empty channels
+DEFAULT_OCCUPANCIES = (0.01, 0.1, 0.5)
+
+# the quick set
+QUICK_SIZES = (1 << 10, 1 << 16)
+QUICK_OCCUPANCIES = (0.1, )
+
+# spectrum types, '1' (1D) or '2' (2D)
+DEFAULT_TYPES = ('1', '2')
+
+# relative change of the median time to report as slower or faster
+DEFAULT_TOLERANCE = 0.1
+
+SPECTRUM_NAME = 'bench'
+GATE_NAME = 'bench_contour'
+
+
+def measure(fn, setup=None, min_time=0.2, min_repeat=3, max_repeat=100):
+    """Time the calls of *fn*, repeated until *min_time* seconds are spent,
+    within the range of *min_repeat* and *max_repeat* calls, *setup* is
+    called before each call and not timed.
+
+    Returns
+    -------
+    r : dict
+        Keys of 'min', 'median', 'mean' (seconds), 'repeat'.
+    """
+    times = []
+    while len(times) < max_repeat and (len(times) < min_repeat
+                                       or sum(times) < min_time):
+        if setup is not None:
+            setup()
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    return {
+        'min': min(times),
+        'median': statistics.median(times),
+        'mean': statistics.mean(times),
+        'repeat': len(times),
+    }
+
+
+def make_case_spectcl(type, size, occupancy, seed=0):
+    """Return a MockSpecTcl with a spectrum of *size* channels (square for
+    2D) of *occupancy*, gated by a contour gate.
+    """
+    if type == '1':
+        bins = size
+    else:
+        bins = int(round(size**0.5))
+    m = MockSpecTcl(seed)
+    m.add_spectrum(SPECTRUM_NAME,
+                   type, ['p.x', 'p.y'][:int(type)],
+                   bins=bins,
+                   low=-10.0,
+                   high=10.0,
+                   occupancy=occupancy)
+    m.add_gate(GATE_NAME,
+               'c',
+               parameters=['p.x', 'p.y'],
+               points=[{
+                   'x': x,
+                   'y': y
+               } for x, y in ((-5, -5), (5, -4), (4, 5), (-4, 4))])
+    if type == '2':
+        m.apply(SPECTRUM_NAME, GATE_NAME)
+    return m
+
+
+def _case_benchmarks(client, type):
+    # yield name, fn, setup of the benchmarks of the case
+    import matplotlib.pyplot as plt
+    from spectcl.contrib import export_spectrum_for_allison
+    from spectcl.data.plot import plot_image
+
+    sp = client.get_spectrum(SPECTRUM_NAME)
+
+    def _plot_image():
+        plot_image(sp)
+        plt.close('all')
+
+    yield 'client.list', lambda: client.list('spectrum',
+                                             refresh_cache=True), None
+    yield 'get_spectrum', lambda: client.get_spectrum(SPECTRUM_NAME), None
+    yield 'map_data', sp.map_data, None
+    yield 'get_data', sp.get_data, sp.map_data
+    yield 'stats', sp.stats, None
+    if type != '2':
+        return
+    yield 'to_image_tuple', sp.to_image_tuple, None
+    yield 'plot_image', _plot_image, None
+    gate = client.get_gate(GATE_NAME)
+    points = np.column_stack(sp._nonzero(map=True)[0])
+    yield 'gate.is_in', lambda: gate.is_in(points), None
+    with tempfile.TemporaryDirectory() as d:
+        path = os.path.join(d, 'allison.json')
+
+        def _export():
+            with contextlib.redirect_stdout(io.StringIO()):
+                export_spectrum_for_allison(path, sp)
+
+        yield 'export_spectrum_for_allison', _export, None
+
+
+def run_benchmarks(sizes=DEFAULT_SIZES,
+                   occupancies=DEFAULT_OCCUPANCIES,
+                   types=DEFAULT_TYPES,
+                   pattern='*',
+                   min_time=0.2,
+                   verbose=True):
+    """Run the benchmarks of the spectra of each size, occupancy and type.
+
+    Parameters
+    ----------
+    sizes : list
+        Total number of channels of the spectra.
+    occupancies : list
+        Fraction of the non-empty channels.
+    types : list
+        Spectrum types, '1' and/or '2'.
+    pattern : str
+        Unix wildcard pattern of the benchmark names to run.
+    min_time : float
+        Minimum time in seconds to spend on each benchmark.
+    verbose : bool
+        If set, print the results while running.
+
+    Returns
+    -------
+    r : dict
+        Keys of 'meta' (versions and platform) and 'results' (a list of dict
+        of 'name', 'type', 'size', 'occupancy' and the timing of
+        :func:`measure`).
+    """
+    import matplotlib
+    matplotlib.use('Agg')
+
+    results = []
+    for type in types:
+        for size in sizes:
+            for occupancy in occupancies:
+                m = make_case_spectcl(type, size, occupancy)
+                with MockSpecTclServer(m) as srv:
+                    client = srv.client()
+                    for name, fn, setup in _case_benchmarks(client, type):
+                        if not fnmatch.fnmatch(name, pattern):
+                            continue
+                        r = measure(fn, setup, min_time)
+                        r.update(name=name,
+                                 type=f'{type}D',
+                                 size=size,
+                                 occupancy=occupancy)
+                        results.append(r)
+                        if verbose:
+                            print(f"{_key_str(r):<54s} "
+                                  f"{r['median'] * 1e3:10.3f} ms "
+                                  f"(x{r['repeat']})")
+                    client.close()
+    return {'meta': _meta(), 'results': results}
+
+
+def _meta():
+    import matplotlib
+    import pandas
+    import spectcl
+    return {
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'spectcl': spectcl.__version__,
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pandas.__version__,
+        'matplotlib': matplotlib.__version__,
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+    }
+
+
+def _key(r):
+    return (r['name'], r['type'], r['size'], r['occupancy'])
+
+
+def _key_str(r):
+    return f"{r['name']}[{r['type']},{r['size']},{r['occupancy']}]"
+
+
+def save_results(r, filepath):
+    """Save the results of :func:`run_benchmarks` as a JSON file.
+    """
+    with open(filepath, 'w') as fp:
+        json.dump(r, fp, indent=2)
+
+
+def load_results(filepath):
+    """Load the results saved by :func:`save_results`.
+    """
+    with open(filepath, 'r') as fp:
+        return json.load(fp)
+
+
+def compare_results(base, new, tolerance=DEFAULT_TOLERANCE):
+    """Compare the median time of the benchmarks in both *base* and *new*
+    results.
+
+    Returns
+    -------
+    r : list
+        A list of dict of 'key', 'base', 'new' (seconds), 'ratio' (new to
+        base), 'change' ('slower', 'faster' or '', by *tolerance*).
+    """
+    base_map = {_key(i): i for i in base['results']}
+    r = []
+    for i in new['results']:
+        b = base_map.get(_key(i))
+        if b is None:
+            continue
+        ratio = i['median'] / b['median']
+        if ratio > 1 + tolerance:
+            change = 'slower'
+        elif ratio < 1 / (1 + tolerance):
+            change = 'faster'
+        else:
+            change = ''
+        r.append({
+            'key': _key_str(i),
+            'base': b['median'],
+            'new': i['median'],
+            'ratio': ratio,
+            'change': change,
+        })
+    return r
+
+
+def print_comparison(rows):
+    """Print the table of :func:`compare_results`.
+    """
+    print(f"{'benchmark':<54s} {'base/ms':>10s} {'new/ms':>10s} "
+          f"{'ratio':>7s}")
+    for i in rows:
+        print(f"{i['key']:<54s} {i['base'] * 1e3:10.3f} {i['new'] * 1e3:10.3f} "
+              f"{i['ratio']:7.2f} {i['change']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark PySpecTcl against a mock SpecTcl server.")
+    parser.add_argument('--sizes',
+                        type=int,
+                        nargs='+',
+                        default=None,
+                        help="Total number of channels of the spectra")
+    parser.add_argument('--occupancies',
+                        type=float,
+                        nargs='+',
+                        default=None,
+                        help="Fraction of non-empty channels")
+    parser.add_argument('--types',
+                        nargs='+',
+                        default=list(DEFAULT_TYPES),
+                        choices=DEFAULT_TYPES,
+                        help="Spectrum types")
+    parser.add_argument('--quick',
+                        action='store_true',
+                        help="Run on the small spectra only")
+    parser.add_argument('-k',
+                        '--pattern',
+                        default='*',
+                        help="Wildcard pattern of the benchmark names")
+    parser.add_argument('--min-time',
+                        type=float,
+                        default=0.2,
+                        help="Minimum seconds to spend on each benchmark")
+    parser.add_argument('--save', help="Save the results to a JSON file")
+    parser.add_argument('--compare',
+                        help="Compare with the results of a JSON file")
+    parser.add_argument('--tolerance',
+                        type=float,
+                        default=DEFAULT_TOLERANCE,
+                        help="Relative change to report")
+    args = parser.parse_args()
+    sizes = args.sizes or (QUICK_SIZES if args.quick else DEFAULT_SIZES)
+    occupancies = args.occupancies or (QUICK_OCCUPANCIES
+                                       if args.quick else DEFAULT_OCCUPANCIES)
+    r = run_benchmarks(sizes, occupancies, args.types, args.pattern,
+                       args.min_time)
+    if args.save:
+        save_results(r, args.save)
+        print(f"Saved results to {args.save}.")
+    if args.compare:
+        rows = compare_results(load_results(args.compare), r, args.tolerance)
+        print_comparison(rows)
+        if any(i['change'] == 'slower' for i in rows):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -7,6 +7,7 @@
 Tong Zhang <zhangt@frib.msu.edu>
 """
 
+from functools import lru_cache
 from getpass import getuser
 from pandas import DataFrame
 import numpy as np
@@ -14,8 +15,55 @@ import pathlib
 import json
 
 CDIR_PATH = pathlib.Path(__file__).parent
-with open(CDIR_PATH.joinpath("template.json"), "r") as fp:
-    TEMP_AS_JSON_DATA = json.load(fp)
+
+
+@lru_cache(maxsize=1)
+def _load_as_template():
+    # template of Allison scanner data, loaded at the first export
+    with open(CDIR_PATH.joinpath("template.json"), "r") as fp:
+        return json.load(fp)
+
+
+def to_dense_array(x, v, y=None, shape: tuple=None, fill: float=0,
+                   dtype=float) -> np.ndarray:
+    """Scatter the sparse channel data of x, [y], v into a dense array in one
+    vectorized step.
+
+    Parameters
+    ----------
+    x : array
+        Channel index along x axis.
+    v : array
+        Count of each channel.
+    y : array
+        Channel index along y axis, None for 1D data.
+    shape : tuple
+        Shape of the dense array, ``(nx, )`` for 1D, ``(ny, nx)`` for 2D,
+        use the maximum channel index of x, y to build by default.
+    fill : float
+        Fill empty channels with a number (default is 0) or nan.
+    dtype :
+        Data type of the dense array, default is float.
+
+    Returns
+    -------
+    r : ndarray
+        1D array indexed by x, or 2D array indexed by (y, x).
+    """
+    x = np.asarray(x, dtype=np.intp)
+    if y is None:
+        if shape is None:
+            shape = (x.max() + 1 if x.size else 0, )
+        arr = np.full(shape, fill, dtype=dtype)
+        arr[x] = v
+    else:
+        y = np.asarray(y, dtype=np.intp)
+        if shape is None:
+            shape = (y.max() + 1 if y.size else 0,
+                     x.max() + 1 if x.size else 0)
+        arr = np.full(shape, fill, dtype=dtype)
+        arr[y, x] = v
+    return arr
 
 
 def to_image_tuple(df: DataFrame, nan_as_num: float=None, **kws) -> tuple:
@@ -25,7 +73,7 @@ def to_image_tuple(df: DataFrame, nan_as_num: float=None, **kws) -> tuple:
     Parameters
     ----------
     df : DataFrame
-        Data of spectrum with x, y, v columns.
+        Data of spectrum with x, y, v (or count) columns.
     nan_as_num : float
         Fill empty with nan (default) or a defined number.
 
@@ -42,6 +90,10 @@ def to_image_tuple(df: DataFrame, nan_as_num: float=None, **kws) -> tuple:
         A tuple of ndarray for MatplotlibImageWidget, ``(xx, yy, zz)``,
         with the same shape, ``zz`` could be used to update the image,
         ``xx`` and ``yy`` are 2D array for extent.
+
+    See Also
+    --------
+    :func:`~spectcl.to_dense_array`
     """
     if nan_as_num is None:
         vfill = np.nan
@@ -50,11 +102,8 @@ def to_image_tuple(df: DataFrame, nan_as_num: float=None, **kws) -> tuple:
     x = kws.get('x', np.arange(df.x.max() + 1))
     y = kws.get('y', np.arange(df.y.max() + 1))
     xx, yy = np.meshgrid(x, y)
-    zz = np.empty(xx.shape)
-    zz.fill(vfill)
-    def _f(irow):
-        zz[int(irow.y)][int(irow.x)] = irow.v
-    df.apply(_f, axis=1)
+    v = df['v'] if 'v' in df else df['count']
+    zz = to_dense_array(df.x, v, df.y, shape=xx.shape, fill=vfill)
     return xx, yy, zz
 
 
@@ -80,7 +129,7 @@ def export_spectrum_for_allison(filepath, spectrum, energy : float=1.022487) ->
     vv = yy * (ek * 1000.0 / ek0)
     vstep = (vv[:,0][-1] - vv[:,0][0]) / (len(vv[:, 0]) - 1)
     # update data
-    data = TEMP_AS_JSON_DATA.copy()
+    data = _load_as_template().copy()
     data['position'] = {'end': xx.max(), 'begin': xx.min(), 'step': xstep}
     data['voltage'] = {'end': vv.max(), 'begin': vv.min(), 'step': vstep}
     data['data']['shape'] = zz.shape
@@ -0,0 +1,319 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Load test of a SpecTcl REST service, simulates concurrent viewers, each
+with its own client polling spectra at a target rate, reports the achieved
+throughput, the latency percentiles and the error rates.
+
+Examples
+--------
+Against a running SpecTcl, 8 viewers, each polls at 2 Hz for 30 seconds:
+
+    spectcl_loadtest --url http://127.0.0.1 --port 8000 -n 8 --rate 2 -t 30
+
+Against a local mock server, with 5 ms latency per request:
+
+    spectcl_loadtest --mock --mock-latency 0.005 -n 16 --rate 5 -t 10
+"""
+
+import argparse
+import json
+import sys
+import threading
+import time
+from collections import defaultdict
+
+import numpy as np
+
+# operations of the viewers
+OPERATIONS = ('get_spectrum', 'list')
+
+# latency percentiles to report
+PERCENTILES = (50, 90, 99)
+
+
+def _viewer(client, names, ops, rate, t_end, records, storage):
+    # poll *names* with the *ops* in turn at *rate* Hz until *t_end*, add
+    # (op, start time, latency, error name, late) to *records*
+    period = 1.0 / rate if rate else 0.0
+    t_next = time.perf_counter()
+    i = 0
+    while True:
+        now = time.perf_counter()
+        if now >= t_end:
+            break
+        late = False
+        if now < t_next:
+            time.sleep(min(t_next - now, t_end - now))
+            if time.perf_counter() >= t_end:
+                break
+        elif period and now - t_next > period:
+            # behind the schedule, skip the missed ticks
+            late = True
+            t_next = now
+        op = ops[i % len(ops)]
+        name = names[i % len(names)]
+        i += 1
+        t0 = time.perf_counter()
+        err = None
+        try:
+            if op == 'get_spectrum':
+                r = client.get_spectrum(name, storage=storage)
+            else:
+                r = client.list('spectrum', refresh_cache=True)
+            if r is None:
+                err = 'NoneResult'
+        except Exception as e:
+            err = type(e).__name__
+        records.append((op, t0, time.perf_counter() - t0, err, late))
+        t_next += period
+
+
+def run_load(client_factory,
+             names,
+             clients=4,
+             rate=1.0,
+             duration=10.0,
+             ops=OPERATIONS[:1],
+             storage='frame'):
+    """Run the load test.
+
+    Parameters
+    ----------
+    client_factory : callable
+        Called with no argument to create the SpecTclClient of each viewer.
+    names : list
+        Spectrum names to poll, in turn.
+    clients : int
+        Number of concurrent viewers.
+    rate : float
+        Target operations per second of each viewer, 0 for as fast as
+        possible.
+    duration : float
+        Test duration in seconds.
+    ops : list
+        Operations of each viewer in turn, 'get_spectrum' and/or 'list'.
+    storage : str
+        Storage mode of the fetched spectra.
+
+    Returns
+    -------
+    r : dict
+        The report, see :func:`summarize`.
+    """
+    viewers = [client_factory() for _ in range(clients)]
+    records = []  # list.append is thread-safe
+    t_start = time.perf_counter()
+    t_end = t_start + duration
+    threads = [
+        threading.Thread(target=_viewer,
+                         args=(c, names, ops, rate, t_end, records, storage),
+                         daemon=True) for c in viewers
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - t_start
+    wire_bytes = sum(c.metrics.totals['wire_bytes'] for c in viewers)
+    for c in viewers:
+        c.close()
+    r = summarize(records, elapsed)
+    r.update(clients=clients,
+             target_rate=rate * clients,
+             wire_bytes=wire_bytes,
+             wire_bytes_per_second=wire_bytes / elapsed)
+    return r
+
+
+def summarize(records, elapsed):
+    """Return the report of the *records* of (op, start time, latency, error
+    name, late) over *elapsed* seconds.
+
+    Returns
+    -------
+    r : dict
+        Keys of 'elapsed', 'count', 'throughput' (ops per second), 'errors'
+        (count by error name), 'error_rate', 'late' (ticks behind the
+        schedule), and 'ops', a dict of the same keys and 'latency' (of
+        'mean', 'p50', 'p90', 'p99', 'max' in seconds) for each operation.
+    """
+    by_op = defaultdict(list)
+    for rec in records:
+        by_op[rec[0]].append(rec)
+    r = _summarize(records, elapsed)
+    r['ops'] = {op: _summarize(recs, elapsed) for op, recs in by_op.items()}
+    return r
+
+
+def _summarize(records, elapsed):
+    n = len(records)
+    errors = defaultdict(int)
+    for rec in records:
+        if rec[3] is not None:
+            errors[rec[3]] += 1
+    ok = np.array([rec[2] for rec in records if rec[3] is None])
+    if ok.size:
+        latency = {'mean': float(ok.mean()), 'max': float(ok.max())}
+        for p, v in zip(PERCENTILES, np.percentile(ok, PERCENTILES)):
+            latency[f'p{p}'] = float(v)
+    else:
+        latency = {}
+    return {
+        'elapsed': elapsed,
+        'count': n,
+        'throughput': (n - sum(errors.values())) / elapsed,
+        'errors': dict(errors),
+        'error_rate': sum(errors.values()) / n if n else 0.0,
+        'late': sum(1 for rec in records if rec[4]),
+        'latency': latency,
+    }
+
+
+def print_report(r):
+    """Print the report of :func:`run_load`.
+    """
+    print(f"Viewers: {r['clients']}, elapsed: {r['elapsed']:.1f} s, "
+          f"operations: {r['count']}, late ticks: {r['late']}")
+    target = f"{r['target_rate']:.1f}" if r['target_rate'] else 'unlimited'
+    print(f"Throughput: {r['throughput']:.1f} ops/s (target {target}), "
+          f"received: {r['wire_bytes_per_second'] / 1e6:.2f} MB/s")
+    if 'server_requests' in r:
+        print(f"Requests served by the mock: {r['server_requests']}")
+    print(f"Error rate: {r['error_rate'] * 100:.2f}% {r['errors'] or ''}")
+    cols = ['mean'] + [f'p{p}' for p in PERCENTILES] + ['max']
+    print(f"{'operation':<14s} {'count':>7s} {'ops/s':>8s} " +
+          ' '.join(f"{c + '/ms':>9s}" for c in cols))
+    for op, s in r['ops'].items():
+        lat = s['latency']
+        print(f"{op:<14s} {s['count']:7d} {s['throughput']:8.1f} " +
+              ' '.join(f"{lat.get(c, float('nan')) * 1e3:9.2f}"
+                       for c in cols))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Load test of a SpecTcl REST service.")
+    parser.add_argument('--url',
+                        default='http://127.0.0.1',
+                        help="Base url of SpecTcl")
+    parser.add_argument('--port', type=int, default=8000, help="Port number")
+    parser.add_argument('--name',
+                        default='spectcl',
+                        help="Name of the REST application")
+    parser.add_argument('-n',
+                        '--clients',
+                        type=int,
+                        default=4,
+                        help="Number of concurrent viewers")
+    parser.add_argument('--rate',
+                        type=float,
+                        default=1.0,
+                        help="Target operations per second of each viewer, "
+                        "0 for as fast as possible")
+    parser.add_argument('-t',
+                        '--duration',
+                        type=float,
+                        default=10.0,
+                        help="Test duration in seconds")
+    parser.add_argument('-s',
+                        '--spectra',
+                        nargs='+',
+                        default=['*'],
+                        help="Spectrum names or a wildcard pattern to poll")
+    parser.add_argument('--ops',
+                        nargs='+',
+                        default=['get_spectrum'],
+                        choices=OPERATIONS,
+                        help="Operations of each viewer in turn")
+    parser.add_argument('--storage',
+                        default='frame',
+                        help="Storage mode of the spectra")
+    parser.add_argument('--no-coalesce',
+                        action='store_true',
+                        help="Do not coalesce the identical requests of each "
+                        "viewer")
+    parser.add_argument('--no-compress',
+                        action='store_true',
+                        help="Do not request compressed responses")
+    parser.add_argument('--timeout',
+                        type=float,
+                        default=30.0,
+                        help="Request timeout in seconds")
+    parser.add_argument('--mock',
+                        action='store_true',
+                        help="Test against a local mock SpecTcl server")
+    parser.add_argument('--mock-spectra',
+                        type=int,
+                        default=4,
+                        help="Number of 1D and 2D spectra each of the mock")
+    parser.add_argument('--mock-bins',
+                        type=int,
+                        default=512,
+                        help="Bins per axis of the mock spectra")
+    parser.add_argument('--mock-latency',
+                        type=float,
+                        default=0.0,
+                        help="Seconds the mock waits before each response")
+    parser.add_argument('--mock-bandwidth',
+                        type=float,
+                        default=None,
+                        help="Bytes per second of the mock responses")
+    parser.add_argument('--json', help="Save the report to a JSON file")
+    args = parser.parse_args()
+
+    from spectcl.data import SpecTclClient
+
+    srv = None
+    url, port = args.url, args.port
+    if args.mock:
+        from .mock_server import MockSpecTclServer
+        from .mock_server import make_demo_spectcl
+        srv = MockSpecTclServer(make_demo_spectcl(args.mock_spectra,
+                                                  args.mock_bins, seed=0),
+                                latency=args.mock_latency,
+                                bandwidth=args.mock_bandwidth).start()
+        url, port = srv.base_url, srv.port
+        # render the contents ahead, not to time the first encoding
+        encoding = 'identity' if args.no_compress else 'gzip'
+        for name in srv.spectcl._spectra:
+            srv.spectcl.contents_body(name, encoding)
+
+    def client_factory():
+        return SpecTclClient(url,
+                             port,
+                             args.name,
+                             coalesce=not args.no_coalesce,
+                             compress=not args.no_compress,
+                             timeout=args.timeout)
+
+    try:
+        c = client_factory()
+        try:
+            if len(args.spectra) == 1:
+                names = c.resolve_names(args.spectra[0])
+            else:
+                names = args.spectra
+        except Exception as err:
+            print(f"Failed to connect to {c}: {err}")
+            sys.exit(1)
+        finally:
+            c.close()
+        if not names:
+            print(f"No spectra found: {args.spectra}.")
+            return
+        r = run_load(client_factory, names, args.clients, args.rate,
+                     args.duration, args.ops, args.storage)
+        if srv is not None:
+            r['server_requests'] = srv.requests
+        print_report(r)
+        if args.json:
+            with open(args.json, 'w') as fp:
+                json.dump(r, fp, indent=2)
+            print(f"Saved report to {args.json}.")
+    finally:
+        if srv is not None:
+            srv.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,570 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""A local mock of SpecTcl REST service, for benchmarking and testing the
+clients without a running SpecTcl.
+
+Examples
+--------
+>>> from spectcl.contrib.mock_server import MockSpecTclServer
+>>> with MockSpecTclServer(latency=0.005) as srv:
+>>>     srv.spectcl.add_spectrum('big', '2', bins=1024, occupancy=0.2)
+>>>     client = srv.client()
+>>>     sp = client.get_spectrum('big')
+
+Or from the command line:
+
+    python -m spectcl.contrib.mock_server --port 8000 --spectra 10
+"""
+
+import argparse
+import fnmatch
+import gzip
+import json
+import re
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer
+from urllib.parse import parse_qs
+from urllib.parse import urlsplit
+
+import numpy as np
+
+from .synthetic import SpectrumGenerator
+
+DEFAULT_HOST = '127.0.0.1'
+
+# spectrum types and the number of parameters
+SPECTRUM_NDIM = {'1': 1, '2': 2}
+
+# gate name of ungated spectrum
+UNGATED = '-TRUE-'
+
+
+class MockSpecTcl(object):
+    """State of the mock SpecTcl: spectra with the counts, gates and gate
+    applications, served by :class:`MockSpecTclServer`.
+
+    Parameters
+    ----------
+    seed : int
+        Seed of the random counts.
+    """
+    def __init__(self, seed=None):
+        self._lock = threading.RLock()
+        self._rng = np.random.default_rng(seed)
+        self._generator = SpectrumGenerator(seed)
+        self._spectra = {}  # name: conf
+        self._channels = {}  # name: (x, y, v)
+        self._version = {}  # name: version of the counts
+        self._bodies = {}  # (name, version, encoding): encoded contents
+        self._gates = {}  # name: conf
+        self._applied = {}  # spectrum name: gate name
+
+    @property
+    def spectrum_names(self):
+        """list : Names of the defined spectra.
+        """
+        return list(self._spectra)
+
+    def add_spectrum(self,
+                     name,
+                     type='2',
+                     parameters=None,
+                     bins=512,
+                     low=0.0,
+                     high=None,
+                     chantype='long',
+                     occupancy=0.1,
+                     counts=1e6,
+                     with_gates=False):
+        """Define a synthetic spectrum, of peaks for 1D and PID blobs for 2D,
+        see :class:`~spectcl.contrib.synthetic.SpectrumGenerator`.
+
+        Parameters
+        ----------
+        name : str
+            Name of the spectrum.
+        type : str
+            Spectrum type, '1' or '2'.
+        parameters : list
+            Parameter names, default is ``[name.x, name.y]``.
+        bins : int, tuple
+            Number of bins of all or each axis.
+        low, high : float, tuple
+            Range of all or each axis, default is 0 to bins.
+        chantype : str
+            Channel type, 'long', 'word' or 'short'.
+        occupancy : float
+            Fraction of non-empty channels.
+        counts : float
+            Approximate total counts.
+        with_gates : bool
+            If set, also define the gates on the peaks or blobs.
+
+        Returns
+        -------
+        r : SyntheticSpectrum
+            The generated spectrum.
+        """
+        gen = self._generator
+        fn = gen.peaks_1d if SPECTRUM_NDIM[type] == 1 else gen.pid_2d
+        sp = fn(name,
+                bins=bins,
+                occupancy=occupancy,
+                chantype=chantype,
+                low=low,
+                high=high,
+                parameters=parameters,
+                counts=counts)
+        self.add_synthetic(sp, gen.gates(sp) if with_gates else None)
+        return sp
+
+    def add_synthetic(self, sp, gates=None):
+        """Define the spectrum from a SyntheticSpectrum *sp*, and the *gates*
+        of a list of dict as SpecTcl gate list.
+        """
+        with self._lock:
+            self.set_spectrum(sp.name, sp.type, sp.parameters, sp.axes,
+                              sp.chantype, sp.channels)
+            for g in gates or []:
+                self.add_gate(**g)
+
+    def set_spectrum(self, name, type, parameters, axes, chantype='long',
+                     channels=None):
+        """Define a spectrum, or redefine it with the counts of *channels*.
+
+        Parameters
+        ----------
+        channels : tuple
+            Arrays of the non-empty channels, ``(x, y, v)``, y is None for
+            1D, default is empty.
+        """
+        if channels is None:
+            channels = (np.zeros(0, int), None if type == '1' else np.zeros(
+                0, int), np.zeros(0, int))
+        with self._lock:
+            self._spectra[name] = {
+                'name': name,
+                'type': type,
+                'parameters': list(parameters),
+                'axes': axes,
+                'chantype': chantype,
+            }
+            self._applied.setdefault(name, UNGATED)
+            self._set_channels(name, channels)
+
+    def _set_channels(self, name, channels):
+        self._channels[name] = channels
+        self._version[name] = self._version.get(name, 0) + 1
+
+    def increment(self, name, n=1000):
+        """Add *n* random counts to the spectrum *name*, e.g. to simulate
+        the data taking.
+        """
+        with self._lock:
+            conf = self._spectra[name]
+            bins = [ax['bins'] for ax in conf['axes']]
+            x, y, v = self._channels[name]
+            size = int(np.prod(bins))
+            flat = x if y is None else y * bins[0] + x
+            counts = np.bincount(flat, weights=v, minlength=size)
+            counts += np.bincount(self._rng.integers(0, size, n),
+                                  minlength=size)
+            idx = np.flatnonzero(counts)
+            v = counts[idx].astype(np.int64)
+            if y is None:
+                self._set_channels(name, (idx, None, v))
+            else:
+                y, x = np.divmod(idx, bins[0])
+                self._set_channels(name, (x, y, v))
+
+    def add_gate(self, name, type, **conf):
+        """Define a gate, *conf* of the keys of SpecTcl gate, e.g.
+        'parameters', 'low', 'high' for slice, 'parameters', 'points' for
+        contour, 'gates' for compound gates.
+        """
+        with self._lock:
+            self._gates[name] = dict(name=name, type=type, **conf)
+
+    def apply(self, spectrum, gate):
+        """Apply *gate* to *spectrum*.
+        """
+        with self._lock:
+            if spectrum not in self._spectra or gate not in self._gates:
+                raise KeyError(f"{spectrum} or {gate}")
+            self._applied[spectrum] = gate
+
+    def handle(self, group, action, params):
+        """Return the payload of the *action* of service *group*.
+
+        Parameters
+        ----------
+        group : str
+            Service group, 'spectrum', 'gate', 'apply' or 'parameter'.
+        action : str
+            Action name.
+        params : dict
+            Query parameters, values of list of str.
+
+        Returns
+        -------
+        r : dict, str
+            The document, or the spectrum name for the contents, see
+            :meth:`contents_body`.
+        """
+        fn = getattr(self, f"_{group}_{action}", None)
+        if fn is None:
+            return _error(f"Unsupported action: {group}/{action}")
+        with self._lock:
+            try:
+                return fn({k: v[-1] for k, v in params.items()}, params)
+            except KeyError as err:
+                return _error(f"Not found: {err}")
+
+    def contents_body(self, name, encoding='identity'):
+        """Return the encoded JSON document of the contents of spectrum
+        *name*, cached until the counts change.
+        """
+        with self._lock:
+            key = (name, self._version[name], encoding)
+            body = self._bodies.get(key)
+            if body is not None:
+                return body
+            channels = self._channels[name]
+        body = _encode_contents(*channels)
+        if encoding == 'gzip':
+            body = gzip.compress(body)
+        elif encoding == 'deflate':
+            body = zlib.compress(body)
+        with self._lock:
+            for k in [k for k in self._bodies if k[0] == name]:
+                del self._bodies[k]
+            self._bodies[key] = body
+        return body
+
+    def _spectrum_list(self, p, q):
+        pattern = p.get('filter', '*')
+        return _ok([
+            dict(conf, gate=self._applied[n])
+            for n, conf in self._spectra.items()
+            if fnmatch.fnmatch(n, pattern)
+        ])
+
+    def _spectrum_contents(self, p, q):
+        name = p['name']
+        if name not in self._spectra:
+            raise KeyError(name)
+        return name
+
+    def _spectrum_create(self, p, q):
+        name = p['name']
+        if name in self._spectra:
+            return _error(f"Duplicate spectrum: {name}")
+        params = q['parameters']
+        if len(params) == 1:
+            params = params[0].split()
+        axes = [{
+            'low': float(lo),
+            'high': float(hi),
+            'bins': int(n)
+        } for lo, hi, n in re.findall(r'\{\s*(\S+)\s+(\S+)\s+(\S+)\s*\}',
+                                      p['axes'])]
+        self.set_spectrum(name, p['type'], params, axes,
+                          p.get('chantype', 'long'))
+        return _ok()
+
+    def _spectrum_delete(self, p, q):
+        name = p['name']
+        del self._spectra[name]
+        del self._channels[name]
+        del self._applied[name]
+        return _ok()
+
+    def _spectrum_clear(self, p, q):
+        pattern = p.get('pattern', '*')
+        for n, (x, y, v) in list(self._channels.items()):
+            if fnmatch.fnmatch(n, pattern):
+                self._set_channels(
+                    n, (x[:0], None if y is None else y[:0], v[:0]))
+        return _ok()
+
+    def _gate_list(self, p, q):
+        pattern = p.get('pattern', '*')
+        return _ok([
+            g for n, g in self._gates.items() if fnmatch.fnmatch(n, pattern)
+        ])
+
+    def _apply_list(self, p, q):
+        pattern = p.get('pattern', '*')
+        return _ok([{
+            'spectrum': n,
+            'gate': g
+        } for n, g in self._applied.items() if fnmatch.fnmatch(n, pattern)])
+
+    def _apply_apply(self, p, q):
+        self.apply(p['spectrum'], p['gate'])
+        return _ok()
+
+    def _parameter_list(self, p, q):
+        pattern = p.get('filter', '*')
+        r = {}
+        for conf in self._spectra.values():
+            for i, (pname, ax) in enumerate(zip(conf['parameters'],
+                                                conf['axes'])):
+                if pname not in r and fnmatch.fnmatch(pname, pattern):
+                    r[pname] = {
+                        'name': pname,
+                        'id': len(r),
+                        'bins': ax['bins'],
+                        'low': ax['low'],
+                        'hi': ax['high'],
+                        'units': '',
+                    }
+        return _ok(list(r.values()))
+
+
+def _ok(detail=None):
+    if detail is None:
+        return {'status': 'OK'}
+    return {'status': 'OK', 'detail': detail}
+
+
+def _error(msg):
+    return {'status': 'ERROR', 'detail': msg}
+
+
+def _encode_contents(x, y, v) -> bytes:
+    # JSON document of the contents, formatted from the arrays directly
+    if y is None:
+        items = [
+            f'{{"x":{i},"v":{c}}}' for i, c in zip(x.tolist(), v.tolist())
+        ]
+    else:
+        items = [
+            f'{{"x":{i},"y":{j},"v":{c}}}'
+            for i, j, c in zip(x.tolist(), y.tolist(), v.tolist())
+        ]
+    return ('{"status":"OK","detail":{"xoverflow":0,"yoverflow":0,'
+            '"channels":[' + ','.join(items) + ']}}').encode()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    # request handler of MockSpecTclServer
+    protocol_version = 'HTTP/1.1'
+    # headers and body are written separately, do not wait for the ACK
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args):
+        if self.server.verbose:
+            super().log_message(*args)
+
+    def do_GET(self):
+        srv = self.server
+        srv.count()
+        if srv.latency:
+            time.sleep(srv.latency)
+        u = urlsplit(self.path)
+        parts = u.path.strip('/').split('/')
+        if len(parts) != 3:
+            self.send_error(404)
+            return
+        _, group, action = parts
+        r = srv.spectcl.handle(group, action, parse_qs(u.query))
+        encoding = 'identity'
+        if srv.compress:
+            accepted = self.headers.get('Accept-Encoding', '')
+            for i in ('gzip', 'deflate'):
+                if i in accepted:
+                    encoding = i
+                    break
+        if isinstance(r, str):  # spectrum name of contents
+            body = srv.spectcl.contents_body(r, encoding)
+        else:
+            body = json.dumps(r).encode()
+            if encoding == 'gzip':
+                body = gzip.compress(body)
+            elif encoding == 'deflate':
+                body = zlib.compress(body)
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        if encoding != 'identity':
+            self.send_header('Content-Encoding', encoding)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self._write(body)
+
+    def _write(self, body):
+        # write the body, throttled to the bandwidth if defined
+        bw = self.server.bandwidth
+        if not bw:
+            self.wfile.write(body)
+            return
+        n = max(int(bw / 100), 1024)  # ~10 ms per chunk
+        for i in range(0, len(body), n):
+            chunk = body[i:i + n]
+            self.wfile.write(chunk)
+            time.sleep(len(chunk) / bw)
+
+
+class MockSpecTclServer(ThreadingHTTPServer):
+    """HTTP server of the mock SpecTcl REST service, serves in a background
+    thread after :meth:`start`, or use as a context manager.
+
+    Parameters
+    ----------
+    spectcl : MockSpecTcl
+        The mock SpecTcl to serve, if not defined, a new one with a few
+        spectra and gates, see :func:`make_demo_spectcl`.
+    host : str
+        Host address, default is '127.0.0.1'.
+    port : int
+        Port number, default is 0 (any free port).
+    latency : float
+        Time in seconds to wait before responding each request.
+    bandwidth : float
+        Bytes per second of the responses, default is None (unlimited).
+    compress : bool
+        If set (default), compress the responses as requested by the
+        Accept-Encoding header.
+    verbose : bool
+        If set, log the requests.
+    """
+    daemon_threads = True
+
+    def __init__(self,
+                 spectcl=None,
+                 host=DEFAULT_HOST,
+                 port=0,
+                 latency=0.0,
+                 bandwidth=None,
+                 compress=True,
+                 verbose=False):
+        self.spectcl = make_demo_spectcl() if spectcl is None else spectcl
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.compress = compress
+        self.verbose = verbose
+        self.requests = 0  # number of the served requests
+        self._count_lock = threading.Lock()
+        self._thread = None
+        super().__init__((host, port), _Handler)
+
+    def count(self):
+        # count one served request
+        with self._count_lock:
+            self.requests += 1
+
+    @property
+    def base_url(self):
+        """str : Base url for the clients, e.g. 'http://127.0.0.1'.
+        """
+        return f"http://{self.server_address[0]}"
+
+    @property
+    def port(self):
+        """int : Port number being served.
+        """
+        return self.server_address[1]
+
+    def start(self):
+        """Serve in a background thread.
+        """
+        if self._thread is None:
+            self._thread = threading.Thread(target=self.serve_forever,
+                                            daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop serving and close the socket.
+        """
+        if self._thread is not None:
+            self.shutdown()
+            self._thread.join()
+            self._thread = None
+        self.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def client(self, **kws):
+        """Return a SpecTclClient of this server, see :class:`SpecTclClient`
+        for the keyword arguments.
+        """
+        from spectcl.data import SpecTclClient
+        return SpecTclClient(self.base_url, self.port, **kws)
+
+
+def make_demo_spectcl(n=4, bins=256, occupancy=0.2, seed=None):
+    """Return a MockSpecTcl with *n* 1D (peaks) and *n* 2D (PID blobs)
+    spectra, named 's1d_<i>' and 's2d_<i>', of *bins* per axis, and the gates
+    on them, every other 2D spectrum is gated by its first blob.
+    """
+    m = MockSpecTcl(seed)
+    for i in range(n):
+        m.add_spectrum(f's1d_{i}',
+                       '1', ['p.x'],
+                       bins=bins,
+                       high=bins / 2,
+                       occupancy=min(occupancy * 4, 1),
+                       with_gates=True)
+        m.add_spectrum(f's2d_{i}',
+                       '2', ['p.x', 'p.y'],
+                       bins=bins,
+                       high=bins / 2,
+                       occupancy=occupancy,
+                       with_gates=True)
+    m.add_gate('true', 'T')
+    for i in range(0, n, 2):
+        m.apply(f's2d_{i}', f's2d_{i}_blob0')
+    return m
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Serve a mock SpecTcl REST service.")
+    parser.add_argument('--host', default=DEFAULT_HOST, help="Host address")
+    parser.add_argument('--port', type=int, default=8000, help="Port number")
+    parser.add_argument('--spectra',
+                        type=int,
+                        default=4,
+                        help="Number of 1D and 2D spectra each")
+    parser.add_argument('--bins', type=int, default=256, help="Bins per axis")
+    parser.add_argument('--occupancy',
+                        type=float,
+                        default=0.2,
+                        help="Fraction of non-empty channels of 2D spectra")
+    parser.add_argument('--latency',
+                        type=float,
+                        default=0.0,
+                        help="Seconds to wait before each response")
+    parser.add_argument('--bandwidth',
+                        type=float,
+                        default=None,
+                        help="Bytes per second of the responses")
+    parser.add_argument('--no-compress',
+                        action='store_true',
+                        help="Do not compress the responses")
+    parser.add_argument('--seed', type=int, default=None, help="Random seed")
+    parser.add_argument('-v', '--verbose', action='store_true')
+    args = parser.parse_args()
+    m = make_demo_spectcl(args.spectra, args.bins, args.occupancy, args.seed)
+    srv = MockSpecTclServer(m, args.host, args.port, args.latency,
+                            args.bandwidth, not args.no_compress,
+                            args.verbose)
+    print(f"Serving mock SpecTcl on {srv.base_url}:{srv.port}/spectcl")
+    try:
+        srv.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        srv.server_close()
+
+
+if __name__ == '__main__':
+    main()
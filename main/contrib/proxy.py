@@ -0,0 +1,631 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""A caching fan-out proxy of SpecTcl REST service, polls SpecTcl once per
+resource per interval and serves the cached responses to any number of
+downstream clients, with the same URL layout, e.g. ``SpecTclClient`` works
+with the proxy as with SpecTcl.
+
+The list (spectrum, gate, apply, parameter) and the spectrum contents
+responses are cached, the resources requested within the idle time (or
+pinned) are polled in the background, the others are dropped from the
+cache; each response is tagged with an ETag of the body, a request with the
+matching If-None-Match header is responded with 304 (Not Modified) without
+the body. The other actions (e.g. create, clear, apply) are forwarded to
+SpecTcl, after which the cached responses are refreshed on the next access.
+
+The changes of spectrum contents are pushed as server-sent events from
+``/<name>/proxy/events?name=<spectrum>&name=...``, an event of 'contents'
+with the data of ``{"name": <spectrum>, "version": <n>}`` is sent once the
+polled contents of a subscribed spectrum changed, see
+:meth:`SpecTclClient.watch`.
+
+Examples
+--------
+Serve on port 8080 the SpecTcl of port 8000, poll every second:
+
+    spectcl_proxy --url http://127.0.0.1 --port 8000 --listen-port 8080
+
+Then the clients connect to the proxy:
+
+>>> client = SpecTclClient('http://127.0.0.1', 8080)
+
+Or from Python:
+
+>>> from spectcl.contrib.proxy import SpecTclProxyServer
+>>> srv = SpecTclProxyServer(SpecTclClient(url, 8000), port=8080).start()
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer
+from urllib.parse import parse_qsl
+from urllib.parse import urlsplit
+
+from spectcl.data.utils import SingleFlight
+
+DEFAULT_HOST = '127.0.0.1'
+
+# time in seconds between the polls of the cached resources
+DEFAULT_INTERVAL = 1.0
+
+# time in seconds a resource is kept being polled after the last request
+DEFAULT_IDLE = 60.0
+
+# time in seconds between the keep-alive comments of the event streams
+DEFAULT_HEARTBEAT = 5.0
+
+# (group, action) of the cached responses
+CACHED_ACTIONS = frozenset([
+    ('spectrum', 'list'),
+    ('spectrum', 'contents'),
+    ('gate', 'list'),
+    ('apply', 'list'),
+    ('parameter', 'list'),
+])
+
+
+class _Response(object):
+    # a cached response, replaced as a whole when changed
+    __slots__ = ('status', 'body', 'etag', 'version', '_encoded')
+
+    def __init__(self, status, body, version):
+        self.status = status
+        self.body = body
+        self.etag = '"' + hashlib.blake2b(body,
+                                          digest_size=12).hexdigest() + '"'
+        self.version = version
+        self._encoded = {}
+
+    def encoded(self, encoding):
+        # the body of *encoding*, compressed at the first use
+        if encoding == 'identity':
+            return self.body
+        body = self._encoded.get(encoding)
+        if body is None:
+            body = self._encoded[encoding] = _compress(self.body, encoding)
+        return body
+
+
+class _Entry(object):
+    # a cached resource
+    __slots__ = ('response', 'fetched', 'accessed', 'stale')
+
+    def __init__(self):
+        self.response = None
+        self.fetched = None  # time of the last fetch
+        self.accessed = time.monotonic()  # time of the last request
+        self.stale = True  # fetch on the next request if set
+
+    def update(self, status, body):
+        # update with the fetched response, return True if changed
+        self.fetched = time.monotonic()
+        self.stale = False
+        r0 = self.response
+        r = _Response(status, body, 1 if r0 is None else r0.version + 1)
+        if r0 is not None and r.etag == r0.etag and status == r0.status:
+            return False
+        self.response = r
+        return True
+
+
+def _compress(body, encoding):
+    if encoding == 'gzip':
+        return gzip.compress(body, compresslevel=6)
+    if encoding == 'deflate':
+        return zlib.compress(body)
+    return body
+
+
+class SpecTclProxy(object):
+    """Cache of the SpecTcl responses, polled from SpecTcl by a background
+    thread, served by :class:`SpecTclProxyServer`.
+
+    Parameters
+    ----------
+    client : SpecTclClient
+        Client of the upstream SpecTcl, all the upstream requests are sent
+        with its session.
+    interval : float
+        Time in seconds between the polls, default is 1.0.
+    idle : float
+        Time in seconds a resource is polled after the last request, default
+        is 60.0.
+    """
+    def __init__(self, client, interval=DEFAULT_INTERVAL, idle=DEFAULT_IDLE):
+        self._client = client
+        self.interval = interval
+        self.idle = idle
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self._entries = {}  # key: _Entry
+        self._pinned = set()  # keys never dropped
+        self._inflight = SingleFlight()
+        self._stop = threading.Event()
+        self._thread = None
+        # counters
+        self.upstream_requests = 0
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def client(self):
+        """SpecTclClient : Client of the upstream SpecTcl.
+        """
+        return self._client
+
+    @property
+    def stopped(self):
+        """bool : If polling is stopped.
+        """
+        return self._stop.is_set()
+
+    def _url(self, group, action):
+        c = self._client
+        return f"{c.base_url}:{c.port}/{c.name}/{group}/{action}"
+
+    def _request(self, group, action, params):
+        # send the request to SpecTcl, return (status, body)
+        r = self._client.session.get(self._url(group, action),
+                                     params=params,
+                                     verify=False)
+        self._client.metrics.record(r)
+        with self._lock:
+            self.upstream_requests += 1
+        return r.status_code, r.content
+
+    def _refresh(self, key, entry):
+        # fetch the entry of *key*, return True if changed
+        status, body = self._inflight.do(
+            key, lambda: self._request(key[0], key[1], list(key[2])))
+        with self._lock:
+            changed = entry.update(status, body)
+            if changed:
+                self._changed.notify_all()
+            return changed
+
+    def pin(self, group, action, **params):
+        """Keep the resource polled even if not being requested, e.g.
+        ``proxy.pin('spectrum', 'contents', name='s1')``.
+        """
+        key = make_key(group, action, params.items())
+        with self._lock:
+            self._entries.setdefault(key, _Entry())
+            self._pinned.add(key)
+
+    def get(self, group, action, params):
+        """Return the cached response, fetched from SpecTcl if not cached
+        or stale.
+
+        Parameters
+        ----------
+        group : str
+            Service group.
+        action : str
+            Action name of the cached actions.
+        params : list
+            Query parameters as a list of (name, value).
+
+        Returns
+        -------
+        r : object
+            The response of 'status' (code), 'body', 'etag' and 'version'
+            (increased when the body changes).
+        """
+        key = make_key(group, action, params)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = self._entries[key] = _Entry()
+            entry.accessed = time.monotonic()
+            stale = entry.stale
+            if stale:
+                self.misses += 1
+            else:
+                self.hits += 1
+        if stale:
+            self._refresh(key, entry)
+        return entry.response
+
+    def versions(self, keys):
+        """Return a dict of the response versions of *keys* (see
+        :func:`make_key`), 0 for the ones not fetched yet.
+        """
+        with self._lock:
+            return {k: self._version(k) for k in keys}
+
+    def _version(self, key):
+        entry = self._entries.get(key)
+        if entry is None or entry.response is None:
+            return 0
+        return entry.response.version
+
+    def wait_changes(self, keys, versions, timeout):
+        """Wait until any response of *keys* (see :func:`make_key`) changes
+        from *versions*, or *timeout* seconds, the resources are kept being
+        polled while waited.
+
+        Returns
+        -------
+        r : dict
+            Keys and the new versions of the changed responses, empty if
+            timed out or stopped.
+        """
+        deadline = time.monotonic() + timeout
+        with self._changed:
+            while True:
+                now = time.monotonic()
+                changed = {}
+                for key in keys:
+                    entry = self._entries.get(key)
+                    if entry is None:  # dropped, poll it again
+                        entry = self._entries[key] = _Entry()
+                    entry.accessed = now
+                    v = self._version(key)
+                    if v != versions.get(key, 0):
+                        changed[key] = v
+                if changed or now >= deadline or self._stop.is_set():
+                    return changed
+                self._changed.wait(deadline - now)
+
+    def forward(self, group, action, params):
+        """Send the request to SpecTcl, mark all the cached responses stale
+        since the action may change them, return (status, body).
+        """
+        r = self._request(group, action, params)
+        with self._lock:
+            for entry in self._entries.values():
+                entry.stale = True
+        return r
+
+    def poll(self):
+        """Fetch all the active resources once, drop the idle ones.
+
+        Returns
+        -------
+        r : list
+            Keys of the changed resources.
+        """
+        now = time.monotonic()
+        with self._lock:
+            for key in [
+                    k for k, e in self._entries.items()
+                    if k not in self._pinned and now - e.accessed > self.idle
+            ]:
+                del self._entries[key]
+            items = list(self._entries.items())
+        changed = []
+        # lists first, in case of the new or deleted spectra
+        items.sort(key=lambda i: i[0][1] != 'list')
+        for key, entry in items:
+            if self._stop.is_set():
+                break
+            try:
+                if self._refresh(key, entry):
+                    changed.append(key)
+            except Exception as err:
+                print(f"Failed to poll {'/'.join(key[:2])}: {err}")
+        return changed
+
+    def _run(self):
+        while not self._stop.is_set():
+            t0 = time.monotonic()
+            self.poll()
+            self._stop.wait(max(self.interval - (time.monotonic() - t0), 0))
+
+    def start(self):
+        """Poll in a background thread.
+        """
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop polling.
+        """
+        if self._thread is not None:
+            self._stop.set()
+            with self._changed:
+                self._changed.notify_all()
+            self._thread.join()
+            self._thread = None
+
+    def status(self):
+        """Return a dict of the cache status.
+        """
+        with self._lock:
+            return {
+                'upstream': self._url('', '').rstrip('/'),
+                'interval': self.interval,
+                'idle': self.idle,
+                'entries': len(self._entries),
+                'pinned': len(self._pinned),
+                'upstream_requests': self.upstream_requests,
+                'hits': self.hits,
+                'misses': self.misses,
+            }
+
+
+def make_key(group, action, params):
+    """Return the cache key of the request, *params* of (name, value) pairs.
+    """
+    return (group, action, tuple(sorted(params)))
+
+
+class _Handler(BaseHTTPRequestHandler):
+    # request handler of SpecTclProxyServer
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args):
+        if self.server.verbose:
+            super().log_message(*args)
+
+    def do_GET(self):
+        srv = self.server
+        proxy = srv.proxy
+        u = urlsplit(self.path)
+        parts = u.path.strip('/').split('/')
+        if len(parts) != 3 or parts[0] != proxy.client.name:
+            self.send_error(404)
+            return
+        _, group, action = parts
+        params = parse_qsl(u.query, keep_blank_values=True)
+        if (group, action) == ('proxy', 'status'):
+            self._send(200, json.dumps(proxy.status()).encode())
+            return
+        if (group, action) == ('proxy', 'events'):
+            self._send_events([v for k, v in params if k == 'name'])
+            return
+        try:
+            if (group, action) in CACHED_ACTIONS:
+                r = proxy.get(group, action, params)
+                status, body, etag = r.status, r, r.etag
+            else:
+                status, body = proxy.forward(group, action, params)
+                etag = None
+        except Exception as err:
+            self.send_error(502, explain=str(err))
+            return
+        if etag is not None and etag in _parse_etags(
+                self.headers.get('If-None-Match', '')):
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.send_header('Cache-Control', 'no-cache')
+            self.end_headers()
+            return
+        self._send(status, body, etag)
+
+    def _send(self, status, body, etag=None):
+        # send *body* (bytes or _Response), compressed as accepted
+        encoding = 'identity'
+        accepted = self.headers.get('Accept-Encoding', '')
+        for i in ('gzip', 'deflate'):
+            if i in accepted:
+                encoding = i
+                break
+        if isinstance(body, _Response):
+            body = body.encoded(encoding)
+        else:
+            body = _compress(body, encoding)
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        if encoding != 'identity':
+            self.send_header('Content-Encoding', encoding)
+        if etag is not None:
+            self.send_header('ETag', etag)
+            self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_events(self, names):
+        # stream the changes of the contents of spectra *names*
+        proxy = self.server.proxy
+        keys = {
+            make_key('spectrum', 'contents', [('name', n)]): n
+            for n in names
+        }
+        versions = proxy.versions(keys)
+        self.close_connection = True
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        try:
+            self.wfile.write(b': subscribed\n\n')
+            while not proxy.stopped:
+                changed = proxy.wait_changes(keys, versions,
+                                             self.server.heartbeat)
+                if not changed:
+                    self.wfile.write(b': keep-alive\n\n')
+                    continue
+                versions.update(changed)
+                for key, v in changed.items():
+                    data = json.dumps({'name': keys[key], 'version': v})
+                    self.wfile.write(
+                        f'event: contents\ndata: {data}\n\n'.encode())
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+
+def _parse_etags(s):
+    # ETags of If-None-Match header, '*' matches any
+    tags = {i.strip() for i in s.split(',') if i.strip()}
+    if '*' in tags:
+        return _Any()
+    return {i[2:] if i.startswith('W/') else i for i in tags}
+
+
+class _Any(object):
+    def __contains__(self, item):
+        return True
+
+
+class SpecTclProxyServer(ThreadingHTTPServer):
+    """HTTP server of the caching proxy, serves in a background thread after
+    :meth:`start`, or use as a context manager.
+
+    Parameters
+    ----------
+    client : SpecTclClient
+        Client of the upstream SpecTcl.
+    host : str
+        Host address, default is '127.0.0.1'.
+    port : int
+        Port number, default is 0 (any free port).
+    interval : float
+        Time in seconds between the polls, default is 1.0.
+    idle : float
+        Time in seconds a resource is polled after the last request, default
+        is 60.0.
+    heartbeat : float
+        Time in seconds between the keep-alive comments of the event streams,
+        default is 5.0.
+    verbose : bool
+        If set, log the requests.
+    """
+    daemon_threads = True
+
+    def __init__(self,
+                 client,
+                 host=DEFAULT_HOST,
+                 port=0,
+                 interval=DEFAULT_INTERVAL,
+                 idle=DEFAULT_IDLE,
+                 heartbeat=DEFAULT_HEARTBEAT,
+                 verbose=False):
+        self.proxy = SpecTclProxy(client, interval, idle)
+        self.heartbeat = heartbeat
+        self.verbose = verbose
+        self._thread = None
+        super().__init__((host, port), _Handler)
+
+    @property
+    def base_url(self):
+        """str : Base url for the clients, e.g. 'http://127.0.0.1'.
+        """
+        return f"http://{self.server_address[0]}"
+
+    @property
+    def port(self):
+        """int : Port number being served.
+        """
+        return self.server_address[1]
+
+    def start(self):
+        """Poll and serve in background threads.
+        """
+        self.proxy.start()
+        if self._thread is None:
+            self._thread = threading.Thread(target=self.serve_forever,
+                                            daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop serving and polling, close the socket.
+        """
+        if self._thread is not None:
+            self.shutdown()
+            self._thread.join()
+            self._thread = None
+        self.proxy.stop()
+        self.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def client(self, **kws):
+        """Return a SpecTclClient of this server, see :class:`SpecTclClient`
+        for the keyword arguments.
+        """
+        from spectcl.data import SpecTclClient
+        return SpecTclClient(self.base_url, self.port,
+                             self.proxy.client.name, **kws)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Serve a caching proxy of SpecTcl REST service.")
+    parser.add_argument('--url',
+                        default='http://127.0.0.1',
+                        help="Base url of SpecTcl")
+    parser.add_argument('--port', type=int, default=8000, help="Port number")
+    parser.add_argument('--name',
+                        default='spectcl',
+                        help="Name of the REST application")
+    parser.add_argument('--listen-host',
+                        default=DEFAULT_HOST,
+                        help="Host address to serve")
+    parser.add_argument('--listen-port',
+                        type=int,
+                        default=8080,
+                        help="Port number to serve")
+    parser.add_argument('--interval',
+                        type=float,
+                        default=DEFAULT_INTERVAL,
+                        help="Seconds between the polls")
+    parser.add_argument('--idle',
+                        type=float,
+                        default=DEFAULT_IDLE,
+                        help="Seconds a resource is polled after the last "
+                        "request")
+    parser.add_argument('--pin',
+                        nargs='+',
+                        default=[],
+                        help="Spectrum names or wildcard patterns to always "
+                        "poll")
+    parser.add_argument('--timeout',
+                        type=float,
+                        default=30.0,
+                        help="Timeout in seconds of the upstream requests")
+    parser.add_argument('-v', '--verbose', action='store_true')
+    args = parser.parse_args()
+
+    from spectcl.data import SpecTclClient
+
+    client = SpecTclClient(args.url,
+                           args.port,
+                           args.name,
+                           coalesce=False,
+                           timeout=args.timeout)
+    srv = SpecTclProxyServer(client,
+                             args.listen_host,
+                             args.listen_port,
+                             args.interval,
+                             args.idle,
+                             verbose=args.verbose)
+    for group in ('spectrum', 'gate', 'apply'):
+        srv.proxy.pin(group, 'list')
+    names = set()
+    for i in args.pin:
+        names.update(client.resolve_names(i))
+    for name in sorted(names):
+        srv.proxy.pin('spectrum', 'contents', name=name)
+    print(f"Serving proxy of {client} on "
+          f"{srv.base_url}:{srv.port}/{args.name}, "
+          f"polling every {args.interval} s")
+    srv.proxy.start()
+    try:
+        srv.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        srv.proxy.stop()
+        srv.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,442 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Synthetic spectra and gates in the shapes of SpecTcl REST payloads, for
+load and scale testing without a beamline.
+
+Examples
+--------
+>>> from spectcl.contrib.synthetic import SpectrumGenerator
+>>> gen = SpectrumGenerator(seed=1)
+>>> sp = gen.pid_2d('pid', bins=1024, occupancy=0.05, chantype='word')
+>>> gates = gen.gates(sp)
+>>> sp.list_entry()         # entry of /spectcl/spectrum/list
+>>> sp.contents_payload()   # response of /spectcl/spectrum/contents
+>>> s = sp.to_spectrum()    # Spectrum object
+"""
+
+import numpy as np
+
+from .data import to_dense_array
+
+# spectrum types and the number of parameters
+SPECTRUM_NDIM = {'1': 1, '2': 2}
+
+# number of vertices of the contour gates
+CONTOUR_VERTICES = 12
+
+
+class SyntheticSpectrum(object):
+    """A synthetic spectrum, definition and the non-empty channels.
+
+    Parameters
+    ----------
+    name : str
+        Name of the spectrum.
+    type : str
+        Spectrum type, '1' or '2'.
+    parameters : list
+        Parameter names.
+    axes : list
+        A list of dict of 'low', 'high', 'bins' for x, [y].
+    chantype : str
+        Channel type, 'long', 'word' or 'short'.
+    x, y, v : array
+        Channel indices and counts of the non-empty channels, y is None for
+        1D.
+    features : list
+        Peaks (1D) or blobs (2D) in world coordinate, a list of dict of
+        'center', 'sigma', [and 'rho'], to define the gates.
+    """
+    def __init__(self, name, type, parameters, axes, chantype, x, y, v,
+                 features=None):
+        self.name = name
+        self.type = type
+        self.parameters = list(parameters)
+        self.axes = axes
+        self.chantype = chantype
+        self.x, self.y, self.v = x, y, v
+        self.features = [] if features is None else features
+
+    def __repr__(self):
+        shape = 'x'.join(str(ax['bins']) for ax in self.axes)
+        return (f"[Synthetic Spectrum] '{self.name}': {self.type}D "
+                f"{shape}, [{self.v.size}] entries, {self.v.sum()} counts.")
+
+    @property
+    def channels(self):
+        """tuple : Arrays of the non-empty channels, ``(x, y, v)``.
+        """
+        return self.x, self.y, self.v
+
+    @property
+    def occupancy(self):
+        """float : Fraction of the non-empty channels.
+        """
+        return self.v.size / np.prod([ax['bins'] for ax in self.axes])
+
+    def list_entry(self, gate='-TRUE-'):
+        """Return the entry of spectrum list, with the applied *gate*.
+        """
+        return {
+            'name': self.name,
+            'type': self.type,
+            'parameters': self.parameters,
+            'axes': self.axes,
+            'chantype': self.chantype,
+            'gate': gate,
+        }
+
+    def contents_detail(self):
+        """Return the detail of spectrum contents, of 'xoverflow',
+        'yoverflow' and 'channels' (a list of dict of x, [y], v).
+        """
+        if self.y is None:
+            channels = [{
+                'x': i,
+                'v': c
+            } for i, c in zip(self.x.tolist(), self.v.tolist())]
+        else:
+            channels = [{
+                'x': i,
+                'y': j,
+                'v': c
+            } for i, j, c in zip(self.x.tolist(), self.y.tolist(),
+                                 self.v.tolist())]
+        return {'xoverflow': 0, 'yoverflow': 0, 'channels': channels}
+
+    def contents_payload(self):
+        """Return the response document of spectrum contents.
+        """
+        return {'status': 'OK', 'detail': self.contents_detail()}
+
+    def to_frame(self):
+        """Return the contents as the DataFrame of x, [y], v, as the one of
+        SpecTclSpectrumClient.contents(as_raw=True).
+        """
+        import pandas as pd
+        cols = {'x': self.x.astype(np.int32)}
+        if self.y is not None:
+            cols['y'] = self.y.astype(np.int32)
+        cols['v'] = self.v
+        return pd.DataFrame(cols, copy=False)
+
+    def to_dense(self):
+        """Return the counts as a dense ndarray, x for 1D, (y, x) for 2D.
+        """
+        shape = tuple(ax['bins'] for ax in self.axes[::-1])
+        return to_dense_array(self.x, self.v, self.y, shape=shape,
+                              dtype=self.v.dtype)
+
+    def to_spectrum(self, **kws):
+        """Return as an ungated Spectrum object, see :class:`Spectrum` for the
+        keyword arguments.
+        """
+        import pandas as pd
+        from spectcl.data import Spectrum
+        conf = pd.Series({
+            'Type': self.type,
+            'Parameters': self.parameters,
+            'Axes': self.axes,
+            'ChanType': self.chantype,
+            'Gate': 'ungated',
+            'ShowGate': float('nan'),
+        })
+        return Spectrum(self.name, conf, self.to_frame(), **kws)
+
+
+class SpectrumGenerator(object):
+    """Generate realistic spectra: 1D peaks on a falling background, 2D
+    particle identification (PID) blobs along a band, and the matching
+    gates.
+
+    The counts are Poisson fluctuated from the density, the channels of the
+    highest density are kept non-empty by the defined occupancy.
+
+    Parameters
+    ----------
+    seed : int
+        Random seed.
+    """
+    def __init__(self, seed=None):
+        self._rng = np.random.default_rng(seed)
+
+    def peaks_1d(self,
+                 name,
+                 bins=1024,
+                 npeaks=3,
+                 occupancy=0.8,
+                 chantype='long',
+                 low=0.0,
+                 high=None,
+                 parameters=None,
+                 counts=1e6,
+                 background=0.1):
+        """Return a 1D spectrum of Gaussian peaks on an exponential
+        background.
+
+        Parameters
+        ----------
+        name : str
+            Name of the spectrum.
+        bins : int
+            Number of bins.
+        npeaks : int
+            Number of peaks.
+        occupancy : float
+            Fraction of the non-empty channels.
+        chantype : str
+            Channel type, the counts are clipped to its range.
+        low, high : float
+            Axis range, default is 0 to bins.
+        parameters : list
+            Parameter names, default is ``[name.x]``.
+        counts : float
+            Approximate total counts.
+        background : float
+            Fraction of the background counts.
+        """
+        rng = self._rng
+        axes = _make_axes([bins], [low], [bins if high is None else high])
+        t = (np.arange(bins) + 0.5) / bins
+        density = background * np.exp(-3 * t) / bins * 3
+        features = []
+        centers = np.sort(rng.uniform(0.1, 0.9, npeaks))
+        weights = rng.dirichlet(np.ones(npeaks)) * (1 - background)
+        for c, w in zip(centers, weights):
+            s = rng.uniform(0.005, 0.03)
+            density += w * np.exp(-0.5 * ((t - c) / s)**2) / (
+                s * bins * (2 * np.pi)**0.5)
+            features.append({
+                'center': _to_world(axes[0], c),
+                'sigma': _to_world_scale(axes[0], s),
+            })
+        idx, v = self._sample(density, occupancy, counts, chantype)
+        return SyntheticSpectrum(name, '1', parameters or [f"{name}.x"], axes,
+                                 chantype, idx[0], None, v, features)
+
+    def pid_2d(self,
+               name,
+               bins=512,
+               nblobs=6,
+               occupancy=0.1,
+               chantype='long',
+               low=0.0,
+               high=None,
+               parameters=None,
+               counts=1e6,
+               background=0.05):
+        """Return a 2D spectrum of correlated Gaussian blobs along a falling
+        band, as the dE vs TOF particle identification plot.
+
+        Parameters
+        ----------
+        name : str
+            Name of the spectrum.
+        bins : int, tuple
+            Number of bins of both or each (x, y) axis.
+        nblobs : int
+            Number of blobs.
+        occupancy : float
+            Fraction of the non-empty channels.
+        chantype : str
+            Channel type, the counts are clipped to its range.
+        low, high : float, tuple
+            Range of both or each axis, default is 0 to bins.
+        parameters : list
+            Parameter names, default is ``[name.x, name.y]``.
+        counts : float
+            Approximate total counts.
+        background : float
+            Fraction of the background counts.
+        """
+        rng = self._rng
+        bins, low, high = (np.broadcast_to(i, 2).tolist()
+                           for i in (bins, low, bins if high is None else high))
+        axes = _make_axes(bins, low, high)
+        nx, ny = bins
+        density = np.full((ny, nx),
+                          background / (nx * ny),
+                          dtype=np.float32)
+        features = []
+        weights = rng.dirichlet(np.ones(nblobs)) * (1 - background)
+        for i, w in enumerate(weights):
+            t = (i + rng.uniform(0.2, 0.8)) / nblobs
+            cx, cy = 0.1 + 0.8 * t, 0.15 + 0.7 * (1 - t)**2
+            sx, sy = rng.uniform(0.01, 0.04, 2)
+            rho = rng.uniform(-0.6, 0.6)
+            _add_blob(density, cx, cy, sx, sy, rho, w)
+            features.append({
+                'center': (_to_world(axes[0], cx), _to_world(axes[1], cy)),
+                'sigma': (_to_world_scale(axes[0], sx),
+                          _to_world_scale(axes[1], sy)),
+                'rho': rho,
+            })
+        idx, v = self._sample(density, occupancy, counts, chantype)
+        return SyntheticSpectrum(name, '2',
+                                 parameters or [f"{name}.x", f"{name}.y"],
+                                 axes, chantype, idx[1], idx[0], v, features)
+
+    def _sample(self, density, occupancy, counts, chantype):
+        # return the indices (array order) and the counts of the channels of
+        # the top density by occupancy, Poisson fluctuated.
+        rng = self._rng
+        # jitter to break the ties of the flat background
+        density = density * rng.uniform(0.5, 1.5, density.shape).astype(
+            density.dtype)
+        flat = density.ravel()
+        nnz = int(round(flat.size * min(max(occupancy, 0), 1)))
+        if nnz == 0:
+            return tuple(np.zeros(0, np.int64)
+                         for _ in density.shape), np.zeros(0, np.int64)
+        top = np.argpartition(flat, flat.size - nnz)[flat.size - nnz:]
+        top.sort()
+        lam = flat[top] * (counts / flat[top].sum())
+        v = np.maximum(rng.poisson(lam), 1)
+        vmax = np.iinfo(_chantype_dtype(chantype)).max
+        v = np.minimum(v, vmax).astype(np.int64)
+        return np.unravel_index(top, density.shape), v
+
+    def gates(self, sp, prefix=None):
+        """Return the list of gates (as SpecTcl gate list) on the features of
+        the synthetic spectrum *sp*: a slice on each peak (1D), or a contour
+        of 2 sigma on each blob and a slice on x of the first blob (2D), plus
+        the compound gates of them, named '<prefix>_or' (any), '<prefix>_and'
+        (first contour and the slice, 2D), '<prefix>_not' (not any).
+
+        Parameters
+        ----------
+        sp : SyntheticSpectrum
+            The spectrum to define gates on.
+        prefix : str
+            Prefix of the gate names, default is the spectrum name.
+        """
+        prefix = sp.name if prefix is None else prefix
+        r = []
+        if sp.type == '1':
+            for i, f in enumerate(sp.features):
+                r.append(
+                    _slice_gate(f"{prefix}_peak{i}", sp.parameters[0],
+                                f['center'], f['sigma']))
+            names = [g['name'] for g in r]
+        else:
+            for i, f in enumerate(sp.features):
+                r.append({
+                    'name': f"{prefix}_blob{i}",
+                    'type': 'c',
+                    'parameters': sp.parameters,
+                    'points': _ellipse(f['center'], f['sigma'], f['rho']),
+                })
+            names = [g['name'] for g in r]
+            if r:
+                f = sp.features[0]
+                r.append(
+                    _slice_gate(f"{prefix}_slice", sp.parameters[0],
+                                f['center'][0], f['sigma'][0]))
+                r.append({
+                    'name': f"{prefix}_and",
+                    'type': '*',
+                    'gates': [names[0], f"{prefix}_slice"],
+                })
+        if names:
+            r.append({'name': f"{prefix}_or", 'type': '+', 'gates': names})
+            r.append({
+                'name': f"{prefix}_not",
+                'type': '-',
+                'gates': [f"{prefix}_or"],
+            })
+        return r
+
+
+def list_payload(spectra, applied=None):
+    """Return the response document of spectrum list.
+
+    Parameters
+    ----------
+    spectra : list
+        A list of SyntheticSpectrum.
+    applied : dict
+        Applied gate of the spectra, keys of spectrum names.
+    """
+    applied = {} if applied is None else applied
+    return {
+        'status': 'OK',
+        'detail': [sp.list_entry(applied.get(sp.name, '-TRUE-'))
+                   for sp in spectra]
+    }
+
+
+def gate_list_payload(gates):
+    """Return the response document of gate list.
+    """
+    return {'status': 'OK', 'detail': list(gates)}
+
+
+def gate_table(gates):
+    """Return the table of the *gates* for the gate engine, as the one of
+    ``client.list('gate', clean=False)``, see :class:`GateEvaluator`.
+    """
+    from spectcl.data.client import make_gate_table
+    return make_gate_table(list(gates))
+
+
+def _chantype_dtype(chantype):
+    from spectcl.data.utils import DTYPE_MAP
+    return DTYPE_MAP[chantype]
+
+
+def _make_axes(bins, low, high):
+    return [{
+        'low': float(lo),
+        'high': float(hi),
+        'bins': int(n)
+    } for n, lo, hi in zip(bins, low, high)]
+
+
+def _to_world(ax, t):
+    # fraction of the axis range to world coordinate
+    return ax['low'] + t * (ax['high'] - ax['low'])
+
+
+def _to_world_scale(ax, s):
+    return s * abs(ax['high'] - ax['low'])
+
+
+def _add_blob(density, cx, cy, sx, sy, rho, weight):
+    # add a correlated Gaussian blob, evaluated within 5 sigma, (cx, cy) and
+    # (sx, sy) are the fractions of the axes ranges.
+    ny, nx = density.shape
+    x0, x1 = (int(max((cx - 5 * sx) * nx, 0)),
+              int(min((cx + 5 * sx) * nx + 1, nx)))
+    y0, y1 = (int(max((cy - 5 * sy) * ny, 0)),
+              int(min((cy + 5 * sy) * ny + 1, ny)))
+    if x0 >= x1 or y0 >= y1:
+        return
+    u = ((np.arange(x0, x1) + 0.5) / nx - cx) / sx
+    w = ((np.arange(y0, y1) + 0.5) / ny - cy) / sy
+    q = (u[None, :]**2 - 2 * rho * u[None, :] * w[:, None] +
+         w[:, None]**2) / (1 - rho**2)
+    norm = weight / (2 * np.pi * sx * sy * nx * ny * (1 - rho**2)**0.5)
+    density[y0:y1, x0:x1] += (norm * np.exp(-0.5 * q)).astype(density.dtype)
+
+
+def _ellipse(center, sigma, rho, nsigma=2.0, n=CONTOUR_VERTICES):
+    # vertices of the nsigma ellipse of the correlated Gaussian
+    cov = np.array([[sigma[0]**2, rho * sigma[0] * sigma[1]],
+                    [rho * sigma[0] * sigma[1], sigma[1]**2]])
+    l = np.linalg.cholesky(cov)
+    a = np.linspace(0, 2 * np.pi, n, endpoint=False)
+    pts = nsigma * (l @ np.vstack([np.cos(a), np.sin(a)]))
+    return [{
+        'x': float(center[0] + px),
+        'y': float(center[1] + py)
+    } for px, py in pts.T]
+
+
+def _slice_gate(name, parameter, center, sigma, nsigma=2.0):
+    return {
+        'name': name,
+        'type': 's',
+        'parameters': [parameter],
+        'low': float(center - nsigma * sigma),
+        'high': float(center + nsigma * sigma),
+    }
@@ -4,3 +4,7 @@ from .client import SpecTclApplyClient
 from .client import SpecTclClient
 from .spectrum import Spectrum
 from .gate import Gate
+from .async_client import AsyncSpecTclClient
+from .gate import GateEvaluator
+from .watcher import SpectrumWatcher
+from .subscription import SpectrumSubscription
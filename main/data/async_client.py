@@ -0,0 +1,263 @@
+# -*- coding: utf-8 -*-
+
+import asyncio
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from .client import SpecTclClient
+from .client import DEFAULT_APP_NAME
+from .client import DEFAULT_BASE_URL
+from .client import DEFAULT_PORT_NUMBER
+from .spectrum import Spectrum
+from .subscription import DEFAULT_WATCH_INTERVAL
+
+# maximum number of requests in flight
+DEFAULT_CONCURRENCY = 8
+
+
+class AsyncSpecTclClient(object):
+    """asyncio interface for data of spectrum, gate, apply info, all the
+    methods are coroutines which return the same objects as
+    :class:`SpecTclClient`.
+
+    The requests are sent through one pooled HTTP session by a bounded pool
+    of worker threads, so at most *concurrency* requests are in flight, the
+    coroutines could be awaited from any running event loop, e.g. Jupyter
+    notebook cells, or a Qt-integrated event loop.
+
+    Examples
+    --------
+    >>> from spectcl.client import AsyncClient
+    >>> client = AsyncClient()
+    >>> sp = await client.get_spectrum("pid::fp.pin.dE_vs_tof.rf2!FPslits")
+    >>> sp_list = await asyncio.gather(*[client.get_spectrum(i) for i in names])
+
+    From blocking code (e.g. a worker thread of a Qt app):
+
+    >>> sp = client.run(client.get_spectrum(name))
+
+    Parameters
+    ----------
+    base_url : str
+        Base url for data retrieval API, default is 'http://127.0.0.1'.
+    port : int
+        Port number for service, default is 8000.
+    name : str
+        Name of the REST application, default is 'spectcl'.
+    concurrency : int
+        Maximum number of requests in flight, default is 8, limited to the
+        connection pool size of *client* if defined and its session is
+        created by :func:`~spectcl.data.utils.make_session`; the watches of
+        :meth:`watch` run in threads of their own, but a pushed watch keeps
+        one pooled connection open.
+
+    Keyword Arguments
+    -----------------
+    client : SpecTclClient
+        Wrap an existing client, share its session and metadata snapshot.
+    Other arguments that :class:`SpecTclClient` supports, *pool_maxsize*
+    defaults to *concurrency*.
+    """
+    def __init__(self,
+                 base_url=DEFAULT_BASE_URL,
+                 port=DEFAULT_PORT_NUMBER,
+                 name=DEFAULT_APP_NAME,
+                 concurrency=DEFAULT_CONCURRENCY,
+                 **kws):
+        client = kws.pop('client', None)
+        if client is None:
+            kws.setdefault('pool_maxsize', concurrency)
+            client = SpecTclClient(base_url, port, name, **kws)
+        else:
+            # recorded by make_session, not known for other sessions
+            pool_size = getattr(client.session, 'pool_maxsize', None)
+            if pool_size is not None and concurrency > pool_size:
+                warnings.warn(f"Concurrency {concurrency} is limited to the "
+                              f"connection pool size {pool_size} of the "
+                              f"client.")
+                concurrency = pool_size
+        self._client = client
+        self._concurrency = concurrency
+        self._executor = ThreadPoolExecutor(max_workers=concurrency,
+                                            thread_name_prefix='spectcl')
+
+    @property
+    def client(self):
+        """SpecTclClient : The blocking client to work with.
+        """
+        return self._client
+
+    @property
+    def concurrency(self):
+        """int : Maximum number of requests in flight.
+        """
+        return self._concurrency
+
+    def __repr__(self):
+        return f"[SpecTcl Async Client] to {self._client.base_url}:{self._client.port}/{self._client.name}"
+
+    async def _run(self, fn, *args, **kws):
+        # run blocking *fn* in the worker threads
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor,
+                                          partial(fn, *args, **kws))
+
+    async def list(self, group, **kws):
+        """List resources as a table, see :meth:`SpecTclClient.list`.
+        """
+        return await self._run(self._client.list, group, **kws)
+
+    async def contents(self, name, **kws):
+        """Return the data of spectrum named *name*, see
+        :meth:`SpecTclSpectrumClient.contents`.
+        """
+        return await self._run(self._client._spectrum_client.contents, name,
+                               **kws)
+
+    async def get_spectrum(self, name, **kws):
+        """Return a instance of Spectrum for spectrum of the name defined by
+        *name*, see :meth:`SpecTclClient.get_spectrum`.
+        """
+        kws.pop('as_raw', None)
+        refresh_cache = kws.pop('refresh_cache', False)
+        storage = kws.pop('storage', 'frame')
+        conf = await self._run(self._client.spectrum_conf, name,
+                               refresh_cache)
+        data = await self.contents(name, as_raw=True, conf=conf, **kws)
+        return await self._run(Spectrum,
+                               name,
+                               conf,
+                               data,
+                               client=self._client,
+                               storage=storage)
+
+    async def get_spectra(self, names_or_pattern='*', **kws):
+        """Return a dict of Spectrum instances, fetched concurrently, see
+        :meth:`SpecTclClient.get_spectra`.
+
+        Returns
+        -------
+        r : tuple
+            Tuple of two dicts, ``(spectra, errors)``, keys are spectrum names,
+            values are Spectrum instances or the exceptions raised while
+            fetching.
+        """
+        kws.pop('as_raw', None)
+        refresh_cache = kws.pop('refresh_cache', False)
+        storage = kws.pop('storage', 'frame')
+        await self._run(self._client.snapshot, refresh=refresh_cache)
+        names = await self._run(self._client.resolve_names, names_or_pattern)
+        # the unknown names refresh the snapshot once for all
+        confs, errors = await self._run(self._client._spectrum_confs, names,
+                                        refresh_cache)
+
+        async def _get(name):
+            conf = confs[name]
+            data = await self.contents(name, as_raw=True, conf=conf, **kws)
+            return await self._run(Spectrum,
+                                   name,
+                                   conf,
+                                   data,
+                                   client=self._client,
+                                   storage=storage)
+
+        res = await asyncio.gather(*[_get(name) for name in confs],
+                                   return_exceptions=True)
+        spectra = {}
+        for name, r in zip(confs, res):
+            if isinstance(r, Exception):
+                errors[name] = r
+            else:
+                spectra[name] = r
+        return spectra, errors
+
+    async def watch(self,
+                    names_or_pattern='*',
+                    interval=DEFAULT_WATCH_INTERVAL,
+                    **kws):
+        """Asynchronous iterator of the Spectrum objects of the watched
+        spectra, yielded only when the contents changed, see
+        :meth:`SpecTclClient.watch`, each watch waits for the changes in a
+        thread of its own, not one of the *concurrency* workers.
+
+        Examples
+        --------
+        >>> async for sp in client.watch(['s1', 's2']):
+        >>>     update_plot(sp)
+        """
+        loop = asyncio.get_running_loop()
+        executor = ThreadPoolExecutor(max_workers=1,
+                                      thread_name_prefix='spectcl-watch')
+        sub = None
+        try:
+            sub = await loop.run_in_executor(
+                executor,
+                partial(self._client.watch, names_or_pattern, interval,
+                        **kws))
+            while True:
+                sp = await loop.run_in_executor(executor, next, sub, None)
+                if sp is None:
+                    return
+                yield sp
+        finally:
+            if sub is not None:
+                sub.close()
+            executor.shutdown(wait=False)
+
+    async def get_gate(self, name: str):
+        """Return a instance of Gate for gate of the name defined by *name*.
+        """
+        return await self._run(self._client.get_gate, name)
+
+    async def apply(self, spectrum: str, gate: str):
+        """Apply *gate* to *spectrum*.
+
+        Returns
+        -------
+        r : bool
+            True if applied, otherwise False.
+        """
+        return await self._run(self._client.apply, spectrum, gate)
+
+    async def create(self, name, type, parameters, axes, **kws):
+        """Create a new spectrum, see :meth:`SpecTclSpectrumClient.create`.
+        """
+        r = await self._run(self._client._spectrum_client.create, name, type,
+                            parameters, axes, **kws)
+        self._client.invalidate()
+        return r
+
+    async def add_spectrum(self, sp: Spectrum):
+        """Create a new spectrum, see :meth:`SpecTclClient.add_spectrum`.
+        """
+        return await self._run(self._client.add_spectrum, sp)
+
+    def run(self, coro):
+        """Run the coroutine *coro* to the end in a new event loop, for the
+        blocking code, e.g. the worker thread of a Qt app.
+
+        If called where an event loop is already running (e.g. a Jupyter
+        notebook cell), *coro* runs in a new event loop of another thread,
+        and the running loop is blocked until it is done, ``await coro``
+        instead in that case.
+        """
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run(coro)
+        with ThreadPoolExecutor(max_workers=1) as ex:
+            return ex.submit(asyncio.run, coro).result()
+
+    def close(self):
+        """Shut down the worker threads, and close the pooled connections.
+        """
+        self._executor.shutdown(wait=False)
+        self._client.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        self.close()
+
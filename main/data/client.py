@@ -1,17 +1,34 @@
 # -*- coding: utf-8 -*-
 
+import fnmatch
+import hashlib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
 import pandas as pd
-import requests
-from simplejson import JSONDecodeError
+from requests.exceptions import JSONDecodeError
 
 from .gate import Gate
+from .profiling import profiled
+from .profiling import timed
 from .spectrum import Spectrum
-from .utils import ACTION_PARAMS
+from .subscription import DEFAULT_WATCH_INTERVAL
+from .subscription import SpectrumSubscription
+from .utils import get_action_args
+from .stream import read_contents
 from .utils import make_response
+from .utils import NotFoundSpecTclDataError
+from .utils import channels_to_columns
+from .utils import make_session
+from .utils import SingleFlight
+from .utils import TransferMetrics
 from .utils import GATE_NAME_MAP
 from .utils import GATE_TYPE_MAP
 from .utils import SPEC_NAME_MAP
 from .utils import GATE_APPLY_MAP
+from .utils import DTYPE_MAP
 from .utils import DTYPE_MAP_
 from .utils import STYPE_MAP_
 
@@ -22,8 +39,17 @@ DEFAULT_GROUP_NAME = 'spectrum'
 
 VALID_GROUP_LIST = ['spectrum', 'gate', 'apply']
 
+# time in seconds of the cached metadata (spectrum, gate, apply) keeps fresh
+DEFAULT_META_TTL = 5.0
+
+# number of threads to fetch spectra in parallel
+DEFAULT_MAX_WORKERS = 8
+
 JSON_HEADERS = {"Content-Type": "application/json"}
 
+# read-only actions of which the concurrent identical requests are coalesced
+COALESCED_ACTIONS = ('list', 'contents')
+
 
 class _BaseClient(object):
     """BaseClient
@@ -34,19 +60,42 @@ class _BaseClient(object):
         Base url for data retrieval API, default is 'http://127.0.0.1'.
     port : int
         Port number for service, default is 8000.
+    session : requests.Session
+        HTTP session to send requests through, a new pooled session is
+        created if not defined.
+    metrics : TransferMetrics
+        Records of the transferred bytes, created if not defined.
+    inflight : SingleFlight
+        Requests in flight to coalesce, created if not defined.
+
+    Note
+    ----
+    The concurrent identical requests (same url and parameters) of the
+    read-only actions are coalesced into one by default, of the clients
+    sharing *inflight*, the callers share the decoded result, do not modify
+    it in place, set attribute *coalesce* to False to disable.
     """
+    # if coalesce the concurrent identical requests
+    coalesce = True
+
     def __init__(self,
                  base_url=DEFAULT_BASE_URL,
                  port=DEFAULT_PORT_NUMBER,
                  name=DEFAULT_APP_NAME,
-                 group=DEFAULT_GROUP_NAME):
+                 group=DEFAULT_GROUP_NAME,
+                 session=None,
+                 metrics=None,
+                 inflight=None):
         self.name = name
         self._base_url = base_url
         self._port = port
         self._group = group
+        self._session = make_session() if session is None else session
+        self._metrics = TransferMetrics() if metrics is None else metrics
+        self._inflight = SingleFlight() if inflight is None else inflight
         self.update_base_uri()
-        #
-        self._vlist_cache = self.list()
+        # listed on the first use
+        self._vlist_cache = None
 
     @property
     def name(self):
@@ -63,6 +112,18 @@ class _BaseClient(object):
     def group(self):
         return self._group
 
+    @property
+    def session(self):
+        """requests.Session : HTTP session for all the requests.
+        """
+        return self._session
+
+    @property
+    def metrics(self):
+        """TransferMetrics : Compressed and decoded bytes of the requests.
+        """
+        return self._metrics
+
     @property
     def port(self):
         return self._port
@@ -86,7 +147,13 @@ class _BaseClient(object):
         """
         self._base_uri = f"{self.base_url}:{self.port}/{self.name}/{self.group}"
 
-    def get(self, action, raw=False, **action_params):
+    def _get_vlist_cache(self):
+        # list the resources at the first use
+        if self._vlist_cache is None:
+            self.list(refresh_cache=True)
+        return self._vlist_cache
+
+    def get(self, action, raw=False, stream=False, **action_params):
         """Retrieve data from SpecTcl service, return as a dict.
 
         Parameters
@@ -95,6 +162,9 @@ class _BaseClient(object):
             Action name.
         raw : bool
             if set returns raw response.
+        stream : bool
+            If set, do not download the body until it is read from the raw
+            response.
 
         Keyword Argumetns
         -----------------
@@ -114,19 +184,31 @@ class _BaseClient(object):
         if not is_valid:
             return
         url = self._base_uri + '/' + action
-        r = requests.get(url, params=action_params, verify=False)
-        if raw:
-            return r
-        else:
+        if raw or stream:
+            return self._session.get(url, params=p, verify=False,
+                                     stream=stream)
+        if self.coalesce and action in COALESCED_ACTIONS:
+            # url is of the server address, i.e. base_url:port
+            key = (url, tuple(sorted((k, str(v)) for k, v in p.items())))
+            return self._inflight.do(key,
+                                     partial(self._fetch, action, url, p))
+        return self._fetch(action, url, p)
+
+    def _fetch(self, action, url, params):
+        # send the request, return the decoded detail
+        with timed('http', action=f"{self._group}/{action}") as info:
+            r = self._session.get(url, params=params, verify=False)
+            info['nbytes'] = self._metrics.record(r)['wire_bytes']
+        with timed('decode'):
             return make_response(r)
 
     def validate_action(self, action, action_params):
-        params = ACTION_PARAMS[self._group][action]
+        valid_args = get_action_args(self._group, action)
         for i in action_params:
-            if i not in params['arg']:
+            if i not in valid_args:
                 print('-- {} is not a valid action parameter.'.format(i))
                 print("-- Valid action Parameters of {}: {}".format(
-                    self._group, ','.join(params)))
+                    self._group, ','.join(sorted(valid_args))))
                 return False
         return True
 
@@ -140,8 +222,12 @@ class SpecTclSpectrumClient(_BaseClient):
     def __init__(self,
                  base_url=DEFAULT_BASE_URL,
                  port=DEFAULT_PORT_NUMBER,
-                 name=DEFAULT_APP_NAME):
-        super(self.__class__, self).__init__(base_url, port, name, "spectrum")
+                 name=DEFAULT_APP_NAME,
+                 session=None,
+                 metrics=None,
+                 inflight=None):
+        super(self.__class__, self).__init__(base_url, port, name, "spectrum",
+                                             session, metrics, inflight)
 
     def list(self, **kws):
         """List defined spectra.
@@ -180,21 +266,43 @@ class SpecTclSpectrumClient(_BaseClient):
         -----------------
         as_raw : bool
             If set, return data with original column names.
+        conf : pd.Series
+            Spectrum configuration, used to name and type the columns, if not
+            set, look up from the cached spectra info (for not *as_raw*).
         refresh_cache : bool
             If set, refresh the cache of spectra info.
+        stream : bool
+            If set, parse the channels incrementally while receiving, to bound
+            the memory for very large spectra.
         Other arguments that client.get('contents') supports.
         """
         as_raw = kws.pop('as_raw', False)
         refresh_cache = kws.pop('refresh_cache', False)
+        spec_conf = kws.pop('conf', None)
+        stream = kws.pop('stream', False)
+        if spec_conf is None:
+            ndim, dtype = None, None
+        else:
+            ndim = len(spec_conf.Parameters)
+            dtype = DTYPE_MAP.get(spec_conf.ChanType)
         try:
-            data = self.get("contents", name=name, **kws)
+            if stream:
+                cols = self._stream_contents(name, ndim, dtype, **kws)
+            else:
+                cols = self.get("contents", name=name, **kws)['channels']
         except JSONDecodeError:
             return None
         else:
-            df = pd.DataFrame.from_dict(data['channels'])
-            self.list(refresh_cache=refresh_cache)
-            spec_conf = self._vlist_cache.loc[name]
+            with timed('frame', name=name):
+                if not stream:
+                    cols = channels_to_columns(cols, ndim, dtype)
+                df = pd.DataFrame(cols, copy=False)
             if not as_raw:
+                if spec_conf is None:
+                    if refresh_cache or name not in self._get_vlist_cache(
+                    ).index:
+                        self.list(refresh_cache=True)
+                    spec_conf = self._vlist_cache.loc[name]
                 params = spec_conf.Parameters
                 if len(params) == 1:  # type '1'
                     df.rename(columns={
@@ -211,6 +319,50 @@ class SpecTclSpectrumClient(_BaseClient):
                               inplace=True)
             return df
 
+    def _stream_contents(self, name, ndim=None, dtype=None, **kws):
+        # channel columns of spectrum contents, parsed from streamed response
+        with timed('http', action='spectrum/contents'):
+            r = self.get("contents", raw=True, stream=True, name=name, **kws)
+        if not r.ok:
+            r.close()
+            raise NotFoundSpecTclDataError
+        with timed('stream', name=name):
+            data = read_contents(r, ndim, dtype, metrics=self._metrics)
+        if data['status'] != 'OK':
+            raise NotFoundSpecTclDataError
+        return data['detail']['channels']
+
+    def _contents_if_changed(self, name, tag=None, conf=None):
+        # (tag, DataFrame of raw columns) of the contents, DataFrame is None
+        # if not changed since *tag*, the ETag of the response if tagged by
+        # the server (e.g. the caching proxy), otherwise the digest of body
+        headers = {}
+        if tag is not None and tag.startswith('"'):
+            headers['If-None-Match'] = tag
+        with timed('http', action='spectrum/contents') as info:
+            r = self._session.get(self._base_uri + '/contents',
+                                  params={'name': name},
+                                  headers=headers,
+                                  verify=False)
+            info['nbytes'] = self._metrics.record(r)['wire_bytes']
+        if r.status_code == 304:
+            return tag, None
+        new_tag = r.headers.get('ETag') or hashlib.blake2b(
+            r.content, digest_size=12).hexdigest()
+        if new_tag == tag:
+            return tag, None
+        with timed('decode'):
+            cols = make_response(r)['channels']
+        if conf is None:
+            ndim, dtype = None, None
+        else:
+            ndim = len(conf.Parameters)
+            dtype = DTYPE_MAP.get(conf.ChanType)
+        with timed('frame', name=name):
+            df = pd.DataFrame(channels_to_columns(cols, ndim, dtype),
+                              copy=False)
+        return new_tag, df
+
     def parameters(self, name):
         """Convenient method to return the parameters of a spectrum defined
         by *name*.
@@ -226,8 +378,8 @@ class SpecTclSpectrumClient(_BaseClient):
             A list of parameters, return None for non-existing spectrum.
         """
         try:
-            conf = self._vlist_cache.loc[name]
-        except KeyError:
+            conf = self._get_vlist_cache().loc[name]
+        except (KeyError, AttributeError):
             return None
         else:
             return conf.Parameters
@@ -273,8 +425,12 @@ class SpecTclGateClient(_BaseClient):
     def __init__(self,
                  base_url=DEFAULT_BASE_URL,
                  port=DEFAULT_PORT_NUMBER,
-                 name=DEFAULT_APP_NAME):
-        super(self.__class__, self).__init__(base_url, port, name, "gate")
+                 name=DEFAULT_APP_NAME,
+                 session=None,
+                 metrics=None,
+                 inflight=None):
+        super(self.__class__, self).__init__(base_url, port, name, "gate",
+                                             session, metrics, inflight)
 
     def list(self, **kws):
         """List defined gates.
@@ -294,10 +450,7 @@ class SpecTclGateClient(_BaseClient):
         r = self.get("list", **kws)
         if r == []:
             return None
-        df = pd.DataFrame.from_records(r)
-        df['Desc'] = df['type'].apply(lambda i: GATE_TYPE_MAP[i])
-        df.rename(columns=GATE_NAME_MAP, inplace=True)
-        df.set_index('Name', inplace=True)
+        df = make_gate_table(r)
         if kws.get('refresh_cache', False):
             self._vlist_cache = df
         return df
@@ -309,8 +462,12 @@ class SpecTclApplyClient(_BaseClient):
     def __init__(self,
                  base_url=DEFAULT_BASE_URL,
                  port=DEFAULT_PORT_NUMBER,
-                 name=DEFAULT_APP_NAME):
-        super(self.__class__, self).__init__(base_url, port, name, "apply")
+                 name=DEFAULT_APP_NAME,
+                 session=None,
+                 metrics=None,
+                 inflight=None):
+        super(self.__class__, self).__init__(base_url, port, name, "apply",
+                                             session, metrics, inflight)
 
     def list(self, only_gated=False, **kws):
         """List gate applying status to a spectrum
@@ -352,6 +509,7 @@ class SpecTclApplyClient(_BaseClient):
             True if applied, otherwise False.
         """
         r = self.get("apply", raw=True, spectrum=spectrum, gate=gate, **kws)
+        self._metrics.record(r)
         if r.json()['status'] == 'OK':
             print(f"Applied {gate} to {spectrum}")
             return True
@@ -370,24 +528,87 @@ class SpecTclClient(object):
     >>> sp = client.get_spectrum("pid::fp.pin.dE_vs_tof.rf2!FPslits")
     >>> sp.gate
     >>> sp.gate = <gate name>
+
+    Parameters
+    ----------
+    base_url : str
+        Base url for data retrieval API, default is 'http://127.0.0.1'.
+    port : int
+        Port number for service, default is 8000.
+    name : str
+        Name of the REST application, default is 'spectcl'.
+    session : requests.Session
+        HTTP session shared by all the sub-clients, if not defined, a new
+        pooled session is created with the following keyword arguments.
+    meta_ttl : float
+        Time in seconds the metadata snapshot of spectra, gates and gate
+        applications keeps fresh, default is 5.0, None never expires until
+        being invalidated, see :meth:`snapshot` and :meth:`invalidate`.
+    prefetch : bool
+        If set, fetch the metadata snapshot in a background thread, otherwise
+        (default) no request is sent until the first use.
+    coalesce : bool
+        If set (default), the concurrent identical list and contents requests
+        of this client (e.g. from threads, widgets polling the same spectrum)
+        share one request in flight and its decoded result.
+
+    Keyword Arguments
+    -----------------
+    pool_maxsize : int
+        Maximum number of connections kept alive, default is 10.
+    timeout : float, tuple
+        Default timeout in seconds, or (connect, read) tuple, default is None.
+    max_retries : int
+        Maximum number of retries for failed connections, default is 0.
+    pool_block : bool
+        If set, block when no free connection is available in the pool.
+    compress : bool
+        If set (default), request gzip/deflate encoded responses.
     """
     def __init__(self,
                  base_url=DEFAULT_BASE_URL,
                  port=DEFAULT_PORT_NUMBER,
-                 name=DEFAULT_APP_NAME):
+                 name=DEFAULT_APP_NAME,
+                 session=None,
+                 meta_ttl=DEFAULT_META_TTL,
+                 prefetch=False,
+                 coalesce=True,
+                 **kws):
         self.name = name
         self._base_url = base_url
         self._port = port
         #
-        self._spectrum_client = SpecTclSpectrumClient(base_url, port, name)
-        self._gate_client = SpecTclGateClient(base_url, port, name)
-        self._apply_client = SpecTclApplyClient(base_url, port, name)
+        self.meta_ttl = meta_ttl
+        self._meta = None  # metadata snapshot
+        self._meta_ts = None  # timestamp of the snapshot
+        self._meta_lock = threading.RLock()
+        #
+        if session is None:
+            session = make_session(**kws)
+        self._session = session
+        self._metrics = TransferMetrics()
+        # requests in flight, shared by the sub-clients of this client only
+        inflight = SingleFlight()
+        self._spectrum_client = SpecTclSpectrumClient(base_url, port, name,
+                                                      session, self._metrics,
+                                                      inflight)
+        self._gate_client = SpecTclGateClient(base_url, port, name, session,
+                                              self._metrics, inflight)
+        self._apply_client = SpecTclApplyClient(base_url, port, name,
+                                                session, self._metrics,
+                                                inflight)
+        #
+        for c in (self._spectrum_client, self._gate_client,
+                  self._apply_client):
+            c.coalesce = coalesce
         #
         self.__list_map = {
             'spectrum': self._spectrum_client,
             'gate': self._gate_client,
             'apply': self._apply_client
         }
+        if prefetch:
+            self.prefetch()
 
     @property
     def port(self):
@@ -399,6 +620,7 @@ class SpecTclClient(object):
         for c in (self._spectrum_client, self._gate_client,
                   self._apply_client):
             c.port = i
+        self.invalidate()
 
     @property
     def base_url(self):
@@ -410,62 +632,149 @@ class SpecTclClient(object):
         for c in (self._spectrum_client, self._gate_client,
                   self._apply_client):
             c.base_url = s
+        self.invalidate()
+
+    @property
+    def session(self):
+        """requests.Session : HTTP session shared by all the sub-clients.
+        """
+        return self._session
+
+    @property
+    def metrics(self):
+        """TransferMetrics : Compressed (on the wire) and decoded bytes of the
+        most recent requests of all the sub-clients, e.g.
+        ``client.metrics.summary()``.
+        """
+        return self._metrics
+
+    def close(self):
+        """Close all the pooled connections.
+        """
+        self._session.close()
 
     def __repr__(self):
         return f"[SpecTcl Client] to {self.base_url}:{self.port}/{self.name}"
 
+    @property
+    def meta_ttl(self):
+        """float : Time in seconds the metadata snapshot keeps fresh.
+        """
+        return self._meta_ttl
+
+    @meta_ttl.setter
+    def meta_ttl(self, t):
+        self._meta_ttl = t
+
+    def invalidate(self):
+        """Invalidate the metadata snapshot, the next access will fetch
+        spectra, gates and gate applications from the server.
+        """
+        with self._meta_lock:
+            self._meta = None
+            self._meta_ts = None
+
+    def _is_meta_fresh(self):
+        if self._meta is None:
+            return False
+        if self._meta_ttl is None:
+            return True
+        return time.monotonic() - self._meta_ts < self._meta_ttl
+
+    def snapshot(self, refresh=False):
+        """Return the metadata snapshot of spectra, gates and gate applications,
+        which is shared by :meth:`list`, :meth:`get_spectrum` and
+        :meth:`get_gate`, the snapshot is fetched from the server again only
+        if it is older than :attr:`meta_ttl`, or *refresh* is set.
+
+        Parameters
+        ----------
+        refresh : bool
+            If set, fetch the snapshot from the server.
+
+        Returns
+        -------
+        r : dict
+            Keys: 'spectrum' (table of spectra with 'Gate' and 'ShowGate'
+            columns), 'gate' (table of all gates), 'apply' (table of gate
+            applications), values could be None if nothing is defined.
+        """
+        with self._meta_lock:
+            if refresh or not self._is_meta_fresh():
+                df_sp = self._spectrum_client.list(refresh_cache=True)
+                df_gate = self._gate_client.list(refresh_cache=True)
+                df_apply = self._apply_client.list(refresh_cache=True)
+                self._meta = {
+                    'spectrum': _build_spectrum_table(df_sp, df_gate,
+                                                      df_apply),
+                    'gate': df_gate,
+                    'apply': df_apply,
+                }
+                self._meta_ts = time.monotonic()
+            return self._meta
+
+    def prefetch(self):
+        """Fetch the metadata snapshot in a background thread, the access
+        during fetching waits for it instead of sending the requests again.
+
+        Returns
+        -------
+        r : threading.Thread
+            The thread of fetching.
+        """
+        def _fetch():
+            try:
+                self.snapshot()
+            except Exception as err:
+                print(f"Failed to prefetch metadata: {err}")
+
+        th = threading.Thread(target=_fetch, daemon=True)
+        th.start()
+        return th
+
     def list(self, group, **kws):
-        """List resources as a table.
+        """List resources as a table, from the metadata snapshot.
 
         Parameters
         ----------
         group : str
-            spectrum, gate.
-        
+            spectrum, gate, apply.
+
         Keyword Arguments
         -----------------
         filter : str
-            Search pattern.
+            Search pattern (Unix wildcard).
+        pattern : str
+            Alias of *filter*.
         clean : str
             Only work with group of 'gate', default is True.
+        only_gated : bool
+            Only work with group of 'apply', default is False.
+        refresh_cache : bool
+            If set, refresh the metadata snapshot.
         """
         clean_gate = kws.pop('clean', True)
+        only_gated = kws.pop('only_gated', False)
+        pattern = kws.pop('filter', None) or kws.pop('pattern', None)
         if group not in VALID_GROUP_LIST:
             print(
                 f"'{group}' is not one of the supported: {VALID_GROUP_LIST}.")
             return None
-        else:
-            r = self.__list_map.get(group).list(**kws)
-            if r is None:
-                return None
-            if group == 'spectrum':
-                # append gated column
-                gate_apply_data = self._apply_client.list()
-                r['Gate'] = r.apply(lambda i: gate_apply_data.loc[i.name].desc,
-                                    axis=1)
-                r.drop(columns=['gate'], inplace=True)
-                # append a column '_gate_viz': the name of gate which matches the Parameters, which is for drawing gate
-                # with the spectrum.
-                _df_gate = self.list('gate')
-                r['_params_str'] = r.apply(lambda i: str(i.Parameters), axis=1)
-                _df_gate['_params_str'] = _df_gate.apply(
-                    lambda i: str(i.Parameters), axis=1)
-                _df_gate1 = _df_gate.reset_index().set_index('_params_str')
-                _df_sp1 = r.reset_index().set_index('_params_str')
-                _idx = _df_sp1.index.intersection(_df_gate1.index)
-                _df_sp = _df_gate1.loc[_idx]['Name'].to_frame().rename(
-                    columns={
-                        'Name': 'ShowGate'
-                    }).join(_df_sp1.loc[_idx]).set_index('Name')
-                r['ShowGate'] = _df_sp['ShowGate']
-                r.drop(columns=['_params_str'], inplace=True)
-                return r
-            elif group == 'gate':
-                # remove gates with not-defined Parameters, but keep the ones with defined Gates
-                if clean_gate:
-                    r.drop(r[r.Parameters.isna() & r.Gates.isna()].index,
-                           inplace=True)
-                return r
+        r = self.snapshot(refresh=kws.pop('refresh_cache', False))[group]
+        if r is None:
+            return None
+        if pattern is not None:
+            r = r.loc[fnmatch.filter(r.index, pattern)]
+        r = r.copy()
+        if group == 'gate':
+            # remove gates with not-defined Parameters, but keep the ones with defined Gates
+            if clean_gate:
+                r.drop(r[r.Parameters.isna() & r.Gates.isna()].index,
+                       inplace=True)
+        elif group == 'apply':
+            if only_gated:
+                r = r.loc[r['gate'] != '-TRUE-']
+        return r
 
     def add_spectrum(self, sp: Spectrum):
         """Create a new spectrum.
@@ -476,7 +785,8 @@ class SpecTclClient(object):
             New added Spectrum object.
         """
         # test if the name is existing
-        if sp.name in self.list('spectrum').index:
+        df_sp = self.list('spectrum')
+        if df_sp is not None and sp.name in df_sp.index:
             print(
                 "The spectrum is already defined, please give a different name."
             )
@@ -493,8 +803,22 @@ class SpecTclClient(object):
         )
         if r is not None:
             # return the new created spectrum as a Spectrum object.
+            self.invalidate()
             return self.get_spectrum(sp.name)
 
+    def apply(self, spectrum: str, gate: str):
+        """Apply *gate* to *spectrum*, and invalidate the metadata snapshot.
+
+        Returns
+        -------
+        r : bool
+            True if applied, otherwise False.
+        """
+        r = self._apply_client.apply(spectrum, gate)
+        self.invalidate()
+        return r
+
+    @profiled('get_spectrum')
     def get_spectrum(self, name, **kws):
         """Return a instance of Spectrum for spectrum of the name defined by *name*.
 
@@ -507,6 +831,9 @@ class SpecTclClient(object):
         -----------------
         refresh_cache : bool
             If set, refresh the cache of spectra info.
+        storage : str
+            Storage mode of the contents, 'frame' (default), 'dense',
+            'sparse' or 'auto', see :class:`Spectrum`.
 
         Returns
         -------
@@ -515,13 +842,173 @@ class SpecTclClient(object):
         """
         kws.pop('as_raw', None)
         refresh_cache = kws.pop('refresh_cache', False)
-        for c in (self._spectrum_client, self._gate_client,
-                  self._apply_client):
-            c.list(refresh_cache=refresh_cache)
-        _spectrum_df = self.list('spectrum')
-        data = self._spectrum_client.contents(name, as_raw=True, **kws)
-        conf = _spectrum_df.loc[name]
-        return Spectrum(name, conf, data, client=self)
+        storage = kws.pop('storage', 'frame')
+        conf = self.spectrum_conf(name, refresh_cache)
+        data = self._spectrum_client.contents(name,
+                                              as_raw=True,
+                                              conf=conf,
+                                              **kws)
+        return Spectrum(name, conf, data, client=self, storage=storage)
+
+    def spectrum_conf(self, name, refresh=False):
+        """Return the configuration of spectrum *name* from the metadata
+        snapshot, which is refreshed once if *name* is not found, e.g. the
+        spectrum is created after the snapshot.
+
+        Parameters
+        ----------
+        name : str
+            Name of the spectrum.
+        refresh : bool
+            If set, refresh the metadata snapshot first.
+
+        Returns
+        -------
+        r : pd.Series
+            Spectrum configuration, raise KeyError if not defined.
+        """
+        df_sp = self.snapshot(refresh=refresh)['spectrum']
+        if not refresh and (df_sp is None or name not in df_sp.index):
+            df_sp = self.snapshot(refresh=True)['spectrum']
+        if df_sp is None or name not in df_sp.index:
+            raise KeyError(f"Spectrum '{name}' is not defined.")
+        return df_sp.loc[name]
+
+    def _spectrum_confs(self, names, refreshed=False):
+        # return (confs, errors) of spectra *names*, the snapshot is refreshed
+        # at most once for all the unknown names, unless *refreshed*.
+        df_sp = self.snapshot()['spectrum']
+        known = set() if df_sp is None else set(df_sp.index)
+        if not refreshed and any(i not in known for i in names):
+            df_sp = self.snapshot(refresh=True)['spectrum']
+            known = set() if df_sp is None else set(df_sp.index)
+        confs, errors = {}, {}
+        for name in names:
+            if name in known:
+                confs[name] = df_sp.loc[name]
+            else:
+                errors[name] = KeyError(f"Spectrum '{name}' is not defined.")
+        return confs, errors
+
+    def resolve_names(self, names_or_pattern, **kws):
+        """Return a list of spectrum names.
+
+        Parameters
+        ----------
+        names_or_pattern : str, list
+            A list of spectrum names, or Unix wildcard pattern of names.
+
+        Keyword Arguments
+        -----------------
+        refresh_cache : bool
+            If set, refresh the metadata snapshot.
+        """
+        if not isinstance(names_or_pattern, str):
+            return list(names_or_pattern)
+        df_sp = self.snapshot(refresh=kws.get('refresh_cache',
+                                              False))['spectrum']
+        if df_sp is None:
+            return []
+        return fnmatch.filter(df_sp.index, names_or_pattern)
+
+    def get_spectra(self,
+                    names_or_pattern='*',
+                    max_workers=DEFAULT_MAX_WORKERS,
+                    **kws):
+        """Return a dict of Spectrum instances, fetched in parallel, with the
+        metadata snapshot resolved only once.
+
+        Parameters
+        ----------
+        names_or_pattern : str, list
+            A list of spectrum names, or Unix wildcard pattern of names,
+            default is '*' (all).
+        max_workers : int
+            Number of threads to fetch the contents and build the Spectrum
+            objects, should not be larger than the HTTP connection pool size
+            (*pool_maxsize*), default is 8.
+
+        Keyword Arguments
+        -----------------
+        refresh_cache : bool
+            If set, refresh the metadata snapshot.
+        storage : str
+            Storage mode of the contents, 'frame' (default), 'dense',
+            'sparse' or 'auto'.
+
+        Returns
+        -------
+        r : tuple
+            Tuple of two dicts, ``(spectra, errors)``, keys are spectrum names,
+            values are Spectrum instances or the exceptions raised while
+            fetching, KeyError for the names not defined after refreshing the
+            snapshot once.
+
+        Examples
+        --------
+        >>> spectra, errors = client.get_spectra('pid::*')
+        """
+        kws.pop('as_raw', None)
+        refresh_cache = kws.pop('refresh_cache', False)
+        storage = kws.pop('storage', 'frame')
+        self.snapshot(refresh=refresh_cache)
+        names = self.resolve_names(names_or_pattern)
+        confs, errors = self._spectrum_confs(names, refresh_cache)
+
+        def _get(name):
+            conf = confs[name]
+            data = self._spectrum_client.contents(name,
+                                                  as_raw=True,
+                                                  conf=conf,
+                                                  **kws)
+            return Spectrum(name, conf, data, client=self, storage=storage)
+
+        spectra = {}
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            futures = {name: pool.submit(_get, name) for name in confs}
+            for name, f in futures.items():
+                try:
+                    spectra[name] = f.result()
+                except Exception as err:
+                    errors[name] = err
+        return spectra, errors
+
+    def watch(self,
+              names_or_pattern='*',
+              interval=DEFAULT_WATCH_INTERVAL,
+              **kws):
+        """Return an iterator of the Spectrum objects of the watched spectra,
+        yielded only when the contents changed, instead of polling in a
+        loop; the changes are pushed if the client is connected to the caching
+        proxy, see :class:`SpectrumSubscription`.
+
+        Parameters
+        ----------
+        names_or_pattern : str, list
+            A list of spectrum names, or Unix wildcard pattern of names,
+            default is '*' (all).
+        interval : float
+            Time in seconds between the polls if not pushed, default is 1.0.
+
+        Keyword Arguments
+        -----------------
+        push : bool
+            If set (default), use the event stream of the server if supported.
+        storage : str
+            Storage mode of the contents, 'frame' (default), 'dense',
+            'sparse' or 'auto'.
+
+        Returns
+        -------
+        r : SpectrumSubscription
+            Iterator of Spectrum, call its ``close()`` to stop watching.
+
+        Examples
+        --------
+        >>> for sp in client.watch('pid::*', interval=0.5):
+        >>>     print(sp.name, sp.stats())
+        """
+        return SpectrumSubscription(self, names_or_pattern, interval, **kws)
 
     def get_gate(self, name: str):
         """Return a instance of Gate for gate of the name defined by *name*.
@@ -536,13 +1023,62 @@ class SpecTclClient(object):
         r : Gate
             Gate instance.
         """
-        df_gate = self.list('gate')
-        if name in df_gate.index:
+        df_gate = self.snapshot()['gate']
+        if df_gate is not None and name in df_gate.index:
             return Gate(df_gate.loc[name])
         else:
             return None
 
 
+def make_gate_table(records: list):
+    """Return the table of gate configurations from the list of gates of
+    SpecTcl, e.g. ``[{'name': 'g1', 'type': 's', 'parameters': ['p1'],
+    'low': 1, 'high': 2}, ...]``, as the one of SpecTclGateClient.list().
+    """
+    df = pd.DataFrame.from_records(records)
+    df['Desc'] = df['type'].apply(lambda i: GATE_TYPE_MAP[i])
+    df.rename(columns=GATE_NAME_MAP, inplace=True)
+    # the attributes not defined by any gate, e.g. no compound gates
+    for c in GATE_NAME_MAP.values():
+        if c not in df:
+            df[c] = float('nan')
+    df.set_index('Name', inplace=True)
+    return df
+
+
+def _build_spectrum_table(df_sp, df_gate, df_apply):
+    """Return the table of spectra with the columns of 'Gate': the applied gate,
+    and 'ShowGate': the name of gate which matches the Parameters, which is
+    for drawing gate with the spectrum.
+    """
+    if df_sp is None:
+        return None
+    r = df_sp.copy()
+    # append gated column
+    if df_apply is None:
+        r['Gate'] = GATE_APPLY_MAP['-TRUE-']
+    else:
+        r['Gate'] = df_apply['desc'].reindex(r.index)
+    r.drop(columns=['gate'], inplace=True, errors='ignore')
+    if df_gate is None:
+        r['ShowGate'] = float('nan')
+        return r
+    _df_gate = df_gate.drop(
+        df_gate[df_gate.Parameters.isna() & df_gate.Gates.isna()].index)
+    r['_params_str'] = r.Parameters.apply(str)
+    _df_gate['_params_str'] = _df_gate.Parameters.apply(str)
+    _df_gate1 = _df_gate.reset_index().set_index('_params_str')
+    _df_sp1 = r.reset_index().set_index('_params_str')
+    _idx = _df_sp1.index.intersection(_df_gate1.index)
+    _df_sp = _df_gate1.loc[_idx]['Name'].to_frame().rename(columns={
+        'Name': 'ShowGate'
+    }).join(_df_sp1.loc[_idx]).set_index('Name')
+    # keep the first one if more than one gates match
+    r['ShowGate'] = _df_sp.loc[~_df_sp.index.duplicated(), 'ShowGate']
+    r.drop(columns=['_params_str'], inplace=True)
+    return r
+
+
 if __name__ == '__main__':
     import matplotlib.pyplot as plt
     from pandas import DataFrame
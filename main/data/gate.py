@@ -1,9 +1,15 @@
 # -*- coding: utf-8 -*-
 
+from functools import lru_cache
+
+import numpy as np
 import pandas as pd
-from matplotlib.patches import Polygon
 
 from .utils import is_nan
+from .utils import map_channel
+
+# maximum number of cached channel-grid masks
+MASK_CACHE_SIZE = 64
 
 
 class Gate:
@@ -13,7 +19,8 @@ class Gate:
     ----------
     conf : pd.Series
         Gate configuration, referenced from `client.list('gate')`,
-        including the value of attributes of 'Type', 'Gates', 'Parameters', 'Points', 'Desc'.
+        including the value of attributes of 'Type', 'Gates', 'Parameters', 'Points', 'Desc',
+        and 'Low', 'High' (slice gates), 'Value' (mask gates) if defined.
     """
     def __init__(self, conf: pd.Series):
         self.name = conf.name
@@ -22,7 +29,20 @@ class Gate:
         self.gates = None if is_nan(conf.Gates) else conf.Gates # a list of related gate names
         self.parameters = None if is_nan(conf.Parameters) else conf.Parameters
         self.points = None if is_nan(conf.Points) else conf.Points
-    
+        self.low = _get_conf(conf, 'Low')
+        self.high = _get_conf(conf, 'High')
+        self.value = _get_conf(conf, 'Value')
+        # vertices as (N, 2) array, and the bounding box
+        if self.points is None:
+            self._vertices = None
+            self._bbox = None
+        else:
+            self._vertices = np.array([list(p.values()) for p in self.points],
+                                      dtype=float)
+            self._bbox = (*self._vertices.min(axis=0),
+                          *self._vertices.max(axis=0))
+        self._path = None
+
     def __str__(self):
         if self.gates is None: 
             s = f"Gate '{self.name}': '{self.type}' on parameters {self.parameters}"
@@ -33,6 +53,18 @@ class Gate:
             return f"Gate '{self.name}': '{self.type}' on gates {self.gates}"
     __repr__ = __str__
 
+    @property
+    def vertices(self):
+        """ndarray : N x 2 array of the (x, y) vertices, or None.
+        """
+        return self._vertices
+
+    @property
+    def bbox(self):
+        """tuple : Bounding box of the vertices, (xmin, ymin, xmax, ymax).
+        """
+        return self._bbox
+
     def is_in(self, points):
         """Test if the (x, y) points in the boundary defined by the contour gate.
 
@@ -42,12 +74,65 @@ class Gate:
             N x 2 array of (x, y) points.
         """
         if self.type == 'Contour':
-            pts = [list(p.values()) for p in self.points]
-            polygon1 = Polygon(pts)
-            return polygon1.contains_points(points)
+            if self._path is None:
+                self._path = _make_path(self._vertices)
+            return _contains_points(self._path, self._bbox,
+                                    np.asarray(points, dtype=float))
         else:
             raise NotImplementedError
 
+    def channel_mask(self, axes: list, shape: tuple = None):
+        """Return the membership mask of the channel grid of a 2D spectrum,
+        cached for the same gate vertices and spectrum axes.
+
+        Parameters
+        ----------
+        axes : list
+            Spectrum axes, a list of dict of 'low', 'high', 'bins' for x, y.
+        shape : tuple
+            Shape of the channel grid, (ny, nx), if defined, the mask is
+            cropped to it, default is the grid of the axis bins.
+
+        Returns
+        -------
+        r : tuple
+            ``(mask, (ix0, iy0))``, boolean array of the channels within the
+            bounding box of the gate, and the channel index of its origin,
+            see :meth:`is_in_channels`.
+        """
+        if self._vertices is None:
+            raise NotImplementedError
+        xax, yax = [(ax['low'], ax['high'], ax['bins']) for ax in axes]
+        key = tuple(map(tuple, self._vertices))
+        mask, (ix0, iy0) = _contour_channel_mask(key, xax, yax)
+        if shape is not None:
+            ny, nx = shape
+            mask = mask[:max(ny - iy0, 0), :max(nx - ix0, 0)]
+        return mask, (ix0, iy0)
+
+    def is_in_channels(self, ix, iy, axes: list, shape: tuple = None):
+        """Test if the channels (*ix*, *iy*) of a 2D spectrum in the boundary
+        by looking up the cached channel-grid mask.
+
+        Parameters
+        ----------
+        ix : array
+            Channel indices along x.
+        iy : array
+            Channel indices along y.
+        axes : list
+            Spectrum axes, a list of dict of 'low', 'high', 'bins' for x, y.
+        shape : tuple
+            Shape of the channel grid, (ny, nx), not required, the channels
+            out of the axis bins are not in the boundary.
+        """
+        mask, (ix0, iy0) = self.channel_mask(axes, shape)
+        h, w = mask.shape
+        ix, iy = np.asarray(ix) - ix0, np.asarray(iy) - iy0
+        r = (ix >= 0) & (ix < w) & (iy >= 0) & (iy < h)
+        r[r] = mask[iy[r], ix[r]]
+        return r
+
     def draw(self, ax, color='r', **kws):
         """Draw the gate onto *ax*.
 
@@ -67,10 +152,244 @@ class Gate:
         o :
             A drawing artist object.
         """
+        from matplotlib.patches import Polygon
+
         if self.type == "Contour":
             pts = [list(p.values()) for p in self.points]
             polygon1 = Polygon(pts, fill=False, ec=color,
                        alpha=kws.get('alpha', 0.8), ls=kws.get('ls', '--'),
                        lw=kws.get('lw', 1.0))
             ax.add_patch(polygon1)
-            return polygon1
\ No newline at end of file
+            return polygon1
+
+
+class GateEvaluator(object):
+    """Evaluate gates of any type as boolean masks on the channel grid of a
+    spectrum, the compound gates are resolved from the gate table into a DAG,
+    each gate is evaluated once and shared by the gates depending on it.
+
+    Only the gates on the parameters of the spectrum could be evaluated,
+    the conditions of the gate types:
+
+    - Slice ('s'): low <= p <= high;
+    - Contour ('c'): (p1, p2) is inside the polygon;
+    - Band ('b'): (p1, p2) is below the polyline, within its x range;
+    - Gamma Slice/Contour/Band ('gs', 'gc', 'gb'): any of the parameters
+      (pairs) on the spectrum satisfies the condition;
+    - Equal Mask ('em'): p == value;
+    - And Mask ('am'): p & value == value;
+    - Andnot Mask ('nm'): p & value == 0;
+    - Or ('+'), And ('*'), Not ('-'): of the gates;
+    - True ('T'), False ('F').
+
+    Parameters
+    ----------
+    parameters : list
+        Spectrum parameters, [x] or [x, y].
+    axes : list
+        Spectrum axes, a list of dict of 'low', 'high', 'bins' for x, [y].
+    shape : tuple
+        Shape of the channel grid, (nx, ) for 1D, (ny, nx) for 2D, not used
+        if *channels* is defined.
+    table : pd.DataFrame, callable
+        Table of gate configurations to resolve compound gates, referenced
+        from `client.list('gate', clean=False)`, or a callable returning it,
+        which is called only when a gate is looked up by name.
+    channels : tuple
+        Channel indices (ix, [iy]) to evaluate, e.g. the non-empty channels,
+        if defined, the masks are of these channels instead of the grid, the
+        contour gates are looked up in the cached channel-grid masks within
+        their bounding boxes, see :meth:`Gate.is_in_channels`.
+
+    Examples
+    --------
+    >>> ev = GateEvaluator(sp.parameters, sp.axes, (ny, nx), client.list('gate', clean=False))
+    >>> m = ev.mask('g3')
+    """
+    def __init__(self, parameters: list, axes: list, shape: tuple,
+                 table: pd.DataFrame = None, channels: tuple = None):
+        self._parameters = list(parameters)
+        self._axes = axes
+        self._table = table
+        self._channels = channels
+        self._memo = {}  # gate name: mask
+        self._visiting = set()
+        # world coordinate of each parameter, broadcastable to shape
+        self._coords = {}
+        if channels is not None:
+            channels = [np.asarray(i) for i in channels]
+            self._channels = channels
+            self._shape = channels[0].shape
+            for p, ax, ch in zip(self._parameters, axes, channels):
+                self._coords[p] = map_channel(ax['low'], ax['high'],
+                                              ax['bins'], ch)
+            return
+        self._shape = tuple(shape)
+        for i, (p, ax) in enumerate(zip(self._parameters, axes)):
+            n = self._shape[::-1][i]
+            v = map_channel(ax['low'], ax['high'], ax['bins'], np.arange(n))
+            if len(self._shape) == 2 and i == 0:
+                v = v[None, :]
+            elif len(self._shape) == 2 and i == 1:
+                v = v[:, None]
+            self._coords[p] = v
+
+    def get_gate(self, name: str):
+        """Return the Gate of *name* from the gate table.
+        """
+        if callable(self._table):
+            self._table = self._table()
+        if self._table is None or name not in self._table.index:
+            raise KeyError(f"Gate '{name}' is not defined.")
+        return Gate(self._table.loc[name])
+
+    def mask(self, gate):
+        """Return the boolean mask of the channel grid for *gate*.
+
+        Parameters
+        ----------
+        gate : str, Gate
+            Gate name or Gate instance.
+
+        Returns
+        -------
+        r : ndarray
+            Boolean array of the shape of the channel grid, or of the
+            *channels* if defined (read-only).
+        """
+        if isinstance(gate, str):
+            if gate in self._memo:
+                return self._memo[gate]
+            gate = self.get_gate(gate)
+        elif gate.name in self._memo:
+            return self._memo[gate.name]
+        if gate.name in self._visiting:
+            raise ValueError(f"Gate '{gate.name}' depends on itself.")
+        self._visiting.add(gate.name)
+        try:
+            m = np.broadcast_to(self._evaluate(gate), self._shape)
+        finally:
+            self._visiting.discard(gate.name)
+        self._memo[gate.name] = m
+        return m
+
+    def _evaluate(self, gate):
+        t = gate._type
+        if t == 'T':
+            return np.ones(self._shape, dtype=bool)
+        if t == 'F':
+            return np.zeros(self._shape, dtype=bool)
+        if t in ('+', '*', '-'):
+            masks = [self.mask(i) for i in gate.gates]
+            if t == '+':
+                return np.logical_or.reduce(masks)
+            if t == '*':
+                return np.logical_and.reduce(masks)
+            return ~masks[0]
+        params = [p for p in gate.parameters if p in self._coords]
+        if t in ('s', 'em', 'am', 'nm') and len(params) == 1 and \
+                len(gate.parameters) == 1:
+            return self._eval_1p(gate, params[0])
+        if t == 'gs' and params:
+            return np.logical_or.reduce(
+                [self._eval_1p(gate, p) for p in params])
+        if t in ('c', 'b') and params == gate.parameters and \
+                len(params) == 2:
+            return self._eval_2p(gate, *params)
+        if t in ('gc', 'gb') and len(params) == 2:
+            return self._eval_2p(gate, *params) | self._eval_2p(
+                gate, *params[::-1])
+        raise NotImplementedError(
+            f"Cannot evaluate {gate} on parameters {self._parameters}.")
+
+    def _eval_1p(self, gate, p):
+        # gates on one parameter
+        v = self._coords[p]
+        if gate._type in ('s', 'gs'):
+            return (v >= gate.low) & (v <= gate.high)
+        iv, value = v.astype(np.int64), int(gate.value)
+        if gate._type == 'em':
+            return iv == value
+        if gate._type == 'am':
+            return (iv & value) == value
+        return (iv & value) == 0
+
+    def _eval_2p(self, gate, p1, p2):
+        # gates on two parameters, (p1, p2) as the (x, y) of gate points.
+        if gate._type in ('c', 'gc'):
+            if self._channels is not None:
+                ix, iy = self._channels
+                if [p1, p2] == self._parameters:
+                    return gate.is_in_channels(ix, iy, self._axes)
+                return gate.is_in_channels(iy, ix, self._axes[::-1])
+            if [p1, p2] == self._parameters:
+                return _expand_mask(*gate.channel_mask(self._axes, self._shape),
+                                    self._shape)
+            # transposed
+            return _expand_mask(*gate.channel_mask(self._axes[::-1],
+                                                   self._shape[::-1]),
+                                self._shape[::-1]).T
+        # band: below the polyline
+        vx, vy = gate.vertices[np.argsort(gate.vertices[:, 0])].T
+        x, y = self._coords[p1], self._coords[p2]
+        return (x >= vx.min()) & (x <= vx.max()) & (y <= np.interp(x, vx, vy))
+
+
+def _get_conf(conf, key):
+    # value of *key* in gate configuration, None if not defined
+    v = conf.get(key, None)
+    return None if is_nan(v) else v
+
+
+def _expand_mask(mask, origin, shape):
+    # expand the cropped channel mask to full grid
+    r = np.zeros(shape, dtype=bool)
+    ix0, iy0 = origin
+    h, w = mask.shape
+    r[iy0:iy0 + h, ix0:ix0 + w] = mask
+    return r
+
+
+def _make_path(vertices):
+    # closed path of the polygon
+    from matplotlib.path import Path
+    return Path(np.vstack([vertices, vertices[:1]]), closed=True)
+
+
+def _contains_points(path, bbox, points):
+    # test the points in the bounding box only.
+    xmin, ymin, xmax, ymax = bbox
+    x, y = points[:, 0], points[:, 1]
+    r = (x >= xmin) & (x <= xmax) & (y >= ymin) & (y <= ymax)
+    if r.any():
+        r[r] = path.contains_points(points[r])
+    return r
+
+
+@lru_cache(maxsize=MASK_CACHE_SIZE)
+def _contour_channel_mask(vertices, xax, yax):
+    # channel-grid mask within the bounding box of the polygon *vertices*,
+    # *xax*, *yax*: (low, high, bins) of axes, on the grid of the bins, which
+    # does not change with the filled channels.
+    vertices = np.array(vertices)
+    xmin, ymin = vertices.min(axis=0)
+    xmax, ymax = vertices.max(axis=0)
+    x = map_channel(*xax, np.arange(int(xax[2])))
+    y = map_channel(*yax, np.arange(int(yax[2])))
+    ix, = np.nonzero((x >= xmin) & (x <= xmax))
+    iy, = np.nonzero((y >= ymin) & (y <= ymax))
+    if ix.size == 0 or iy.size == 0:
+        mask = np.zeros((0, 0), dtype=bool)
+        mask.flags.writeable = False
+        return mask, (0, 0)
+    xx, yy = np.meshgrid(x[ix[0]:ix[-1] + 1], y[iy[0]:iy[-1] + 1])
+    pts = np.column_stack([xx.ravel(), yy.ravel()])
+    mask = _make_path(vertices).contains_points(pts).reshape(xx.shape)
+    mask.flags.writeable = False
+    return mask, (ix[0], iy[0])
+
+
+def clear_mask_cache():
+    """Clear the cached channel-grid masks of the gates.
+    """
+    _contour_channel_mask.cache_clear()
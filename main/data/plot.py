@@ -8,6 +8,8 @@ from mpl_toolkits.axes_grid1.axes_divider import make_axes_locatable
 from matplotlib.gridspec import GridSpec
 import matplotlib.pyplot as plt
 
+from .profiling import profiled
+
 
 def get_axes_grid(nrows, ncols, w, h, **kws):
     """Get the axes grid.
@@ -35,6 +37,7 @@ def get_axes_grid(nrows, ncols, w, h, **kws):
         return fig, ax0
 
 
+@profiled('plot_image')
 def plot_image(sp,
                show_profile=True,
                show_colorbar=True,
@@ -77,20 +80,19 @@ def plot_image(sp,
     fig, ax_list: Figure, List[Axes]
         Figure and axes list (image, lines of x,yprofiles).
     """
-    df = sp.get_data(map=False)
-    xmin, xmax = df.x.min(), df.x.max() + 1
-    ymin, ymax = df.y.min(), df.y.max() + 1
+    # crop to the range of non-empty channels
+    (ix, iy), _ = sp._nonzero(map=False)
+    xmin, xmax = ix.min(), ix.max() + 1
+    ymin, ymax = iy.min(), iy.max() + 1
     fn_x, fn_y = sp._axes_map_fn[0], sp._axes_map_fn[1]
     xmin_w, xmax_w = fn_x(xmin), fn_x(xmax)
     ymin_w, ymax_w = fn_y(ymin), fn_y(ymax)
-    xrange = list(range(xmin, xmax))
-    yrange = list(range(ymin, ymax))
-    new_idx = [(ix, iy) for iy in yrange for ix in xrange]
     if fillna:
-        df1 = df.set_index(['x', 'y']).reindex(new_idx, fill_value=np.nan)
+        vfill = np.nan
     else:
-        df1 = df.set_index(['x', 'y']).reindex(new_idx, fill_value=0)
-    c_arr = df1.to_numpy().reshape(len(yrange), len(xrange))
+        vfill = 0
+    c_arr = sp.get_counts(fill=vfill, roi=(xmin, xmax, ymin, ymax))
+    xsl, ysl = slice(xmin, xmax), slice(ymin, ymax)
 
     # axes grid
     h, w = c_arr.shape
@@ -128,9 +130,6 @@ def plot_image(sp,
         cax_im.tick_params(labelsize=8)
 
     if mapped:  # show in world coordinate
-        df = sp.get_data(True).rename(
-            columns={i: j
-                     for i, j in zip(sp.parameters, ('x', 'y'))})
         xmin, xmax, ymin, ymax = xmin_w, xmax_w, ymin_w, ymax_w
         xlbl, ylbl = sp.parameters
     else:  # channel coordinate
@@ -141,22 +140,12 @@ def plot_image(sp,
 
     # x,y profile lines
     if show_profile:
-        xprof = df.groupby('x')['count'].sum().to_frame().reset_index()
-        yprof = df.groupby('y')['count'].sum().to_frame().reset_index()
-        xline = xprof.plot(x='x',
-                           y='count',
-                           ax=ax_xprof,
-                           legend=False,
-                           ds='steps',
-                           c='b',
-                           xlim=[xmin, xmax])
-        yline = yprof.plot(x='count',
-                           y='y',
-                           ax=ax_yprof,
-                           legend=False,
-                           ds='steps',
-                           c='r',
-                           ylim=[ymin, ymax])
+        xval, xprof = sp.projection(0, mapped)
+        yval, yprof = sp.projection(1, mapped)
+        xline, = ax_xprof.plot(xval[xsl], xprof[xsl], ds='steps', c='b')
+        ax_xprof.set_xlim([xmin, xmax])
+        yline, = ax_yprof.plot(yprof[ysl], yval[ysl], ds='steps', c='r')
+        ax_yprof.set_ylim([ymin, ymax])
 
         # align grid
         pos = [i.get_position() for i in ax]
@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+"""Timing hooks of the stages of the fetch pipeline.
+
+The stages are timed only when hooks are registered, each hook is called as
+``fn(stage, elapsed, info)`` with the stage name, the elapsed time in seconds
+and a dict of extra info (e.g. 'nbytes', 'name'). The instrumented stages:
+
+- 'http': HTTP round trip of a request, info of 'action', 'nbytes' (on the
+  wire);
+- 'decode': JSON decoding of the response;
+- 'stream': receiving and parsing of the streamed contents;
+- 'frame': building the DataFrame of the contents;
+- 'storage': building the array storage of Spectrum;
+- 'map_data': mapping the axes to world coordinate;
+- 'gate': resolving the gates of Spectrum;
+- 'get_spectrum': the whole SpecTclClient.get_spectrum;
+- 'stats': Spectrum.stats;
+- 'plot_image': plotting of 2D spectrum.
+
+Examples
+--------
+>>> from spectcl.data.profiling import Profiler
+>>> with Profiler() as prof:
+>>>     sp = client.get_spectrum(name)
+>>>     sp.stats()
+>>> prof.report()
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+# registered hooks, replaced (not modified) when adding or removing hooks
+_hooks = ()
+_hooks_lock = threading.Lock()
+
+
+def add_hook(fn):
+    """Register a hook *fn(stage, elapsed, info)*, called on the end of
+    every timed stage (from the thread running the stage), should be fast
+    and not raise.
+    """
+    global _hooks
+    with _hooks_lock:
+        if fn not in _hooks:
+            _hooks = _hooks + (fn, )
+
+
+def remove_hook(fn):
+    """Remove the hook *fn*.
+    """
+    global _hooks
+    with _hooks_lock:
+        _hooks = tuple(i for i in _hooks if i is not fn)
+
+
+def emit(stage, elapsed, **info):
+    """Call the hooks for the *stage* timed elsewhere.
+    """
+    for fn in _hooks:
+        fn(stage, elapsed, info)
+
+
+@contextmanager
+def timed(stage, **info):
+    """Time the block as *stage*, yield the dict of *info*, which could be
+    updated in the block, e.g. with 'nbytes'.
+    """
+    if not _hooks:
+        yield info
+        return
+    t0 = time.perf_counter()
+    try:
+        yield info
+    finally:
+        emit(stage, time.perf_counter() - t0, **info)
+
+
+def profiled(stage):
+    """Decorator to time the function as *stage*.
+    """
+    def decorator(f):
+        @wraps(f)
+        def wrapper(*args, **kws):
+            if not _hooks:
+                return f(*args, **kws)
+            with timed(stage):
+                return f(*args, **kws)
+
+        return wrapper
+
+    return decorator
+
+
+class Profiler(object):
+    """Collect the aggregate timing of the stages while being active, use as
+    a context manager, or :meth:`start` and :meth:`stop`.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def start(self):
+        """Start collecting.
+        """
+        add_hook(self)
+        return self
+
+    def stop(self):
+        """Stop collecting.
+        """
+        remove_hook(self)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def __call__(self, stage, elapsed, info):
+        nbytes = info.get('nbytes', 0)
+        with self._lock:
+            s = self._stats.get(stage)
+            if s is None:
+                self._stats[stage] = [1, elapsed, elapsed, elapsed, nbytes]
+            else:
+                s[0] += 1
+                s[1] += elapsed
+                s[2] = min(s[2], elapsed)
+                s[3] = max(s[3], elapsed)
+                s[4] += nbytes
+
+    def reset(self):
+        """Clear the collected timing.
+        """
+        with self._lock:
+            self._stats.clear()
+
+    def report(self):
+        """Return the aggregate timing table.
+
+        Returns
+        -------
+        r : DataFrame
+            Index of the stage names, columns: 'count', 'total', 'mean',
+            'min', 'max' (seconds), 'nbytes' (total bytes).
+        """
+        import pandas as pd
+        with self._lock:
+            rows = {k: list(v) for k, v in self._stats.items()}
+        df = pd.DataFrame.from_dict(
+            rows,
+            orient='index',
+            columns=['count', 'total', 'min', 'max', 'nbytes'])
+        df.insert(2, 'mean', df['total'] / df['count'])
+        df.index.name = 'stage'
+        return df.sort_values('total', ascending=False)
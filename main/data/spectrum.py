@@ -1,15 +1,21 @@
 # -*- coding: utf-8 -*-
-import matplotlib.pyplot as plt
+import warnings
+
 import numpy as np
 import pandas as pd
 from functools import partial
 
 from .gate import Gate
-from .stats import weighted_stats
-from .plot import plot_image
+from .gate import GateEvaluator
+from .profiling import profiled
+from .stats import batch_weighted_stats
 from ..contrib.data import to_image_tuple
+from ..contrib.data import to_dense_array
+from .storage import make_counts
+from .storage import roi_to_slices
 from .utils import STYPE_MAP, DTYPE_MAP
 from .utils import is_nan
+from .utils import map_channel
 
 
 class Spectrum(object):
@@ -28,6 +34,12 @@ class Spectrum(object):
     -----------------
     client : SpecTclClient
         SpecTclClient instance.
+    storage : str
+        Storage mode of the contents, 'frame' (default) keeps the table of
+        non-empty channels, 'dense' keeps the counts as a 1D/2D ndarray sized
+        from the axes bins, typed with ChanType, 'sparse' keeps the coordinate
+        list of non-empty channels, 'auto' picks 'dense' or 'sparse' by the
+        occupancy, for the array storage, the table is built on demand.
     """
     def __init__(self, name, conf, data, **kws):
         self._axes_values_channel = [
@@ -35,12 +47,17 @@ class Spectrum(object):
         self._axes_values_world = [
         ]  # list of arrays for all axes in world coordinate
         self._axes_map_fn = []  # list of func to map channel to world
+        self._mapped = False  # if columns of world coordinate are added
+        self._counts = None  # array storage of contents, None for 'frame'
         self.name = name  # == conf.index.values[0]
-        self.data = data  # update self._axes_values_channel
         self.parameters = conf.Parameters
         self.axes = conf.Axes
         self.stype = conf.Type
         self.dtype = conf.ChanType
+        self._storage = kws.get('storage', 'frame')
+        if self.stype not in ('1D', '2D'):
+            self._storage = 'frame'
+        self.data = data  # update self._axes_values_channel
         self.map_data()
         # client
         self.client = kws.get('client', None)
@@ -52,6 +69,7 @@ class Spectrum(object):
         """
         return _Spectrum(self)
 
+    @profiled('gate')
     def _set_gate(self, applied_gate: str, show_gate: str):
         """Integrate gate info.
         """
@@ -59,15 +77,13 @@ class Spectrum(object):
         if applied_gate == 'ungated':
             self._gate = None
         else:
-            self._gate = Gate(
-                self.client._gate_client.list().loc[applied_gate])
+            self._gate = self.client.get_gate(applied_gate)
 
         # show gate: the related gate, but not being applied.
         if is_nan(show_gate):
             self._show_gate = None
         else:
-            self._show_gate = Gate(
-                self.client._gate_client.list().loc[show_gate])
+            self._show_gate = self.client.get_gate(show_gate)
 
     @property
     def name(self):
@@ -79,21 +95,51 @@ class Spectrum(object):
     def name(self, s):
         self._name = s
 
+    @property
+    def storage(self):
+        """str : Storage mode of the contents, 'frame', 'dense' or 'sparse'.
+        """
+        if self._counts is None:
+            return 'frame'
+        return self._counts.kind
+
+    @property
+    def nbytes(self):
+        """int : Memory size of the contents in bytes.
+        """
+        if self._counts is None:
+            return int(self._data.memory_usage(deep=True).sum())
+        return self._counts.nbytes
+
     @property
     def data(self):
-        """DataFrame : Table of the spectral contents (channel coordinate).
+        """DataFrame : Table of the spectral contents (channel coordinate),
+        built on demand for the array storage.
         """
+        if self._data is None:
+            self._data = self._counts.to_frame()
+            self._mapped = False
         return self._data
 
     @data.setter
+    @profiled('storage')
     def data(self, data):
-        self._data = data
-        if 'x' in data:
-            _x = np.arange(data.x.max() + 1)
-            self._axes_values_channel.append(_x)
-        if 'y' in data:
-            _y = np.arange(data.y.max() + 1)
-            self._axes_values_channel.append(_y)
+        self._mapped = False
+        if self._storage == 'frame':
+            self._counts = None
+            self._data = data
+            # channels up to the last non-empty one, all the bins if empty
+            self._axes_values_channel = [
+                np.arange(data[u].max() + 1 if len(data) else ax['bins'])
+                for u, ax in zip(('x', 'y'), self.axes) if u in data
+            ]
+        else:
+            shape = tuple(ax['bins'] for ax in self.axes[::-1])
+            self._counts = make_counts(data, shape, self.dtype, self._storage)
+            self._data = None
+            self._axes_values_channel = [
+                np.arange(n) for n in self._counts.shape[::-1]
+            ]
 
     def get_axes_values(self, map=True):
         """Return a list of value of array for all axes.
@@ -117,14 +163,86 @@ class Spectrum(object):
         """
         if map:
             # return a dataframe with mapped data (world coordinate), name column with parameter
-            return self._data[self.parameters + ['count']]
+            self._map_columns()
+            return self.data[self.parameters + ['count']]
         else:
             # return x, [y], count columns of channel coordinate
-            df = self._data.loc[:, ~self._data.columns.isin(self.parameters)]
+            df = self.data.loc[:, ~self.data.columns.isin(self.parameters)]
             count_col = df.pop('count')
             df.insert(len(df.columns), 'count', count_col)
             return df
 
+    def get_counts(self, fill=0, roi=None):
+        """Return the counts as a dense ndarray, indexed by x for 1D, and
+        (y, x) for 2D spectrum.
+
+        Parameters
+        ----------
+        fill : float
+            Fill empty channels with a number (default is 0) or nan.
+        roi : tuple
+            Channel range of interest, ``(xmin, xmax)`` for 1D,
+            ``(xmin, xmax, ymin, ymax)`` for 2D, upper bounds are exclusive,
+            only this region is densified.
+
+        Returns
+        -------
+        r : ndarray
+            Array of counts, do not modify it in place for the 'dense' storage.
+        """
+        if self._counts is not None:
+            return self._counts.to_dense(fill, roi)
+        df = self._data
+        shape = tuple(len(v) for v in self._axes_values_channel[::-1])
+        if roi is not None:
+            return make_counts(df, shape, self.dtype,
+                               'sparse').to_dense(fill, roi)
+        return to_dense_array(df.x,
+                              df['count'],
+                              df.y if 'y' in df else None,
+                              shape=shape,
+                              fill=fill,
+                              dtype=self.dtype if fill == 0 else float)
+
+    def _nonzero(self, map=True):
+        # return a list of coordinate arrays (x first), and the counts of
+        # the non-empty channels.
+        if self._counts is not None:
+            idx, v = self._counts.nonzero()
+        else:
+            df = self._data
+            idx = [df[u].to_numpy() for u in ('x', 'y') if u in df]
+            v = df['count'].to_numpy()
+        if map:
+            idx = [fn(i) for fn, i in zip(self._axes_map_fn, idx)]
+        return idx, v
+
+    def projection(self, axis=0, map=True):
+        """Return the counts projected onto the axis.
+
+        Parameters
+        ----------
+        axis : int
+            Project onto x (0) or y (1) axis.
+        map : bool
+            If True, return the axis values in world coordinate.
+
+        Returns
+        -------
+        r : tuple
+            Arrays of axis values and the summed counts (a new int64 array,
+            of any storage mode).
+        """
+        if self._counts is not None:
+            p = self._counts.projection(axis)
+        else:
+            df = self._data
+            p = np.bincount(df[('x', 'y')[axis]],
+                            weights=df['count'],
+                            minlength=len(self._axes_values_channel[axis]))
+            p = p.astype(np.int64)
+        return self.get_axes_values(map)[axis], p
+
     @property
     def parameters(self):
         """List : Parameters.
@@ -166,12 +284,16 @@ class Spectrum(object):
         self._dtype = DTYPE_MAP[d]
 
     def __str__(self):
-        return f"Spectrum '{self.name}': [{len(self.parameters)}] parameters, [{self.data.shape[0]}] entries."
+        if self._counts is None:
+            n = self._data.shape[0]
+        else:
+            n = self._counts.nnz
+        return f"Spectrum '{self.name}': [{len(self.parameters)}] parameters, [{n}] entries."
 
     __repr__ = __str__
 
     def _repr_html_(self, *args, **kws):
-        dfhtml = self._data._repr_html_(*args, **kws)
+        dfhtml = self.data._repr_html_(*args, **kws)
         return f'<h4>{str(self)}</h4>' + '<br>' + dfhtml
 
     def to_image_tuple(self, **kws):
@@ -183,6 +305,9 @@ class Spectrum(object):
             Fill empty with nan (default) or a defined number.
         map : bool
             If do coordinate mapping from channel to world, by default is True.
+        roi : tuple
+            Channel range of interest, ``(xmin, xmax, ymin, ymax)``, upper
+            bounds are exclusive, only this region is densified.
 
         Returns
         -------
@@ -202,24 +327,43 @@ class Spectrum(object):
             _x, _y = self._axes_values_world
         else:
             _x, _y = self._axes_values_channel
-        return to_image_tuple(self.data, x=_x, y=_y, **kws)
-
+        roi = kws.pop('roi', None)
+        if self._counts is None and roi is None:
+            return to_image_tuple(self.data, x=_x, y=_y, **kws)
+        nan_as_num = kws.get('nan_as_num', None)
+        if roi is not None:
+            ysl, xsl = roi_to_slices(roi, (len(_y), len(_x)))
+            _x, _y = _x[xsl], _y[ysl]
+        xx, yy = np.meshgrid(_x, _y)
+        zz = self.get_counts(np.nan if nan_as_num is None else nan_as_num,
+                             roi)
+        return xx, yy, zz.astype(float, copy=False)
+
+    @profiled('map_data')
     def map_data(self):
-        """Map data from channel coordinate to world coordinate, add as new columns.
+        """Map axes from channel coordinate to world coordinate, the columns of
+        world coordinate data are added on demand, see :meth:`get_data`.
         """
         self._axes_values_world = []
         self._axes_map_fn = []
         for ax, v in zip(self.axes, self._axes_values_channel):
             low, high, bins = ax['low'], ax['high'], ax['bins']
-            self._axes_values_world.append(low + v * (high - low) / bins)
-            self._axes_map_fn.append(partial(_map_fn, low, high, bins))
-
-        # add column(s) for world coordinate data.
-        for u, p, fn in zip(('x', 'y'), self.parameters, self._axes_map_fn):
-            self._data[p] = self._data[u].apply(fn)
+            self._axes_values_world.append(map_channel(low, high, bins, v))
+            self._axes_map_fn.append(partial(map_channel, low, high, bins))
         #
-        self._data.rename(columns={'v': 'count'}, inplace=True)
-        self._data.index.name = 'id'
+        if self._data is not None:
+            self._data.rename(columns={'v': 'count'}, inplace=True)
+            self._data.index.name = 'id'
+        self._mapped = False
+
+    def _map_columns(self):
+        # add column(s) for world coordinate data, mapped as whole arrays.
+        if self._mapped:
+            return
+        df = self.data
+        for u, p, fn in zip(('x', 'y'), self.parameters, self._axes_map_fn):
+            df[p] = fn(df[u].to_numpy())
+        self._mapped = True
 
     @property
     def gate(self):
@@ -233,7 +377,7 @@ class Spectrum(object):
         """
         if self.client is None:
             print(f"Cannot apply '{gate}'")
-        self.client._apply_client.apply(self.name, gate.name)
+        self.client.apply(self.name, gate.name)
 
     @property
     def show_gate(self):
@@ -299,6 +443,9 @@ class Spectrum(object):
         r : Axes, List[Axes]
             Axes for 1D, and (ax_image, ax_xprofile, ax_yprofile) for 2D spectrum.
         """
+        import matplotlib.pyplot as plt
+        from .plot import plot_image
+
         figsize = kws.pop('figsize', (8, 6))
         fontsize = kws.pop('fontsize', 12)
         xlim = kws.pop('xlim', None)
@@ -343,9 +490,19 @@ class Spectrum(object):
         else:
             return None
 
-    def stats(self, mapped=True):
+    @profiled('stats')
+    def stats(self, mapped=True, gates=None):
         """Get the statistical info.
 
+        Parameters
+        ----------
+        mapped : bool
+            If True, compute with world coordinate, otherwise channel coordinate.
+        gates : list
+            A list of gate names or Gate objects to add rows of the gated
+            stats for, default is the show gate, gates of any type on the
+            parameters of the spectrum are supported, see :class:`GateEvaluator`.
+
         Returns
         -------
         r : pd.DataFrame
@@ -353,48 +510,73 @@ class Spectrum(object):
             columns (2D): 'Sum', 'Ratio', '<x>', '<y>', 'σx', 'σy', 'FWHMx', 'FWHMy', 'ρ';
             index: 'All', gate names, etc.
         """
-        df = self.get_data(mapped)
-        _cnt = df['count']
-        _cnt_sum = _cnt.sum()
-        # sum, ratio, avg_x, avg_y, std_x, std_y, fwhm_x, fwhm_y
-        data = {'All': [_cnt_sum, 1.0]}
-        if self.stype == '2D':
-            p1, p2 = self.parameters
-            _stat = weighted_stats(df[p1], _cnt, df[p2])
-            data['All'].extend([
-                *_stat['mean'],
-                *_stat['std'],
-                *_stat['fwhm'],
-                _stat['rho'],
-            ])
-
-            # Add rows for gate
-            if self.show_gate is not None:
-                if self.show_gate.type == 'Contour':
-                    df_in = df[self.show_gate.is_in(df.iloc[:, :2])]
-                    _cnt1 = df_in['count']
-                    _cnt1_sum = _cnt1.sum()
-                    _stat1 = weighted_stats(df_in[p1], _cnt1, df_in[p2])
-                    data[self.show_gate.name] = [
-                        _cnt1_sum, _cnt1_sum / _cnt_sum,
-                        *_stat1['mean'],
-                        *_stat1['std'],
-                        *_stat1['fwhm'],
-                        _stat1['rho'],
-                    ]
-            # column names
-            columns = [
-                'Sum', 'Ratio', '<x>', '<y>', 'σx', 'σy', 'FWHMx', 'FWHMy', 'ρ'
-            ]
-        elif self.stype == '1D':
-            p1, = self.parameters
-            p1_stat = weighted_stats(df[p1], _cnt)
-            data['All'].extend(
-                [p1_stat['mean'], p1_stat['std'], p1_stat['fwhm']])
-            columns = ['Sum', 'Ratio', '<x>', 'σx', 'FWHM']
-            
-        #
-        return pd.DataFrame.from_dict(data, orient='index', columns=columns)
+        ch, _cnt = self._nonzero(map=False)
+        if mapped:
+            xy = [fn(i) for fn, i in zip(self._axes_map_fn, ch)]
+        else:
+            xy = ch
+        # rows of 'All' and the gates, computed with one batch of weights
+        rows, w = ['All'], [_cnt]
+        for name, m in self._gate_masks(ch, gates):
+            rows.append(name)
+            w.append(np.where(m, _cnt, 0))
+        _stat = batch_weighted_stats(xy[0], w, *xy[1:])
+        return make_stats_table(self.stype, _stat, rows)
+
+    def _gate_masks(self, ch, gates=None):
+        # yield gate name and the mask of channels *ch* for *gates*.
+        verbose = gates is not None
+        if gates is None:
+            gates = [] if self.show_gate is None else [self.show_gate]
+        if not gates:
+            return
+        # the gate table is only needed to resolve the gates by name
+        table = None if self.client is None else \
+            (lambda: self.client.snapshot()['gate'])
+        ev = GateEvaluator(self.parameters,
+                           self.axes,
+                           None,
+                           table,
+                           channels=ch)
+        for g in gates:
+            try:
+                m = ev.mask(g)
+            except (NotImplementedError, KeyError) as err:
+                if verbose:
+                    warnings.warn(f"Skip gate: {err}")
+                continue
+            yield getattr(g, 'name', g), m
+
+
+def make_stats_table(stype, stat, rows):
+    """Return the table of stats for the spectrum type *stype*, from *stat*
+    of :func:`~spectcl.data.stats.batch_weighted_stats`, one row per set of
+    weights, *rows* is the list of row names, the first one is the reference
+    of 'Ratio', None for the types other than '1D' or '2D'.
+    """
+    _cnt_sum = np.rint(stat['sum']).astype(np.int64)
+    # sum, ratio, avg_x, avg_y, std_x, std_y, fwhm_x, fwhm_y
+    data = {'Sum': _cnt_sum, 'Ratio': _cnt_sum / _cnt_sum[0]}
+    if stype == '2D':
+        data.update({
+            '<x>': stat['mean'][0],
+            '<y>': stat['mean'][1],
+            'σx': stat['std'][0],
+            'σy': stat['std'][1],
+            'FWHMx': stat['fwhm'][0],
+            'FWHMy': stat['fwhm'][1],
+            'ρ': stat['rho'],
+        })
+    elif stype == '1D':
+        data.update({
+            '<x>': stat['mean'],
+            'σx': stat['std'],
+            'FWHM': stat['fwhm'],
+        })
+    else:
+        return None
+    #
+    return pd.DataFrame(data, index=rows)
 
 
 class _Spectrum:
@@ -406,7 +588,3 @@ class _Spectrum:
         self.axes = sp.axes
         self.dtype = sp.dtype
         self.stype = sp.stype
-
-
-def _map_fn(low, high, bins, ch):
-    return low + ch * (high - low) / bins
@@ -1,63 +1,147 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
-import pandas as pd
+import numpy as np
 import math
 
+# std to fwhm, assuming Gaussian distribution
+FWHM_FACTOR = 2 * (2 * math.log(2))**0.5
 
-def weighted_stats(x: pd.Series, w: pd.Series, y: pd.Series = None ) -> dict:
+
+def weighted_moments(x, w, y=None, shift=None) -> dict:
+    """Return the weighted sums of the first and second moments of *x* (and
+    *y*), computed with a few fused array products, the coordinates are
+    shifted by the first value to keep the precision of the variance.
+
+    The sums are linear in *w*, the moments of the changed weights could be
+    added to the previous ones if computed with the same *shift*.
+
+    Parameters
+    ----------
+    x : array
+        Array of values, size of N.
+    w : array
+        Array of weights, size of N, or a 2D array of (M, N) for M sets of
+        weights (e.g. counts of M spectra, or counts masked by M gates).
+    y : array
+        Another array of values, size of N.
+    shift : float, tuple
+        The shift of *x*, or of *x* and *y*, default is the first value(s).
+
+    Returns
+    -------
+    r : dict
+        Keys: 'w' (sum of *w*, in the data type of *w*), 'x', 'xx' (weighted sum of shifted *x*, and
+        its square), 'shift' (the shift of *x*, or of *x* and *y*), and for 2D,
+        'y', 'yy', 'xy'. For 2D *w*, each value is an array of size M.
+    """
+    x = np.asarray(x, dtype=float)
+    w = np.asarray(w)
+    # sum of the weights in their own type, e.g. integer counts
+    sw = w.sum(axis=-1)
+    w = w.astype(float, copy=False)
+    if shift is None:
+        x0 = x[0] if x.size else 0.0
+    else:
+        x0 = shift if y is None else shift[0]
+    dx = x - x0
+    r = {'w': sw, 'x': w @ dx, 'xx': w @ (dx * dx)}
+    if y is None:
+        r['shift'] = x0
+        return r
+    y = np.asarray(y, dtype=float)
+    if shift is None:
+        y0 = y[0] if y.size else 0.0
+    else:
+        y0 = shift[1]
+    dy = y - y0
+    r.update({'y': w @ dy, 'yy': w @ (dy * dy), 'xy': w @ (dx * dy)})
+    r['shift'] = (x0, y0)
+    return r
+
+
+def stats_from_moments(m: dict) -> dict:
+    """Return the weighted stats from the moment sums of
+    :func:`weighted_moments`.
+
+    Returns
+    -------
+    r : dict
+        See :func:`weighted_stats`.
+    """
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sw = m['w']
+        if 'y' not in m:
+            mx = m['x'] / sw
+            var_x = np.maximum(m['xx'] / sw - mx * mx, 0)
+            std_x = var_x**0.5
+            return {
+                'sum': sw,
+                'mean': mx + m['shift'],
+                'var': var_x,
+                'std': std_x,
+                'fwhm': std_x * FWHM_FACTOR,
+            }
+        x0, y0 = m['shift']
+        mx, my = m['x'] / sw, m['y'] / sw
+        var_x = np.maximum(m['xx'] / sw - mx * mx, 0)
+        var_y = np.maximum(m['yy'] / sw - my * my, 0)
+        cov = m['xy'] / sw - mx * my
+        std_x, std_y = var_x**0.5, var_y**0.5
+        rho = cov / (std_x * std_y)
+    return {
+        'sum': sw,
+        'mean': (mx + x0, my + y0),
+        'var': (var_x, var_y),
+        'std': (std_x, std_y),
+        'fwhm': (std_x * FWHM_FACTOR, std_y * FWHM_FACTOR),
+        'cov': cov,
+        'rho': rho,
+    }
+
+
+def weighted_stats(x, w, y=None) -> dict:
     """Return a dict of weighted stats of input array *x* and *y*.
 
     Parameters
     ----------
-    x : pd.Series
-        Array of values.
-    w : pd.Series
+    x : array
+        Array of values, pd.Series or ndarray.
+    w : array
         Array of weights.
-    y : pd.Series
+    y : array
         Another array of values.
 
     Returns
     -------
     r : dict
-        Keys: 'sum' (sum of *w*), 'mean' (weighted average of *x*), 'std' (weighted std of *x*),
-        'fwhm' (~2.355std, assuming Gaussian distribution).
+        Keys: 'sum' (sum of *w*, in the data type of *w*, e.g. integer for
+        counts), 'mean' (weighted average of *x*), 'var'
+        (weighted variance of *x*), 'std' (weighted std of *x*),
+        'fwhm' (~2.355std, assuming Gaussian distribution), for 2D, the values
+        are tuples for *x* and *y*, and 'cov' (weighted covariance), 'rho'
+        (weighted correlation) are added.
     """
-    def m(x, w):
-        # weighted mean
-        return (x * w).sum() / w.sum()
-    def cov(x, y, w):
-        # weighted covariance
-        return (w * (x - m(x, w)) * (y - m(y, w))).sum() / w.sum()
-    def corr(x, y, w):
-        # weighted correlation
-        return cov(x, y, w) / (cov(x, x, w) * cov(y, y, w)) ** 0.5
-
-    # std to fwhm, assuming Gaussian distribution
-    fac = 2 * (2 * math.log(2))**0.5
-
-    xavg_w = m(x, w)
-    # weighted standard deviation
-    xstd_w = cov(x, x, w) ** 0.5
-    fwhm_x = xstd_w * fac
-        
-    if y is not None:
-        yavg_w = m(y, w)
-        ystd_w = cov(y, y, w) ** 0.5
-        fwhm_y = ystd_w * fac
-        rho = corr(x, y, w)
-        #
-        return {
-            'sum': w.sum(),
-            'mean': (xavg_w, yavg_w),
-            'std': (xstd_w, ystd_w),
-            'fwhm': (fwhm_x, fwhm_y),
-            'rho': rho
-        }
-    #
-    return {
-        'sum': w.sum(),
-        'mean': xavg_w,
-        'std': xstd_w,
-        'fwhm': fwhm_x,
-    }
+    return stats_from_moments(weighted_moments(x, w, y))
+
+
+def batch_weighted_stats(x, w, y=None) -> dict:
+    """Return a dict of weighted stats of input array *x* and *y*, for many
+    sets of weights at once.
+
+    Parameters
+    ----------
+    x : array
+        Array of values, size of N.
+    w : array
+        2D array of (M, N) weights, e.g. counts of M spectra on the same
+        axes, or the counts masked by M gates.
+    y : array
+        Another array of values, size of N.
+
+    Returns
+    -------
+    r : dict
+        See :func:`weighted_stats`, each value is an array of size M.
+    """
+    return stats_from_moments(weighted_moments(x, np.atleast_2d(w), y))
@@ -0,0 +1,315 @@
+# -*- coding: utf-8 -*-
+"""Array storage backends for spectral contents.
+"""
+
+import numpy as np
+import pandas as pd
+
+from ..contrib.data import to_dense_array
+
+# supported storage modes of Spectrum, 'frame' keeps the DataFrame,
+# 'auto' picks 'dense' or 'sparse', whichever takes less memory.
+STORAGE_MODES = ('frame', 'dense', 'sparse', 'auto')
+
+# data type of the channel indices of sparse storage
+INDEX_DTYPE = np.dtype('i4')
+
+
+class DenseCounts(object):
+    """Spectrum counts held as a dense ndarray, indexed by x for 1D, and
+    (y, x) for 2D spectrum, the size is bins * dtype.
+
+    Parameters
+    ----------
+    counts : ndarray
+        1D or 2D array of counts.
+    """
+    kind = 'dense'
+
+    def __init__(self, counts: np.ndarray):
+        self._counts = counts
+
+    @classmethod
+    def from_channels(cls, x, v, y=None, shape=None, dtype=None):
+        """Build from the sparse channel data of x, [y], v.
+
+        Parameters
+        ----------
+        x : array
+            Channel index along x axis.
+        v : array
+            Count of each channel.
+        y : array
+            Channel index along y axis, None for 1D.
+        shape : tuple
+            Shape of the array, ``(nx, )`` for 1D, ``(ny, nx)`` for 2D.
+        dtype :
+            Data type of counts, default is int32.
+        """
+        if dtype is None:
+            dtype = np.dtype('i4')
+        return cls(to_dense_array(x, v, y, shape=shape, fill=0, dtype=dtype))
+
+    @property
+    def shape(self):
+        """tuple : Shape of the counts array.
+        """
+        return self._counts.shape
+
+    @property
+    def ndim(self):
+        """int : Number of dimensions.
+        """
+        return self._counts.ndim
+
+    @property
+    def dtype(self):
+        """dtype : Data type of counts.
+        """
+        return self._counts.dtype
+
+    @property
+    def nbytes(self):
+        """int : Memory size of the counts in bytes.
+        """
+        return self._counts.nbytes
+
+    @property
+    def nnz(self):
+        """int : Number of non-empty channels.
+        """
+        return int(np.count_nonzero(self._counts))
+
+    def sum(self):
+        """Return the total counts.
+        """
+        return self._counts.sum()
+
+    def nonzero(self):
+        """Return the channel indices and counts of non-empty channels.
+
+        Returns
+        -------
+        r : tuple
+            ``([x, y], v)``, a list of index arrays (x first) and the counts.
+        """
+        idx = np.nonzero(self._counts)
+        return list(idx[::-1]), self._counts[idx]
+
+    def projection(self, axis: int = 0):
+        """Return the sum of counts projected onto *axis*, 0 for x, 1 for y,
+        as a new int64 array.
+        """
+        if self.ndim == 1:
+            return self._counts.astype(np.int64)
+        return self._counts.sum(axis=axis, dtype=np.int64)
+
+    def to_dense(self, fill=0, roi=None):
+        """Return the counts as an ndarray, empty channels are filled with
+        *fill*, if *fill* is 0, the stored array (or a view of the *roi*) is
+        returned without copy.
+
+        Parameters
+        ----------
+        fill : float
+            Fill empty channels with a number (default is 0) or nan.
+        roi : tuple
+            Channel range of interest, ``(xmin, xmax)`` for 1D,
+            ``(xmin, xmax, ymin, ymax)`` for 2D, upper bounds are exclusive.
+        """
+        counts = self._counts
+        if roi is not None:
+            counts = counts[roi_to_slices(roi, self.shape)]
+        if fill == 0:
+            return counts
+        arr = counts.astype(float)
+        arr[counts == 0] = fill
+        return arr
+
+    def to_frame(self):
+        """Return the non-empty channels as a DataFrame of x, [y], count
+        columns.
+        """
+        idx, v = self.nonzero()
+        df = pd.DataFrame(dict(zip(('x', 'y'), idx)))
+        df['count'] = v
+        df.index.name = 'id'
+        return df
+
+
+class SparseCounts(object):
+    """Spectrum counts held as the coordinate list (COO) of non-empty
+    channels, for the mostly-empty spectra, the size is nnz * (ndim * 4 +
+    dtype), the dense array is only built for the requested region.
+
+    Parameters
+    ----------
+    idx : list
+        A list of channel index arrays, ``[x]`` for 1D, ``[x, y]`` for 2D.
+    v : array
+        Count of each channel.
+    shape : tuple
+        Shape of the full array, ``(nx, )`` for 1D, ``(ny, nx)`` for 2D.
+    """
+    kind = 'sparse'
+
+    def __init__(self, idx: list, v: np.ndarray, shape: tuple):
+        self._idx = idx
+        self._v = v
+        self._shape = tuple(shape)
+
+    @classmethod
+    def from_channels(cls, x, v, y=None, shape=None, dtype=None):
+        """Build from the sparse channel data of x, [y], v, the channels
+        of zero count are dropped, see :meth:`DenseCounts.from_channels`.
+        """
+        if dtype is None:
+            dtype = np.dtype('i4')
+        v = np.asarray(v, dtype=dtype)
+        m = v != 0
+        idx = [np.asarray(x, dtype=INDEX_DTYPE)[m]]
+        if y is not None:
+            idx.append(np.asarray(y, dtype=INDEX_DTYPE)[m])
+        return cls(idx, v[m], shape)
+
+    @property
+    def shape(self):
+        """tuple : Shape of the full counts array.
+        """
+        return self._shape
+
+    @property
+    def ndim(self):
+        """int : Number of dimensions.
+        """
+        return len(self._shape)
+
+    @property
+    def dtype(self):
+        """dtype : Data type of counts.
+        """
+        return self._v.dtype
+
+    @property
+    def nbytes(self):
+        """int : Memory size of the indices and counts in bytes.
+        """
+        return self._v.nbytes + sum(i.nbytes for i in self._idx)
+
+    @property
+    def nnz(self):
+        """int : Number of non-empty channels.
+        """
+        return self._v.size
+
+    def sum(self):
+        """Return the total counts.
+        """
+        return self._v.sum()
+
+    def nonzero(self):
+        """Return the channel indices and counts of non-empty channels.
+
+        Returns
+        -------
+        r : tuple
+            ``([x, y], v)``, a list of index arrays (x first) and the counts.
+        """
+        return list(self._idx), self._v
+
+    def projection(self, axis: int = 0):
+        """Return the sum of counts projected onto *axis*, 0 for x, 1 for y,
+        as a new int64 array.
+        """
+        n = self._shape[::-1][axis]
+        p = np.bincount(self._idx[axis], weights=self._v, minlength=n)
+        return p.astype(np.int64)
+
+    def to_dense(self, fill=0, roi=None):
+        """Return the counts as an ndarray, empty channels are filled with
+        *fill*, only the channels in *roi* are densified if defined, see
+        :meth:`DenseCounts.to_dense`.
+        """
+        idx, v, shape = self._idx, self._v, self._shape
+        if roi is not None:
+            sl = roi_to_slices(roi, shape)[::-1]  # x first
+            m = np.ones(v.size, dtype=bool)
+            for i, s in zip(idx, sl):
+                m &= (i >= s.start) & (i < s.stop)
+            idx = [i[m] - s.start for i, s in zip(idx, sl)]
+            v = v[m]
+            shape = tuple(s.stop - s.start for s in sl[::-1])
+        dtype = self.dtype if fill == 0 else float
+        return to_dense_array(idx[0], v, idx[1] if len(idx) == 2 else None,
+                              shape=shape, fill=fill, dtype=dtype)
+
+    def to_frame(self):
+        """Return the non-empty channels as a DataFrame of x, [y], count
+        columns.
+        """
+        df = pd.DataFrame(dict(zip(('x', 'y'), self._idx)))
+        df['count'] = self._v
+        df.index.name = 'id'
+        return df
+
+
+def roi_to_slices(roi: tuple, shape: tuple) -> tuple:
+    """Return the tuple of slices (array order) to index the region of
+    interest *roi*, ``(xmin, xmax)`` for 1D, ``(xmin, xmax, ymin, ymax)``
+    for 2D, clipped by *shape*.
+    """
+    sl = []
+    for i, n in enumerate(shape[::-1]):
+        lo, hi = roi[2 * i:2 * i + 2]
+        sl.append(slice(min(max(int(lo), 0), n), min(max(int(hi), 0), n)))
+    return tuple(sl[::-1])
+
+
+def make_counts(data: pd.DataFrame, shape: tuple, dtype=None,
+                storage='dense'):
+    """Return the array storage of spectral contents.
+
+    Parameters
+    ----------
+    data : DataFrame
+        Spectrum contents, columns of x, v (or count) or x, y, v (or count).
+    shape : tuple
+        Shape of the counts array from the axes bins, ``(nx, )`` for 1D,
+        ``(ny, nx)`` for 2D, extended if any channel index is out of range.
+    dtype :
+        Data type of counts.
+    storage : str
+        Storage mode, 'dense', 'sparse' or 'auto' (the one takes less
+        memory, by the occupancy of channels).
+    """
+    if storage not in STORAGE_MODES[1:]:
+        raise ValueError(f"'{storage}' is not one of {STORAGE_MODES[1:]}.")
+    v = data['v'] if 'v' in data else data['count']
+    x = data['x'].to_numpy()
+    y = data['y'].to_numpy() if 'y' in data else None
+    shape = _fit_shape(shape, x, y)
+    if storage == 'auto':
+        storage = select_storage(len(v), shape, dtype)
+    if storage == 'sparse':
+        return SparseCounts.from_channels(x, v, y, shape=shape, dtype=dtype)
+    return DenseCounts.from_channels(x, v, y, shape=shape, dtype=dtype)
+
+
+def select_storage(nnz: int, shape: tuple, dtype=None) -> str:
+    """Return 'sparse' if the coordinate list of *nnz* non-empty channels
+    takes less memory than the dense array of *shape*, otherwise 'dense'.
+    """
+    itemsize = np.dtype('i4' if dtype is None else dtype).itemsize
+    sparse_nbytes = nnz * (len(shape) * INDEX_DTYPE.itemsize + itemsize)
+    dense_nbytes = int(np.prod(shape)) * itemsize
+    return 'sparse' if sparse_nbytes < dense_nbytes else 'dense'
+
+
+def _fit_shape(shape, x, y=None):
+    # extend *shape* to hold all the channels of *x*, *y*.
+    if y is None:
+        nx, = shape
+        return (max(nx, x.max() + 1 if x.size else 0), )
+    ny, nx = shape
+    return (max(ny, y.max() + 1 if y.size else 0),
+            max(nx, x.max() + 1 if x.size else 0))
@@ -0,0 +1,197 @@
+# -*- coding: utf-8 -*-
+"""Incremental parsing of the spectrum contents from a streamed response.
+
+The ``channels`` array of the contents, e.g.
+``{"status": "OK", "detail": {"channels": [{"x": 1, "y": 2, "v": 3}, ...]}}``
+is parsed chunk by chunk into growing numpy buffers, the rest of the document
+is decoded as JSON, so neither the full text nor the Python objects of the
+channels are held in memory.
+"""
+
+import re
+
+import numpy as np
+
+from .utils import loads_json
+from .utils import JSONDecodeError
+
+# bytes per read from the response body
+DEFAULT_CHUNK_SIZE = 1 << 16
+
+# initial capacity of the channel buffers
+DEFAULT_CAPACITY = 4096
+
+_CHANNELS_START = re.compile(rb'"channels"\s*:\s*\[')
+_FIRST_OBJECT = re.compile(rb'\{([^}]*)\}')
+_KEY = re.compile(rb'"(\w+)"')
+# keep the digits and sign of the numbers, blank out the keys and punctuation
+_NUMBER_TABLE = bytes(c if c in b'0123456789-' else 32 for c in range(256))
+
+
+class _GrowingArray(object):
+    """1D array which doubles its capacity when full.
+    """
+    def __init__(self, dtype, capacity=DEFAULT_CAPACITY):
+        self._a = np.empty(max(int(capacity), 1), dtype=dtype)
+        self._n = 0
+
+    def extend(self, values):
+        n = self._n + values.size
+        if n > self._a.size:
+            a = np.empty(max(n, 2 * self._a.size), dtype=self._a.dtype)
+            a[:self._n] = self._a[:self._n]
+            self._a = a
+        self._a[self._n:n] = values
+        self._n = n
+
+    def to_array(self):
+        # shrink to the size in place
+        self._a.resize(self._n, refcheck=False)
+        return self._a
+
+
+class ChannelStreamParser(object):
+    """Parse the spectrum contents fed as chunks of bytes.
+
+    Parameters
+    ----------
+    ndim : int
+        Number of dimensions, 1 or 2, to set up the columns when there is no
+        channel, otherwise detected from the first channel.
+    dtype :
+        Data type of 'v', default is int64.
+    capacity : int
+        Initial number of channels to allocate, e.g. estimated from the
+        content length.
+
+    Examples
+    --------
+    >>> p = ChannelStreamParser()
+    >>> for chunk in chunks:
+    >>>     p.feed(chunk)
+    >>> doc = p.close()
+
+    *doc* is the decoded document, the 'channels' of 'detail' is a dict of
+    arrays of 'x', ['y'], 'v'.
+    """
+    def __init__(self, ndim=None, dtype=None, capacity=DEFAULT_CAPACITY):
+        self._ndim = ndim
+        self._dtype = np.dtype(np.int64 if dtype is None else dtype)
+        self._capacity = capacity
+        self._keys = None
+        self._bufs = None
+        # 0: before channels, 1: in channels, 2: after channels
+        self._state = 0
+        self._head = b''
+        self._buf = b''
+        self._tail = []
+
+    def feed(self, chunk: bytes):
+        """Parse a chunk of bytes.
+        """
+        if self._state == 2:
+            self._tail.append(chunk)
+            return
+        self._buf += chunk
+        if self._state == 0:
+            m = _CHANNELS_START.search(self._buf)
+            if m is None:
+                return
+            self._head = self._buf[:m.end()]
+            self._buf = self._buf[m.end():]
+            self._state = 1
+        i = self._buf.find(b']')
+        if i >= 0:  # objects of channels do not have ']'
+            self._parse(self._buf[:i])
+            self._tail.append(self._buf[i:])
+            self._buf = b''
+            self._state = 2
+            return
+        i = self._buf.rfind(b'}')
+        if i >= 0:
+            self._parse(self._buf[:i + 1])
+            self._buf = self._buf[i + 1:]
+
+    def close(self) -> dict:
+        """Finish parsing, return the decoded document.
+        """
+        if self._state == 0:  # no channels, e.g. error message
+            return loads_json(self._buf)
+        if self._state == 1:
+            raise JSONDecodeError("Unterminated channels array", '', 0)
+        doc = loads_json(self._head + b''.join(self._tail))
+        doc['detail']['channels'] = self._columns()
+        return doc
+
+    def _parse(self, seg: bytes):
+        if self._keys is None:
+            m = _FIRST_OBJECT.search(seg)
+            if m is None:
+                return
+            self._keys = [k.decode() for k in _KEY.findall(m.group(1))]
+            self._bufs = [
+                _GrowingArray(self._dtype if k == 'v' else np.int32,
+                              self._capacity) for k in self._keys
+            ]
+        nums = seg.translate(_NUMBER_TABLE)
+        if not nums.strip():
+            return
+        arr = np.fromstring(nums, dtype=np.int64,
+                            sep=' ').reshape(-1, len(self._keys))
+        for j, buf in enumerate(self._bufs):
+            buf.extend(arr[:, j])
+
+    def _columns(self) -> dict:
+        if self._keys is None:
+            keys = ['x', 'y'][:self._ndim or 1] + ['v']
+            return {
+                k: np.empty(0, dtype=self._dtype if k == 'v' else np.int32)
+                for k in keys
+            }
+        cols = dict(zip(self._keys, (b.to_array() for b in self._bufs)))
+        return {k: cols[k] for k in ('x', 'y', 'v') if k in cols}
+
+
+def read_contents(r,
+                  ndim=None,
+                  dtype=None,
+                  chunk_size=DEFAULT_CHUNK_SIZE,
+                  metrics=None):
+    """Parse the spectrum contents from the streamed response *r*, the
+    channels are decoded while the body is being received.
+
+    Parameters
+    ----------
+    r : requests.Response
+        Response of the 'contents' request, sent with ``stream=True``.
+    ndim : int
+        Number of dimensions, see :class:`ChannelStreamParser`.
+    dtype :
+        Data type of counts.
+    chunk_size : int
+        Bytes per read.
+    metrics : TransferMetrics
+        If defined, add the record of the transferred bytes.
+
+    Returns
+    -------
+    r : dict
+        The decoded document, see :class:`ChannelStreamParser`.
+    """
+    # estimate the number of channels, ~16 bytes each, if not compressed
+    if 'Content-Encoding' in r.headers:
+        n = 0
+    else:
+        n = int(r.headers.get('Content-Length', 0)) // 16
+    p = ChannelStreamParser(ndim, dtype, capacity=n or DEFAULT_CAPACITY)
+    nbytes = 0
+    try:
+        # decompressed chunk by chunk if the content is encoded
+        for chunk in r.iter_content(chunk_size=chunk_size):
+            nbytes += len(chunk)
+            p.feed(chunk)
+    finally:
+        r.close()
+    if metrics is not None:
+        metrics.record(r, nbytes)
+    return p.close()
@@ -0,0 +1,205 @@
+# -*- coding: utf-8 -*-
+"""Subscribe to the changes of spectrum contents, pushed by the caching proxy
+(see :mod:`spectcl.contrib.proxy`) as server-sent events, or polled.
+"""
+
+import json
+import threading
+import time
+from collections import deque
+
+from .spectrum import Spectrum
+
+# time in seconds between the polls, if not pushed
+DEFAULT_WATCH_INTERVAL = 1.0
+
+# read timeout in seconds of the event stream, longer than the keep-alive
+# interval of the proxy
+EVENTS_TIMEOUT = 30.0
+
+
+class SpectrumSubscription(object):
+    """Iterator of the Spectrum objects of the watched spectra, yielded only
+    when the contents changed, the current ones are yielded first.
+
+    With the caching proxy, the changes are pushed by its event stream and
+    only the changed contents are fetched (from the proxy cache), otherwise
+    the contents are polled every *interval* seconds (conditionally with the
+    ETag of the last response if the server supports, otherwise compared by
+    the digest of the response). If the event stream is broken, subscribe
+    again after *interval* seconds, and check all the spectra; the errors of
+    fetching the contents are raised from the iteration.
+
+    Examples
+    --------
+    >>> for sp in client.watch(['s1', 's2'], interval=0.5):
+    >>>     update_plot(sp.name, sp.to_image_tuple())
+
+    Parameters
+    ----------
+    client : SpecTclClient
+        SpecTclClient instance.
+    names_or_pattern : str, list
+        A list of spectrum names, or Unix wildcard pattern of names.
+    interval : float
+        Time in seconds between the polls, default is 1.0.
+    push : bool
+        If set (default), use the event stream if the server supports.
+
+    Keyword Arguments
+    -----------------
+    storage : str
+        Storage mode of the yielded Spectrum, default is 'frame'.
+    """
+    def __init__(self,
+                 client,
+                 names_or_pattern,
+                 interval=DEFAULT_WATCH_INTERVAL,
+                 push=True,
+                 **kws):
+        self._client = client
+        self._names = client.resolve_names(names_or_pattern)
+        self._interval = interval
+        self._push = push
+        self._storage = kws.pop('storage', 'frame')
+        self._tags = {}  # name: tag of the last yielded contents
+        self._pending = deque()  # names to check
+        self._mode = None  # 'push' or 'poll', None to subscribe
+        self._events = None  # response of the event stream
+        self._next_poll = 0.0
+        self._closed = threading.Event()
+        self._iter_lock = threading.Lock()
+
+    @property
+    def names(self):
+        """list : Names of the watched spectra.
+        """
+        return list(self._names)
+
+    @property
+    def mode(self):
+        """str : 'push' if the changes are pushed by the server, 'poll' if
+        polled, None before the first iteration.
+        """
+        return self._mode
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        with self._iter_lock:
+            while not self._closed.is_set():
+                if self._pending:
+                    sp = self._check(self._pending.popleft())
+                    if sp is not None:
+                        return sp
+                elif self._mode is None:
+                    self._subscribe()
+                elif self._mode == 'push':
+                    self._read_events()
+                else:
+                    dt = self._next_poll - time.monotonic()
+                    if dt > 0 and self._closed.wait(dt):
+                        break
+                    self._next_poll = time.monotonic() + self._interval
+                    self._pending.extend(self._names)
+            self._release()
+        raise StopIteration
+
+    def _subscribe(self):
+        # subscribe to the event stream, otherwise poll, then check all
+        self._mode = 'poll'
+        if self._push:
+            c = self._client
+            url = f"{c.base_url}:{c.port}/{c.name}/proxy/events"
+            try:
+                r = c.session.get(url,
+                                  params=[('name', i) for i in self._names],
+                                  stream=True,
+                                  timeout=(EVENTS_TIMEOUT, EVENTS_TIMEOUT),
+                                  verify=False)
+            except Exception:
+                r = None
+            if r is not None:
+                if r.ok and r.headers.get('Content-Type', '').startswith(
+                        'text/event-stream'):
+                    self._events = r
+                    self._mode = 'push'
+                else:
+                    r.close()
+        self._next_poll = time.monotonic() + self._interval
+        self._pending.extend(self._names)
+
+    def _read_events(self):
+        # read one event, queue the changed spectra
+        event, data = None, []
+        try:
+            while not self._closed.is_set():
+                line = self._events.raw.readline()
+                if not line:
+                    raise ConnectionError("Event stream is closed")
+                line = line.decode().rstrip('\r\n')
+                if line == '':
+                    if event is not None or data:
+                        break
+                    continue
+                if line.startswith(':'):  # keep-alive
+                    continue
+                k, _, v = line.partition(':')
+                if k == 'event':
+                    event = v.strip()
+                elif k == 'data':
+                    data.append(v.lstrip())
+        except Exception:
+            # subscribe again later
+            self._release()
+            self._mode = None
+            self._closed.wait(self._interval)
+            return
+        if event == 'contents' and data:
+            name = json.loads('\n'.join(data))['name']
+            if name not in self._pending:
+                self._pending.append(name)
+
+    def _check(self, name):
+        # Spectrum of *name* if the contents changed, otherwise None
+        df_sp = self._client.snapshot()['spectrum']
+        if df_sp is None or name not in df_sp.index:
+            return None
+        conf = df_sp.loc[name]
+        tag, data = self._client._spectrum_client._contents_if_changed(
+            name, self._tags.get(name), conf)
+        if data is None:
+            return None
+        self._tags[name] = tag
+        return Spectrum(name,
+                        conf,
+                        data,
+                        client=self._client,
+                        storage=self._storage)
+
+    def _release(self):
+        if self._events is not None:
+            self._events.close()
+            self._events = None
+
+    def close(self):
+        """Stop watching, the iteration in progress (e.g. from another
+        thread) stops at the next event or poll.
+        """
+        self._closed.set()
+        if self._iter_lock.acquire(blocking=False):
+            try:
+                self._release()
+            finally:
+                self._iter_lock.release()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __repr__(self):
+        return (f"[Spectrum Subscription] {len(self._names)} spectra, "
+                f"mode: {self._mode}")
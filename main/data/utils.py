@@ -1,9 +1,21 @@
 # -*- coding: utf-8 -*-
 
-import toml
+import json
 import numpy as np
 import pathlib
+import threading
+import time
+from collections import deque
+from functools import lru_cache
+from urllib.parse import urlsplit
+import requests
 from requests.adapters import HTTPAdapter
+from requests.exceptions import JSONDecodeError
+
+try:
+    import orjson
+except ImportError:  # optional, faster JSON decoder
+    orjson = None
 
 CDIR_PATH = pathlib.Path(__file__).parent
 
@@ -20,18 +32,308 @@ STYPE_MAP = {
 STYPE_MAP_ = {v: k for k, v in STYPE_MAP.items()}
 DTYPE_MAP_ = {v: k for k, v in DTYPE_MAP.items()}
 
+# default number of connections kept alive in the pool
+DEFAULT_POOL_SIZE = 10
+
+# content encodings to request, SpecTcl JSON compresses ~10x
+ACCEPT_ENCODING = 'gzip, deflate'
+
+# number of the most recent requests to keep the transfer records of
+DEFAULT_METRICS_SIZE = 1000
+
 
 class MyAdapter(HTTPAdapter):
-    pass
-    # def init_poolmanager(self, connections, maxsize, block=False, **kws):
-    #    self.pool
+    """HTTP adapter which applies a default timeout to every request.
+
+    Parameters
+    ----------
+    timeout : float, tuple
+        Default timeout in seconds, or (connect, read) tuple, None waits
+        forever.
+
+    Keyword Arguments
+    -----------------
+    pool_connections : int
+        Number of connection pools to cache.
+    pool_maxsize : int
+        Maximum number of connections kept alive per pool.
+    max_retries : int
+        Maximum number of retries for failed connections.
+    pool_block : bool
+        If set, block when no free connection is available in the pool.
+    """
+    def __init__(self, timeout=None, **kws):
+        self.timeout = timeout
+        super().__init__(**kws)
+
+    def send(self, request, **kws):
+        if kws.get('timeout') is None:
+            kws['timeout'] = self.timeout
+        return super().send(request, **kws)
+
+
+def make_session(pool_maxsize=DEFAULT_POOL_SIZE,
+                 timeout=None,
+                 max_retries=0,
+                 pool_block=False,
+                 compress=True):
+    """Return a HTTP session with pooled keep-alive connections, which
+    could be shared by all the clients talking to the same SpecTcl server.
+
+    Parameters
+    ----------
+    pool_maxsize : int
+        Maximum number of connections kept alive, default is 10.
+    timeout : float, tuple
+        Default timeout in seconds, or (connect, read) tuple, default is None.
+    max_retries : int
+        Maximum number of retries for failed connections, default is 0.
+    pool_block : bool
+        If set, block when no free connection is available in the pool.
+    compress : bool
+        If set (default), request gzip/deflate encoded responses, which are
+        decompressed while being read, otherwise request the identity
+        encoding.
+
+    Returns
+    -------
+    r : requests.Session
+        HTTP session object, with the attribute *pool_maxsize*.
+    """
+    adapter = MyAdapter(timeout=timeout,
+                        pool_connections=pool_maxsize,
+                        pool_maxsize=pool_maxsize,
+                        max_retries=max_retries,
+                        pool_block=pool_block)
+    s = requests.Session()
+    s.mount('http://', adapter)
+    s.mount('https://', adapter)
+    s.verify = False
+    s.headers['Accept-Encoding'] = ACCEPT_ENCODING if compress else 'identity'
+    # for the users sizing their concurrency to the pool
+    s.pool_maxsize = pool_maxsize
+    return s
+
+
+class TransferMetrics(object):
+    """Records of the bytes on the wire (compressed) and decoded for the
+    most recent requests, and the running totals of all the requests.
+
+    Parameters
+    ----------
+    maxlen : int
+        Number of the most recent records to keep, default is 1000.
+    """
+    def __init__(self, maxlen=DEFAULT_METRICS_SIZE):
+        self._records = deque(maxlen=maxlen)
+        self._lock = threading.Lock()
+        self._totals = [0, 0, 0]  # requests, wire bytes, body bytes
+
+    def record(self, r, nbytes=None):
+        """Add the record of response *r*, of which the body has been read.
+
+        Parameters
+        ----------
+        r : requests.Response
+            HTTP response.
+        nbytes : int
+            Decoded size of the body in bytes, if not defined, size of
+            ``r.content``.
+
+        Returns
+        -------
+        r : dict
+            The added record, see :attr:`records`.
+        """
+        if nbytes is None:
+            nbytes = len(r.content)
+        try:
+            wire_bytes = r.raw.tell()
+        except AttributeError:  # not a urllib3 response
+            wire_bytes = nbytes
+        path = urlsplit(r.url).path.rstrip('/')
+        rec = {
+            'time': time.time(),
+            'action': '/'.join(path.split('/')[-2:]),
+            'url': r.url,
+            'status': r.status_code,
+            'encoding': r.headers.get('Content-Encoding', 'identity'),
+            'wire_bytes': wire_bytes,
+            'body_bytes': nbytes,
+            'elapsed': r.elapsed.total_seconds(),
+        }
+        with self._lock:
+            self._records.append(rec)
+            self._totals[0] += 1
+            self._totals[1] += wire_bytes
+            self._totals[2] += nbytes
+        return rec
+
+    @property
+    def totals(self):
+        """dict : Totals of all the recorded requests since created or
+        cleared, not limited by *maxlen*, keys: 'count', 'wire_bytes',
+        'body_bytes'.
+        """
+        with self._lock:
+            count, wire_bytes, body_bytes = self._totals
+        return {
+            'count': count,
+            'wire_bytes': wire_bytes,
+            'body_bytes': body_bytes,
+        }
+
+    @property
+    def records(self):
+        """list : A list of dict of the recorded requests, keys: 'time',
+        'action' (e.g. 'spectrum/contents'), 'url', 'status', 'encoding',
+        'wire_bytes', 'body_bytes', 'elapsed' (seconds to the headers).
+        """
+        with self._lock:
+            return list(self._records)
+
+    def clear(self):
+        """Remove all the records, and reset the totals.
+        """
+        with self._lock:
+            self._records.clear()
+            self._totals = [0, 0, 0]
+
+    def to_frame(self):
+        """Return the records as a DataFrame, with 'ratio' column of the
+        decoded to wire size.
+        """
+        import pandas as pd
+        df = pd.DataFrame(self.records,
+                          columns=[
+                              'time', 'action', 'url', 'status', 'encoding',
+                              'wire_bytes', 'body_bytes', 'elapsed'
+                          ])
+        df['ratio'] = df['body_bytes'] / df['wire_bytes']
+        return df
+
+    def summary(self, by='action'):
+        """Return the total counts and bytes grouped by *by*, e.g. 'action',
+        'url' or 'encoding'.
+        """
+        df = self.to_frame().groupby(by).agg(
+            count=('wire_bytes', 'size'),
+            wire_bytes=('wire_bytes', 'sum'),
+            body_bytes=('body_bytes', 'sum'),
+            elapsed=('elapsed', 'mean'),
+        )
+        df['ratio'] = df['body_bytes'] / df['wire_bytes']
+        return df
+
+
+def loads_json(s):
+    """Decode JSON document *s* (bytes or str), with orjson if installed.
+    """
+    try:
+        if orjson is not None:
+            return orjson.loads(s)
+        return json.loads(s)
+    except ValueError as err:
+        if isinstance(s, bytes):
+            s = s.decode('utf-8', errors='replace')
+        raise JSONDecodeError(str(err), s, getattr(err, 'pos', 0))
 
 
 def make_response(r):
-    if r.ok and r.json()['status'] == 'OK':
-        return r.json().get('detail', 'OK but no details')
+    if r.ok:
+        data = loads_json(r.content)
+        if data['status'] == 'OK':
+            return data.get('detail', 'OK but no details')
+    raise NotFoundSpecTclDataError
+
+
+def channels_to_columns(channels: list, ndim: int = None,
+                        dtype=None) -> dict:
+    """Convert the list of channels from spectrum contents, e.g.
+    ``[{'x': 1, 'y': 2, 'v': 3}, ...]``, to a dict of typed arrays.
+
+    Parameters
+    ----------
+    channels : list
+        A list of dict of x, [y], v.
+    ndim : int
+        Number of dimensions, 1 or 2, to set up the columns when *channels*
+        is empty, otherwise detected from the first channel.
+    dtype :
+        Data type of 'v', default is int64.
+
+    Returns
+    -------
+    r : dict
+        Keys of 'x', ['y'], 'v', values of int32 arrays for x, y.
+    """
+    n = len(channels)
+    if n:
+        keys = [k for k in ('x', 'y') if k in channels[0]]
     else:
-        raise NotFoundSpecTclDataError
+        keys = ['x', 'y'][:ndim or 1]
+    r = {
+        k: np.fromiter((c[k] for c in channels), dtype=np.int32, count=n)
+        for k in keys
+    }
+    r['v'] = np.fromiter((c['v'] for c in channels),
+                         dtype=np.int64 if dtype is None else dtype,
+                         count=n)
+    return r
+
+
+class SingleFlight(object):
+    """Share one call among the concurrent callers of the same key, the
+    callers arriving while the call is in flight wait for it and get the
+    same result (or exception), the call is made again once it is finished.
+
+    Examples
+    --------
+    >>> sf = SingleFlight()
+    >>> sf.do(('spectrum', 'list', ()), fetch_list)
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, fn):
+        """Return the result of *fn()*, shared with the concurrent callers
+        with the same hashable *key*.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            is_leader = call is None
+            if is_leader:
+                call = self._calls[key] = _Call()
+        if not is_leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        try:
+            call.result = fn()
+        except BaseException as err:
+            call.error = err
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+    def __len__(self):
+        # number of calls in flight
+        return len(self._calls)
+
+
+class _Call(object):
+    # a call in flight of SingleFlight
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
 
 
 class NotFoundSpecTclDataError(Exception):
@@ -39,7 +341,28 @@ class NotFoundSpecTclDataError(Exception):
         super(self.__class__, self).__init__()
 
 
-ACTION_PARAMS = toml.load(CDIR_PATH.joinpath("action.toml"))
+@lru_cache(maxsize=1)
+def load_action_params():
+    """Return the table of supported actions of each service group, parsed
+    from action.toml at the first use.
+    """
+    import toml
+    return toml.load(CDIR_PATH.joinpath("action.toml"))
+
+
+@lru_cache(maxsize=None)
+def get_action_args(group: str, action: str) -> frozenset:
+    """Return the set of valid arguments of *action* of service *group*.
+    """
+    return frozenset(load_action_params()[group][action].get('arg', []))
+
+
+def __getattr__(name):
+    # ACTION_PARAMS is loaded at the first access
+    if name == 'ACTION_PARAMS':
+        return load_action_params()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 SPEC_NAME_MAP = {
     'name': 'Name',
@@ -56,7 +379,8 @@ GATE_NAME_MAP = {
     'low': 'Low',
     'high': 'High',
     'points': 'Points',
-    'gates': 'Gates'
+    'gates': 'Gates',
+    'value': 'Value'
 }
 
 GATE_TYPE_MAP = {
@@ -85,4 +409,11 @@ def is_nan(x):
     # test if *x* is nan once when x is a float number.
     if not isinstance(x, float):
         return False
-    return np.isnan(x)
\ No newline at end of file
+    return np.isnan(x)
+
+
+def map_channel(low, high, bins, ch):
+    """Map channel(s) *ch* (number or array) to world coordinate of the axis
+    defined by *low*, *high* and *bins*.
+    """
+    return low + ch * (high - low) / bins
@@ -0,0 +1,251 @@
+# -*- coding: utf-8 -*-
+"""Poll a spectrum and process only the channels changed between polls.
+"""
+
+import time
+
+import numpy as np
+
+from .spectrum import Spectrum
+from .spectrum import make_stats_table
+from .stats import stats_from_moments
+from .stats import weighted_moments
+
+
+class SpectrumWatcher(object):
+    """Watch a spectrum by polling its contents, keep the last counts array,
+    compute the per-channel deltas of each poll and update the projections
+    and the moment sums of the stats with the changed channels only.
+
+    The deltas are the difference of the whole counts arrays of the last two
+    polls, i.e. O(total bins) per poll, the projections and the stats are
+    then updated in O(changed channels).
+
+    Examples
+    --------
+    >>> from spectcl.client import Client
+    >>> from spectcl.data import SpectrumWatcher
+    >>> client = Client()
+    >>> w = SpectrumWatcher(client, "pid::fp.pin.dE_vs_tof.rf2!FPslits")
+    >>> w.update()  # the first poll
+    >>> time.sleep(1)
+    >>> w.update()  # returns the number of changed channels
+    >>> w.rate      # count rate of all the channels
+    >>> w.changes() # changed channels and deltas
+    >>> w.stats()
+
+    Parameters
+    ----------
+    client : SpecTclClient
+        SpecTclClient instance.
+    name : str
+        Name of the spectrum.
+
+    Keyword Arguments
+    -----------------
+    storage : str
+        Storage mode of the :attr:`spectrum`, default is 'dense', see
+        :class:`Spectrum`.
+    Other arguments that SpecTclSpectrumClient.contents() supports, e.g.
+    stream.
+    """
+    def __init__(self, client, name, **kws):
+        self._client = client
+        self._name = name
+        self._storage = kws.pop('storage', 'dense')
+        self._kws = kws
+        self._spectrum = None
+        self._counts = None  # counts of the last poll, int64
+        self._delta = None  # counts changed by the last poll
+        self._changed = None  # channel indices (array order) of the delta
+        self._ts = None  # time of the last poll
+        self._dt = None  # seconds between the last two polls
+        self._proj = None  # projections onto x, [y]
+        self._moments = None  # moment sums of channel coordinate
+        self._shift = None
+
+    @property
+    def name(self):
+        """str : Name of the spectrum.
+        """
+        return self._name
+
+    @property
+    def spectrum(self):
+        """Spectrum : Spectrum of the last poll, None before polling.
+        """
+        return self._spectrum
+
+    @property
+    def counts(self):
+        """ndarray : Counts of the last poll, indexed by x for 1D, and (y, x)
+        for 2D spectrum.
+        """
+        return self._counts
+
+    @property
+    def delta(self):
+        """ndarray : Counts changed by the last poll, the same shape as
+        :attr:`counts`, None before the second poll.
+        """
+        return self._delta
+
+    @property
+    def dt(self):
+        """float : Time in seconds between the last two polls.
+        """
+        return self._dt
+
+    @property
+    def rate(self):
+        """ndarray : Count rate (counts per second) of the channels between
+        the last two polls, None before the second poll.
+        """
+        if self._delta is None or not self._dt:
+            return None
+        return self._delta / self._dt
+
+    def changes(self, map=False):
+        """Return the changed channels of the last poll.
+
+        Parameters
+        ----------
+        map : bool
+            If True, return the coordinates in world coordinate.
+
+        Returns
+        -------
+        r : tuple
+            ``([x, y], delta)``, a list of coordinate arrays (x first) and
+            the changed counts, None before the second poll.
+        """
+        if self._changed is None:
+            return None
+        idx = list(self._changed[::-1])
+        delta = self._delta[self._changed]
+        if map:
+            idx = [
+                fn(i) for fn, i in zip(self._spectrum._axes_map_fn, idx)
+            ]
+        return idx, delta
+
+    def update(self):
+        """Poll the spectrum, apply the changed channels.
+
+        Returns
+        -------
+        r : int
+            Number of the changed channels, all the non-empty ones for the
+            first poll, or if the spectrum is cleared or redefined.
+        """
+        client = self._client
+        conf = client.spectrum_conf(self._name)
+        data = client._spectrum_client.contents(self._name,
+                                                as_raw=True,
+                                                conf=conf,
+                                                **self._kws)
+        ts = time.time()
+        sp = self._spectrum
+        if sp is None or sp.axes != conf.Axes:
+            sp = Spectrum(self._name,
+                          conf,
+                          data,
+                          client=client,
+                          storage=self._storage)
+            self._spectrum = sp
+        else:
+            sp.data = data
+            sp.map_data()
+        counts = np.asarray(sp.get_counts(), dtype=np.int64)
+        last, self._counts = self._counts, counts
+        self._dt = None if self._ts is None else ts - self._ts
+        self._ts = ts
+        if last is None or last.shape != counts.shape:
+            self._reset()
+            return int(np.count_nonzero(counts))
+        delta = counts - last
+        changed = np.nonzero(delta)
+        self._delta, self._changed = delta, changed
+        dv = delta[changed]
+        if (dv < 0).any():  # cleared
+            self._reset()
+            return dv.size
+        ch = changed[::-1]  # x first
+        for i, p in enumerate(self._proj):
+            p += np.bincount(ch[i], weights=dv, minlength=p.size).astype(
+                np.int64)
+        m = weighted_moments(ch[0], dv, *ch[1:], shift=self._shift)
+        for k, v in m.items():
+            if k != 'shift':
+                self._moments[k] = self._moments[k] + v
+        return dv.size
+
+    def _reset(self):
+        # rebuild projections and moments from the whole counts
+        counts = self._counts
+        nd = counts.ndim
+        self._proj = [
+            counts.sum(axis=i) if nd == 2 else counts.copy()
+            for i in range(nd)
+        ]
+        # shift by the center of the axes
+        shift = tuple(n / 2 for n in counts.shape[::-1])
+        self._shift = shift[0] if nd == 1 else shift
+        idx = np.nonzero(counts)
+        ch = idx[::-1]
+        self._moments = weighted_moments(ch[0],
+                                         counts[idx],
+                                         *ch[1:],
+                                         shift=self._shift)
+
+    def _check_polled(self):
+        if self._counts is None:
+            raise RuntimeError(
+                f"Spectrum '{self._name}' is not polled, call update() first.")
+
+    def projection(self, axis=0, map=True):
+        """Return the counts projected onto the axis, updated incrementally,
+        see :meth:`Spectrum.projection`.
+        """
+        self._check_polled()
+        return self._spectrum.get_axes_values(map)[axis], self._proj[axis]
+
+    def stats(self, mapped=True):
+        """Return the stats of all the counts, updated incrementally, see
+        :meth:`Spectrum.stats`.
+        """
+        self._check_polled()
+        stat = stats_from_moments(self._moments)
+        if mapped:
+            stat = _map_stats(stat, self._spectrum.axes)
+        stat = {
+            k: tuple(np.atleast_1d(i) for i in v) if isinstance(v, tuple) else
+            np.atleast_1d(v)
+            for k, v in stat.items()
+        }
+        return make_stats_table(self._spectrum.stype, stat, ['All'])
+
+    def __repr__(self):
+        return f"[Spectrum Watcher] '{self._name}' on {self._client}"
+
+
+def _map_stats(stat, axes):
+    # map the stats of channel coordinate to world coordinate, by the linear
+    # mapping of low + ch * (high - low) / bins.
+    is_1d = 'rho' not in stat
+    low = [ax['low'] for ax in axes]
+    scale = [(ax['high'] - ax['low']) / ax['bins'] for ax in axes]
+    m = {
+        k: (stat[k], ) if is_1d else stat[k]
+        for k in ('mean', 'var', 'std', 'fwhm')
+    }
+    r = dict(stat)
+    r['mean'] = tuple(l + v * a for v, l, a in zip(m['mean'], low, scale))
+    r['var'] = tuple(v * a * a for v, a in zip(m['var'], scale))
+    r['std'] = tuple(v * abs(a) for v, a in zip(m['std'], scale))
+    r['fwhm'] = tuple(v * abs(a) for v, a in zip(m['fwhm'], scale))
+    if is_1d:
+        return {k: v[0] if isinstance(v, tuple) else v for k, v in r.items()}
+    r['cov'] = stat['cov'] * scale[0] * scale[1]
+    r['rho'] = stat['rho'] * np.sign(scale[0] * scale[1])
+    return r
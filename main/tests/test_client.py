@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+
+import asyncio
+
+import pytest
+
+from spectcl.contrib.mock_server import MockSpecTclServer
+from spectcl.contrib.mock_server import make_demo_spectcl
+from spectcl.data import AsyncSpecTclClient
+
+
+@pytest.fixture
+def server():
+    with MockSpecTclServer(make_demo_spectcl(1, 32, seed=0)) as srv:
+        yield srv
+
+
+def _create_spectrum(srv, name):
+    # define a spectrum on the server, not known by the snapshot of clients
+    srv.spectcl.add_spectrum(name, '1', ['p.x'], bins=32, high=16.0)
+
+
+def test_get_spectrum_created_after_snapshot(server):
+    client = server.client(meta_ttl=None)
+    assert 'late' not in client.list('spectrum').index
+    _create_spectrum(server, 'late')
+    sp = client.get_spectrum('late')
+    assert sp.name == 'late'
+    assert 'late' in client.list('spectrum').index
+
+
+def test_get_spectrum_not_defined(server):
+    client = server.client(meta_ttl=None)
+    with pytest.raises(KeyError):
+        client.get_spectrum('nothing')
+
+
+def test_async_get_spectrum_created_after_snapshot(server):
+    client = server.client(meta_ttl=None)
+    client.snapshot()
+    _create_spectrum(server, 'late')
+
+    async def _get():
+        async with AsyncSpecTclClient(client=client) as ac:
+            return await ac.get_spectrum('late')
+
+    assert asyncio.run(_get()).name == 'late'
+
+
+def _count_list_requests(client):
+    # count the list requests of spectra, i.e. the snapshot refreshes
+    calls = []
+    fetch = client._spectrum_client._fetch
+
+    def _fetch(action, url, params):
+        if action == 'list':
+            calls.append(url)
+        return fetch(action, url, params)
+
+    client._spectrum_client._fetch = _fetch
+    return calls
+
+
+def test_get_spectra_refresh_once(server):
+    client = server.client(meta_ttl=None)
+    client.snapshot()
+    _create_spectrum(server, 'late')
+    calls = _count_list_requests(client)
+    names = ['s1d_0', 'late', 'nothing1', 'nothing2', 'nothing3']
+    spectra, errors = client.get_spectra(names)
+    assert sorted(spectra) == ['late', 's1d_0']
+    assert sorted(errors) == ['nothing1', 'nothing2', 'nothing3']
+    assert all(isinstance(i, KeyError) for i in errors.values())
+    assert len(calls) == 1
+
+
+def test_async_get_spectra_refresh_once(server):
+    client = server.client(meta_ttl=None)
+    client.snapshot()
+    _create_spectrum(server, 'late')
+    calls = _count_list_requests(client)
+
+    async def _get():
+        async with AsyncSpecTclClient(client=client) as ac:
+            return await ac.get_spectra(['late', 'nothing1', 'nothing2'])
+
+    spectra, errors = asyncio.run(_get())
+    assert list(spectra) == ['late']
+    assert sorted(errors) == ['nothing1', 'nothing2']
+    assert len(calls) == 1
@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+
+import numpy as np
+import pytest
+
+from spectcl.contrib.mock_server import MockSpecTclServer
+from spectcl.contrib.mock_server import make_demo_spectcl
+from spectcl.data import GateEvaluator
+
+
+@pytest.fixture
+def server():
+    spectcl = make_demo_spectcl(1, 32, seed=0)
+    # nested and shared compound gates of the 2D spectrum
+    spectcl.add_gate('nested', '+', gates=['s2d_0_and', 's2d_0_not'])
+    spectcl.add_gate('xor', '*', gates=['s2d_0_or', 'not_and'])
+    spectcl.add_gate('not_and', '-', gates=['s2d_0_and'])
+    spectcl.add_gate('loop1', '+', gates=['loop2'])
+    spectcl.add_gate('loop2', '*', gates=['loop1'])
+    spectcl.add_gate('missing', '+', gates=['s2d_0_blob0', 'nothing'])
+    spectcl.add_gate('other', 's', parameters=['q.z'], low=0.0, high=1.0)
+    with MockSpecTclServer(spectcl) as srv:
+        yield srv
+
+
+@pytest.fixture
+def spectrum(server):
+    return server.client().get_spectrum('s2d_0', storage='dense')
+
+
+def _evaluator(sp, client, channels=None):
+    shape = None if channels is not None else sp.get_counts().shape
+    return GateEvaluator(sp.parameters, sp.axes, shape,
+                         client.list('gate', clean=False), channels=channels)
+
+
+def _blobs(table):
+    return sorted(i for i in table.index if i.startswith('s2d_0_blob'))
+
+
+def test_compound_gates(spectrum):
+    client = spectrum.client
+    ev = _evaluator(spectrum, client)
+    blobs = [ev.mask(i) for i in _blobs(client.snapshot()['gate'])]
+    any_blob = np.logical_or.reduce(blobs)
+    both = blobs[0] & ev.mask('s2d_0_slice')
+    np.testing.assert_array_equal(ev.mask('s2d_0_or'), any_blob)
+    np.testing.assert_array_equal(ev.mask('s2d_0_not'), ~any_blob)
+    np.testing.assert_array_equal(ev.mask('s2d_0_and'), both)
+    np.testing.assert_array_equal(ev.mask('nested'), both | ~any_blob)
+    np.testing.assert_array_equal(ev.mask('xor'), any_blob & ~both)
+    assert ev.mask('true').all()
+    assert both.any() and not both.all()
+    # each gate is evaluated once
+    assert ev.mask('s2d_0_or') is ev.mask('s2d_0_or')
+
+
+def test_compound_gates_of_channels(spectrum):
+    client = spectrum.client
+    grid = _evaluator(spectrum, client)
+    idx, _ = spectrum._nonzero(map=False)
+    ev = _evaluator(spectrum, client, channels=idx)
+    for name in ('s2d_0_blob0', 's2d_0_or', 's2d_0_not', 's2d_0_and',
+                 'nested', 'xor'):
+        np.testing.assert_array_equal(ev.mask(name),
+                                      grid.mask(name)[idx[1], idx[0]])
+
+
+def test_invalid_gates(spectrum):
+    ev = _evaluator(spectrum, spectrum.client)
+    with pytest.raises(ValueError):
+        ev.mask('loop1')
+    with pytest.raises(KeyError):
+        ev.mask('missing')
+    with pytest.raises(NotImplementedError):
+        ev.mask('other')  # on a parameter not of the spectrum
+
+
+def test_gate_table_looked_up_lazily(spectrum):
+    client = spectrum.client
+    gate = client.get_gate('s2d_0_blob0')
+    calls = []
+
+    def table():
+        calls.append(1)
+        return client.snapshot()['gate']
+
+    ev = GateEvaluator(spectrum.parameters, spectrum.axes,
+                       spectrum.get_counts().shape, table)
+    ev.mask(gate)
+    assert not calls
+    ev.mask('s2d_0_or')
+    ev.mask('s2d_0_and')
+    assert len(calls) == 1
+
+
+def test_gated_stats(spectrum):
+    ev = _evaluator(spectrum, spectrum.client)
+    counts = spectrum.get_counts()
+    with pytest.warns(UserWarning, match='nothing'):
+        df = spectrum.stats(gates=['s2d_0_or', 's2d_0_not', 'nothing'])
+    assert list(df.index) == ['All', 's2d_0_or', 's2d_0_not']
+    assert df.loc['s2d_0_or', 'Sum'] == counts[ev.mask('s2d_0_or')].sum()
+    assert df.loc['s2d_0_or', 'Sum'] + df.loc['s2d_0_not', 'Sum'] == \
+        df.loc['All', 'Sum']
@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+
+import json
+
+import numpy as np
+import pytest
+import requests
+
+from spectcl.contrib.mock_server import MockSpecTclServer
+from spectcl.contrib.mock_server import make_demo_spectcl
+from spectcl.contrib.proxy import SpecTclProxyServer
+
+
+@pytest.fixture
+def upstream():
+    with MockSpecTclServer(make_demo_spectcl(1, 32, seed=0)) as srv:
+        yield srv
+
+
+@pytest.fixture
+def proxy(upstream):
+    # polled by the tests, not in the background
+    with SpecTclProxyServer(upstream.client(), interval=3600,
+                            heartbeat=0.2) as srv:
+        yield srv
+
+
+def _url(srv, group, action):
+    return f"{srv.base_url}:{srv.port}/spectcl/{group}/{action}"
+
+
+def test_etag_not_modified(upstream, proxy):
+    url = _url(proxy, 'spectrum', 'contents')
+    r = requests.get(url, params={'name': 's1d_0'})
+    assert r.status_code == 200
+    etag = r.headers['ETag']
+    for tag in (etag, f'W/{etag}', f'"other", {etag}', '*'):
+        r304 = requests.get(url, params={'name': 's1d_0'},
+                            headers={'If-None-Match': tag})
+        assert r304.status_code == 304
+        assert r304.content == b''
+    r = requests.get(url, params={'name': 's1d_0'},
+                     headers={'If-None-Match': '"other"'})
+    assert r.status_code == 200 and r.headers['ETag'] == etag
+    # changed upstream, the new response is tagged differently
+    upstream.spectcl.increment('s1d_0')
+    assert proxy.proxy.poll()
+    r = requests.get(url, params={'name': 's1d_0'},
+                     headers={'If-None-Match': etag})
+    assert r.status_code == 200
+    assert r.headers['ETag'] != etag
+
+
+def test_fan_out(upstream, proxy):
+    direct = upstream.client()
+    client = proxy.client()
+    n0 = upstream.requests
+    for _ in range(5):
+        sp = client.get_spectrum('s2d_0', storage='dense')
+    ref = direct.get_spectrum('s2d_0', storage='dense')
+    np.testing.assert_array_equal(sp.get_counts(), ref.get_counts())
+    status = proxy.proxy.status()
+    assert status['hits'] > 0
+    # spectrum, gate, apply lists and one contents, and the direct ones
+    assert upstream.requests - n0 == status['upstream_requests'] + \
+        direct.metrics.totals['count']
+
+
+def test_forward_refreshes(upstream, proxy):
+    client = proxy.client()
+    assert client.get_spectrum('s1d_0').get_counts().sum() > 0
+    r = requests.get(_url(proxy, 'spectrum', 'clear'),
+                     params={'pattern': 's1d_0'})
+    assert r.status_code == 200
+    assert client.get_spectrum('s1d_0').get_counts().sum() == 0
+
+
+def test_events(upstream, proxy):
+    url = _url(proxy, 'proxy', 'events')
+    proxy.proxy.get('spectrum', 'contents', [('name', 's1d_0')])
+    with requests.get(url, params={'name': 's1d_0'}, stream=True,
+                      timeout=10) as r:
+        assert r.headers['Content-Type'] == 'text/event-stream'
+        lines = r.iter_lines(chunk_size=1, decode_unicode=True)
+        assert next(lines) == ': subscribed'
+        assert next(lines) == ''
+        # no change, heartbeat only
+        assert next(lines) == ': keep-alive'
+        upstream.spectcl.increment('s1d_0')
+        proxy.proxy.poll()
+        event = [next(i for i in lines if i.startswith('event:'))]
+        event.append(next(lines))
+    assert event[0] == 'event: contents'
+    data = json.loads(event[1][len('data:'):])
+    assert data == {'name': 's1d_0', 'version': 2}
@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from spectcl.contrib.mock_server import MockSpecTclServer
+from spectcl.contrib.mock_server import make_demo_spectcl
+from spectcl.data.storage import make_counts
+from spectcl.data.storage import select_storage
+
+
+def _channels(ndim, shape, n=40, seed=0):
+    # unique non-empty channels of x, [y], v
+    rng = np.random.default_rng(seed)
+    flat = rng.choice(int(np.prod(shape)), n, replace=False)
+    idx = np.unravel_index(flat, shape)[::-1]  # x first
+    cols = dict(zip(('x', 'y'), idx[:ndim]))
+    cols['v'] = rng.integers(1, 100, n)
+    return pd.DataFrame(cols)
+
+
+def _dense(data, shape):
+    arr = np.zeros(shape, dtype=np.int64)
+    idx = tuple(data[k] for k in ('y', 'x') if k in data)
+    arr[idx] = data['v']
+    return arr
+
+
+@pytest.mark.parametrize('shape', [(50, ), (8, 12)])
+@pytest.mark.parametrize('storage', ['dense', 'sparse'])
+def test_round_trip(shape, storage):
+    data = _channels(len(shape), shape)
+    c = make_counts(data, shape, np.int32, storage)
+    assert c.kind == storage and c.shape == shape and c.dtype == np.int32
+    expected = _dense(data, shape)
+    np.testing.assert_array_equal(c.to_dense(), expected)
+    assert c.nnz == len(data) and c.sum() == data['v'].sum()
+    # back to channels
+    df = c.to_frame()
+    c1 = make_counts(df, shape, np.int32, storage)
+    np.testing.assert_array_equal(c1.to_dense(), expected)
+    for axis in range(len(shape)):
+        np.testing.assert_array_equal(
+            c.projection(axis), expected.sum(axis=axis) if
+            len(shape) == 2 else expected)
+
+
+@pytest.mark.parametrize('storage', ['dense', 'sparse'])
+def test_roi_and_fill(storage):
+    shape = (8, 12)
+    data = _channels(2, shape)
+    c = make_counts(data, shape, np.int32, storage)
+    expected = _dense(data, shape)
+    np.testing.assert_array_equal(c.to_dense(roi=(2, 9, 1, 5)),
+                                  expected[1:5, 2:9])
+    arr = c.to_dense(fill=np.nan)
+    assert np.isnan(arr[expected == 0]).all()
+    np.testing.assert_array_equal(arr[expected != 0], expected[expected != 0])
+
+
+def test_shape_extended_to_channels():
+    data = pd.DataFrame({'x': [0, 14], 'v': [1, 2]})
+    for storage in ('dense', 'sparse'):
+        assert make_counts(data, (10, ), None, storage).shape == (15, )
+
+
+def test_select_storage():
+    assert select_storage(10, (100, 100)) == 'sparse'
+    assert select_storage(9000, (100, 100)) == 'dense'
+    with pytest.raises(ValueError):
+        make_counts(pd.DataFrame({'x': [0], 'v': [1]}), (4, ), None, 'csr')
+
+
+def _sorted_channels(sp):
+    df = sp.get_data(map=False)
+    return df.sort_values(list(df.columns[:-1])).to_numpy()
+
+
+def test_spectrum_storage_modes():
+    with MockSpecTclServer(make_demo_spectcl(1, 32, seed=0)) as srv:
+        client = srv.client()
+        for name in ('s1d_0', 's2d_0'):
+            ref = client.get_spectrum(name, storage='frame')
+            # the frame ends at the last non-empty channel of each axis
+            ref_counts = ref.get_counts()
+            for storage in ('dense', 'sparse'):
+                sp = client.get_spectrum(name, storage=storage)
+                assert sp.storage == storage
+                counts = sp.get_counts()
+                assert counts.shape == (32, ) * counts.ndim
+                sl = tuple(slice(0, n) for n in ref_counts.shape)
+                np.testing.assert_array_equal(counts[sl], ref_counts)
+                assert counts.sum() == ref_counts.sum()
+                np.testing.assert_array_equal(_sorted_channels(sp),
+                                              _sorted_channels(ref))
+
+
+def test_spectrum_projection():
+    with MockSpecTclServer(make_demo_spectcl(1, 32, seed=0)) as srv:
+        client = srv.client()
+        for name in ('s1d_0', 's2d_0'):
+            ref = client.get_spectrum(name, storage='dense').get_counts()
+            for storage in ('frame', 'dense', 'sparse'):
+                sp = client.get_spectrum(name, storage=storage)
+                for axis in range(ref.ndim):
+                    x, p = sp.projection(axis, map=False)
+                    assert p.dtype == np.int64
+                    expected = ref.sum(axis=axis) if ref.ndim == 2 else ref
+                    np.testing.assert_array_equal(p, expected[:p.size])
+                    assert p.sum() == ref.sum()
+                    # a copy, not the stored counts
+                    p[:] = 0
+                    assert sp.get_counts().sum() == ref.sum()
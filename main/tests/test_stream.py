@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+
+import json
+
+import numpy as np
+import pytest
+
+from spectcl.contrib.mock_server import MockSpecTclServer
+from spectcl.contrib.mock_server import make_demo_spectcl
+from spectcl.data.stream import ChannelStreamParser
+
+
+def _contents_doc(ndim, n=50, seed=0):
+    rng = np.random.default_rng(seed)
+    keys = ['x', 'y'][:ndim] + ['v']
+    channels = [{k: int(rng.integers(-5 if k == 'v' else 0, 1000))
+                 for k in keys} for _ in range(n)]
+    doc = {'status': 'OK', 'detail': {'channels': channels}}
+    return doc, json.dumps(doc).encode()
+
+
+def _parse(body, chunk_size, ndim=None):
+    p = ChannelStreamParser(ndim, capacity=1)
+    for i in range(0, len(body), chunk_size):
+        p.feed(body[i:i + chunk_size])
+    return p.close()
+
+
+@pytest.mark.parametrize('ndim', [1, 2])
+@pytest.mark.parametrize('chunk_size', [1, 2, 3, 7, 16, 61, 1 << 16])
+def test_parse_across_chunk_boundaries(ndim, chunk_size):
+    doc, body = _contents_doc(ndim)
+    r = _parse(body, chunk_size)
+    assert r['status'] == 'OK'
+    cols = r['detail']['channels']
+    assert list(cols) == ['x', 'y'][:ndim] + ['v']
+    for k, v in cols.items():
+        np.testing.assert_array_equal(
+            v, [c[k] for c in doc['detail']['channels']])
+
+
+def test_parse_no_channels():
+    body = json.dumps({'status': 'OK', 'detail': {'channels': []}}).encode()
+    cols = _parse(body, 5, ndim=2)['detail']['channels']
+    assert list(cols) == ['x', 'y', 'v']
+    assert all(v.size == 0 for v in cols.values())
+
+
+def test_parse_error_message():
+    body = json.dumps({'status': 'ERROR', 'detail': 'no such spectrum'})
+    assert _parse(body.encode(), 4)['detail'] == 'no such spectrum'
+
+
+@pytest.mark.parametrize('compress', [True, False])
+def test_stream_contents_as_parsed_at_once(compress):
+    with MockSpecTclServer(make_demo_spectcl(1, 64, seed=0)) as srv:
+        client = srv.client(compress=compress)
+        for name in ('s1d_0', 's2d_0'):
+            df0 = client._spectrum_client.contents(name)
+            df1 = client._spectrum_client.contents(name, stream=True)
+            assert df0.equals(df1)
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from spectcl.contrib.mock_server import MockSpecTclServer
+from spectcl.contrib.mock_server import make_demo_spectcl
+from spectcl.contrib.proxy import SpecTclProxyServer
+
+NAMES = ['s1d_0', 's2d_0']
+
+
+@pytest.fixture
+def upstream():
+    with MockSpecTclServer(make_demo_spectcl(1, 32, seed=0)) as srv:
+        yield srv
+
+
+@pytest.fixture
+def proxy(upstream):
+    with SpecTclProxyServer(upstream.client(), interval=0.05,
+                            heartbeat=0.2) as srv:
+        yield srv
+
+
+@pytest.fixture
+def executor():
+    with ThreadPoolExecutor(max_workers=1) as ex:
+        yield ex
+
+
+def _next(executor, sub, timeout=10):
+    # the next Spectrum of *sub*, fail instead of blocking forever
+    return executor.submit(next, sub).result(timeout)
+
+
+def _watch(executor, client, **kws):
+    sub = client.watch(NAMES, interval=0.05, **kws)
+    # the current ones first
+    assert sorted(_next(executor, sub).name for _ in NAMES) == NAMES
+    return sub
+
+
+@pytest.mark.parametrize('push', [True, False])
+def test_poll_without_event_stream(upstream, executor, push):
+    # the mock server does not push, fall back to polling
+    with _watch(executor, upstream.client(), push=push) as sub:
+        assert sub.mode == 'poll'
+        upstream.spectcl.increment('s2d_0')
+        sp = _next(executor, sub)
+        assert sp.name == 's2d_0'
+        assert sp.get_counts().sum() == upstream.client().get_spectrum(
+            's2d_0').get_counts().sum()
+        # the unchanged contents are not fetched again
+        n = upstream.requests
+        upstream.spectcl.increment('s1d_0')
+        assert _next(executor, sub).name == 's1d_0'
+        assert upstream.requests - n <= 2 * len(NAMES) + 1
+
+
+def test_push_from_proxy(upstream, proxy, executor):
+    with _watch(executor, proxy.client()) as sub:
+        assert sub.mode == 'push'
+        upstream.spectcl.increment('s1d_0')
+        assert _next(executor, sub).name == 's1d_0'
+        upstream.spectcl.increment('s2d_0')
+        assert _next(executor, sub).name == 's2d_0'
+
+
+def test_push_subscribes_again(upstream, proxy, executor):
+    with _watch(executor, proxy.client()) as sub:
+        # close the event streams
+        proxy.proxy.stop()
+        proxy.proxy.start()
+        upstream.spectcl.increment('s1d_0')
+        assert _next(executor, sub).name == 's1d_0'
+        assert sub.mode == 'push'
+
+
+def test_proxy_push_disabled(proxy, executor):
+    with _watch(executor, proxy.client(), push=False) as sub:
+        assert sub.mode == 'poll'
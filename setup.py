@@ -11,6 +11,7 @@ install_requires = [
 extra_require = {
     'test': ['pytest'],
     'doc': ['sphinx', 'sphinx_rtd_theme'],
+    'fast': ['orjson'],
 }
 
 
@@ -21,9 +22,10 @@ def readme():
 
 def set_entry_points():
     r = {}
-#    r['console_scripts'] = [
-#        'fetch_mach_state=phantasy_apps.msviz.tools:main',
-#    ]
+    r['console_scripts'] = [
+        'spectcl_loadtest=spectcl.contrib.loadtest:main',
+        'spectcl_proxy=spectcl.contrib.proxy:main',
+    ]
 
     r['gui_scripts'] = [
         'spectcl_viz=spectcl.apps.viz:run',